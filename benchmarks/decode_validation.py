@@ -0,0 +1,86 @@
+# decode_validation.py
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from duplipicfinder.image_utils import ImageUtils
+
+
+def validate(folder_path, sample_size=500, seed=0):
+    """
+    Compares hashes from the fast decode path against the full decode path on a sample of images.
+
+    Args:
+        folder_path (str): Folder containing the sample corpus.
+        sample_size (int): Maximum number of images to compare, 0 for all.
+        seed (int): Seed used to pick the sample.
+
+    Returns:
+        dict: The validation report.
+    """
+    images = ImageUtils.find_images(folder_path)
+    if sample_size and len(images) > sample_size:
+        images = random.Random(seed).sample(images, sample_size)
+
+    distances = []
+    full_seconds = fast_seconds = 0.0
+    for image in images:
+        start = time.perf_counter()
+        full_hash = ImageUtils.compute_hash(image, fast_decode=False)
+        full_seconds += time.perf_counter() - start
+
+        start = time.perf_counter()
+        fast_hash = ImageUtils.compute_hash(image, fast_decode=True)
+        fast_seconds += time.perf_counter() - start
+
+        if full_hash is not None and fast_hash is not None:
+            distances.append(full_hash - fast_hash)
+
+    histogram = {}
+    for distance in distances:
+        histogram[distance] = histogram.get(distance, 0) + 1
+
+    compared = len(distances)
+    return {
+        'images': len(images),
+        'compared': compared,
+        'identical': histogram.get(0, 0),
+        'agreement': histogram.get(0, 0) / compared if compared else 0.0,
+        'mean_distance': sum(distances) / compared if compared else 0.0,
+        'max_distance': max(distances, default=0),
+        'distance_histogram': dict(sorted(histogram.items())),
+        'full_decode_seconds': full_seconds,
+        'fast_decode_seconds': fast_seconds,
+        'speedup': full_seconds / fast_seconds if fast_seconds else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare fast and full decode hashes on a sample corpus.")
+    parser.add_argument("folder", help="Folder containing the sample images")
+    parser.add_argument("--sample", type=int, default=500, help="Number of images to compare, 0 for all")
+    parser.add_argument("--seed", type=int, default=0, help="Seed used to pick the sample")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    report = validate(args.folder, args.sample, args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Images compared:   {report['compared']}/{report['images']}")
+    print(f"Identical hashes:  {report['identical']} ({report['agreement']:.1%})")
+    print(f"Mean distance:     {report['mean_distance']:.2f} bits (max {report['max_distance']})")
+    for distance, count in report['distance_histogram'].items():
+        print(f"  {distance:>2} bits: {count}")
+    print(f"Full decode:       {report['full_decode_seconds']:.2f}s")
+    print(f"Fast decode:       {report['fast_decode_seconds']:.2f}s ({report['speedup']:.1f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
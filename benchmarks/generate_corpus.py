@@ -0,0 +1,155 @@
+# generate_corpus.py
+import argparse
+import json
+import os
+import random
+from PIL import Image, ImageDraw, ImageEnhance, ImageFilter
+
+
+# Near-duplicate variants, each derived from an original with a fixed transformation
+VARIANTS = ("reencode", "resize", "crop", "brightness")
+FILES_PER_FOLDER = 100
+MANIFEST_NAME = "manifest.json"
+
+
+def draw_original(rng, size):
+    """
+    Draws a random image of overlapping shapes on a gradient background.
+
+    Args:
+        rng (random.Random): Source of randomness, so the corpus is reproducible.
+        size (tuple): The ``(width, height)`` of the image.
+
+    Returns:
+        PIL.Image.Image: The RGB image.
+    """
+    width, height = size
+    start = [rng.randrange(256) for _ in range(3)]
+    end = [rng.randrange(256) for _ in range(3)]
+    gradient = Image.linear_gradient("L").resize(size).rotate(rng.randrange(360), expand=False)
+    img = Image.composite(Image.new("RGB", size, tuple(end)), Image.new("RGB", size, tuple(start)), gradient)
+
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(6, 14)):
+        x0, y0 = rng.randrange(width), rng.randrange(height)
+        x1, y1 = x0 + rng.randint(width // 10, width // 2), y0 + rng.randint(height // 10, height // 2)
+        color = tuple(rng.randrange(256) for _ in range(3))
+        shape = rng.choice(("ellipse", "rectangle", "polygon"))
+        if shape == "ellipse":
+            draw.ellipse((x0, y0, x1, y1), fill=color)
+        elif shape == "rectangle":
+            draw.rectangle((x0, y0, x1, y1), fill=color)
+        else:
+            draw.polygon([(rng.randrange(width), rng.randrange(height)) for _ in range(rng.randint(3, 6))], fill=color)
+    return img.filter(ImageFilter.GaussianBlur(rng.uniform(0.5, 2.0)))
+
+
+def make_variant(img, variant, rng):
+    """
+    Derives a near-duplicate of an image.
+
+    Args:
+        img (PIL.Image.Image): The original.
+        variant (str): One of ``VARIANTS``.
+        rng (random.Random): Source of randomness for the transformation strength.
+
+    Returns:
+        tuple: The transformed image and the JPEG quality to save it with.
+    """
+    if variant == "reencode":
+        return img, rng.randint(40, 70)
+    if variant == "resize":
+        scale = rng.uniform(0.3, 0.7)
+        return img.resize((max(1, int(img.width * scale)), max(1, int(img.height * scale))), Image.LANCZOS), 90
+    if variant == "crop":
+        margin_x, margin_y = int(img.width * rng.uniform(0.02, 0.06)), int(img.height * rng.uniform(0.02, 0.06))
+        return img.crop((margin_x, margin_y, img.width - margin_x, img.height - margin_y)), 90
+    if variant == "brightness":
+        return ImageEnhance.Brightness(img).enhance(rng.choice((0.85, 1.15))), 90
+    raise ValueError(f"Unknown variant: {variant}")
+
+
+def generate_corpus(folder_path, originals=1000, duplicate_rate=0.5, variants=VARIANTS, size=(640, 480), seed=0):
+    """
+    Writes a synthetic corpus of originals and near-duplicates together with its ground truth.
+
+    Each original is a JPEG; a ``duplicate_rate`` share of them get one file per variant. Files are
+    spread over subfolders of ``FILES_PER_FOLDER`` in shuffled order, so duplicates do not sit next
+    to each other. ``manifest.json`` maps every file, relative to the corpus folder, to its original.
+
+    Args:
+        folder_path (str): The folder to write to; it is created if needed.
+        originals (int): Number of distinct images.
+        duplicate_rate (float): Share of originals that get near-duplicates.
+        variants (iterable): The ``VARIANTS`` generated for each duplicated original.
+        size (tuple): The ``(width, height)`` of the originals.
+        seed (int): Seed of the corpus; the same seed always gives the same files.
+
+    Returns:
+        dict: The manifest.
+    """
+    rng = random.Random(seed)
+    jobs = []
+    for original in range(originals):
+        jobs.append((original, "original"))
+        if rng.random() < duplicate_rate:
+            jobs.extend((original, variant) for variant in variants)
+    rng.shuffle(jobs)
+
+    files = {}
+    images = {}
+    for number, (original, variant) in enumerate(jobs):
+        if original not in images:
+            images[original] = draw_original(random.Random(f"{seed}:{original}"), size)
+        img, quality = images[original], 90
+        if variant != "original":
+            img, quality = make_variant(img, variant, random.Random(f"{seed}:{original}:{variant}"))
+
+        relative_path = f"{number // FILES_PER_FOLDER:04d}/{number:07d}.jpg"
+        path = os.path.join(folder_path, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        img.save(path, "JPEG", quality=quality)
+        files[relative_path] = {"original": original, "variant": variant}
+
+        # Originals are drawn from their own seed, so one evicted here is simply drawn again when needed
+        if len(images) > 256:
+            images.pop(next(iter(images)))
+
+    manifest = {
+        "seed": seed,
+        "originals": originals,
+        "duplicate_rate": duplicate_rate,
+        "variants": list(variants),
+        "size": list(size),
+        "files": files,
+    }
+    with open(os.path.join(folder_path, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def load_manifest(folder_path):
+    with open(os.path.join(folder_path, MANIFEST_NAME)) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic corpus of images and near-duplicates.")
+    parser.add_argument("folder", help="Folder to write the corpus to")
+    parser.add_argument("--originals", type=int, default=1000, help="Number of distinct images (default: 1000)")
+    parser.add_argument("--duplicate-rate", type=float, default=0.5,
+                        help="Share of originals that get near-duplicates (default: 0.5)")
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=list(VARIANTS),
+                        help="Near-duplicate variants to generate (default: all)")
+    parser.add_argument("--width", type=int, default=640, help="Width of the originals (default: 640)")
+    parser.add_argument("--height", type=int, default=480, help="Height of the originals (default: 480)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the corpus (default: 0)")
+    args = parser.parse_args()
+
+    manifest = generate_corpus(args.folder, args.originals, args.duplicate_rate, args.variants,
+                               (args.width, args.height), args.seed)
+    print(f"Wrote {len(manifest['files'])} images of {args.originals} originals to {args.folder}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# run_benchmarks.py
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from generate_corpus import MANIFEST_NAME, generate_corpus, load_manifest
+from duplipicfinder.hash_algorithms import (DEFAULT_ALGORITHM, DEFAULT_HASH_SIZE, HASH_ALGORITHMS,
+                                            VERIFY_METHODS, Hasher)
+from duplipicfinder.hash_index import ENGINES, find_pairs, hash_to_int
+from duplipicfinder.hash_store import HashStore
+from duplipicfinder.image_utils import IMAGE_EXTENSIONS, ImageUtils
+from duplipicfinder.scanner import DirectoryScanner
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+DEFAULT_TOLERANCES = (2, 4, 6, 8, 10, 12, 16)
+
+
+def peak_rss_mb():
+    """
+    Returns the peak resident set size of this process and of its finished children, in MiB.
+
+    Returns:
+        dict: ``self`` and ``children`` peaks, or None where ``resource`` is not available (Windows).
+    """
+    if resource is None:
+        return None
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / 2 ** 20,
+        'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / 2 ** 20,
+    }
+
+
+def ground_truth_pairs(images, folder_path, manifest):
+    """
+    Returns the index pairs of ``images`` that derive from the same original.
+    """
+    by_original = {}
+    for i, image in enumerate(images):
+        relative_path = os.path.relpath(image, folder_path).replace(os.sep, "/")
+        by_original.setdefault(manifest['files'][relative_path]['original'], []).append(i)
+    return {(i, j) for members in by_original.values() for a, i in enumerate(members) for j in members[a + 1:]}
+
+
+def accuracy(found, expected):
+    true_positives = len(found & expected)
+    return {
+        'pairs': len(found),
+        'true_positives': true_positives,
+        'precision': true_positives / len(found) if found else 1.0,
+        'recall': true_positives / len(expected) if expected else 1.0,
+    }
+
+
+def run(folder_path, tolerance=6, tolerances=DEFAULT_TOLERANCES, engines=ENGINES, workers=0, hasher=None,
+        fast_decode=True):
+    """
+    Benchmarks the walk, hash and match phases on a generated corpus.
+
+    Args:
+        folder_path (str): A corpus written by ``generate_corpus``.
+        tolerance (int): Tolerance the match engines are timed at.
+        tolerances (iterable): Tolerances precision and recall are measured at.
+        engines (iterable): The match engines to time.
+        workers (int): Number of hashing processes, 0 for one per CPU.
+        hasher (Hasher): The hashes to compute, by default a 64-bit pHash.
+        fast_decode (bool): Whether to decode at reduced resolution.
+
+    Returns:
+        dict: The report.
+    """
+    hasher = hasher or Hasher()
+    manifest = load_manifest(folder_path)
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+        },
+        'corpus': {key: manifest[key] for key in ('seed', 'originals', 'duplicate_rate', 'variants', 'size')},
+        'settings': {
+            'hasher': hasher.identifier,
+            'verify_threshold': hasher.verify_threshold,
+            'fast_decode': fast_decode,
+            'workers': workers or os.cpu_count(),
+            'tolerance': tolerance,
+        },
+        'phases': {},
+    }
+
+    start = time.perf_counter()
+    entries = DirectoryScanner(IMAGE_EXTENSIONS).scan(folder_path)
+    seconds = time.perf_counter() - start
+    images = [entry.path for entry in entries]
+    report['corpus']['files'] = len(images)
+    report['corpus']['bytes'] = sum(entry.size for entry in entries)
+    report['phases']['walk'] = {'seconds': seconds, 'files_per_second': len(images) / seconds if seconds else None}
+
+    start = time.perf_counter()
+    fingerprints = ImageUtils.hash_images(images, lambda *progress: None, workers, fast_decode=fast_decode,
+                                          exact_prestage=False, hasher=hasher)
+    seconds = time.perf_counter() - start
+    report['phases']['hash'] = {
+        'seconds': seconds,
+        'images_per_second': len(images) / seconds if seconds else None,
+        'megabytes_per_second': report['corpus']['bytes'] / 2 ** 20 / seconds if seconds else None,
+        'failed': sum(fingerprint is None for fingerprint in fingerprints),
+    }
+
+    store = HashStore(hasher, len(images))
+    for image, fingerprint in zip(images, fingerprints):
+        store.add(image, fingerprint)
+    report['store_bytes_per_image'] = store.nbytes / len(images) if images else None
+
+    # Indexes into ``images`` of the images that could be hashed
+    hashed = [i for i, fingerprint in enumerate(fingerprints) if fingerprint is not None]
+    values = [hash_to_int(fingerprints[i].hash) for i in hashed]
+    comparisons = len(values) * (len(values) - 1) // 2
+    report['phases']['match'] = {}
+    for engine in engines:
+        start = time.perf_counter()
+        pairs = find_pairs(values, tolerance, engine, hasher.bits)
+        seconds = time.perf_counter() - start
+        report['phases']['match'][engine] = {
+            'seconds': seconds,
+            # Pairs covered per second, as if every image had been compared with every other one
+            'pairs_per_second': comparisons / seconds if seconds else None,
+            'pairs_found': len(pairs),
+        }
+
+    expected = ground_truth_pairs(images, folder_path, manifest)
+    report['corpus']['duplicate_pairs'] = len(expected)
+    report['accuracy'] = []
+    for level in tolerances:
+        candidates = {(hashed[i], hashed[j]) for i, j in find_pairs(values, level, engines[0], hasher.bits)}
+        result = {'tolerance': level, **accuracy(candidates, expected)}
+        if hasher.verify != "none":
+            start = time.perf_counter()
+            confirmed = {(i, j) for i, j in candidates if hasher.confirms(fingerprints[i], fingerprints[j])}
+            result['verify_seconds'] = time.perf_counter() - start
+            result['verified'] = accuracy(confirmed, expected)
+        report['accuracy'].append(result)
+
+    report['peak_rss_mb'] = peak_rss_mb()
+    return report
+
+
+def compare(report, baseline):
+    """
+    Prints how the throughput and accuracy of a report changed against an earlier one.
+    """
+    def change(new, old):
+        return f"{new / old - 1:+.1%}" if new and old else "n/a"
+
+    for phase, key in (('walk', 'files_per_second'), ('hash', 'images_per_second')):
+        new, old = report['phases'][phase][key], baseline['phases'].get(phase, {}).get(key)
+        print(f"{phase:<8} {key:<20} {change(new, old)}")
+    for engine, result in report['phases']['match'].items():
+        old = baseline['phases'].get('match', {}).get(engine, {}).get('pairs_per_second')
+        print(f"match    {engine:<20} {change(result['pairs_per_second'], old)}")
+    old_accuracy = {result['tolerance']: result for result in baseline.get('accuracy', [])}
+    for result in report['accuracy']:
+        old = old_accuracy.get(result['tolerance'])
+        if old is not None:
+            print(f"tolerance {result['tolerance']:>2}: precision {result['precision'] - old['precision']:+.3f}, "
+                  f"recall {result['recall'] - old['recall']:+.3f}")
+
+
+def print_report(report):
+    corpus = report['corpus']
+    print(f"Corpus: {corpus['files']} files, {corpus['bytes'] / 2 ** 20:.1f} MiB, "
+          f"{corpus['duplicate_pairs']} duplicate pairs")
+    print(f"Walk:   {report['phases']['walk']['files_per_second']:.0f} files/s")
+    print(f"Hash:   {report['phases']['hash']['images_per_second']:.1f} images/s ({report['settings']['hasher']})")
+    for engine, result in report['phases']['match'].items():
+        print(f"Match:  {result['pairs_per_second']:.3g} pairs/s ({engine}, {result['pairs_found']} found)")
+    for result in report['accuracy']:
+        line = f"Tolerance {result['tolerance']:>2}: precision {result['precision']:.3f}, recall {result['recall']:.3f}"
+        if 'verified' in result:
+            line += f", verified precision {result['verified']['precision']:.3f}, " \
+                    f"recall {result['verified']['recall']:.3f}"
+        print(line)
+    if report['store_bytes_per_image'] is not None:
+        print(f"Store:  {report['store_bytes_per_image']:.0f} bytes per image")
+    if report['peak_rss_mb'] is not None:
+        print(f"Peak RSS: {report['peak_rss_mb']['self']:.0f} MiB, workers {report['peak_rss_mb']['children']:.0f} MiB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scanning, hashing and matching on a synthetic corpus.")
+    parser.add_argument("folder", help="Corpus folder; generated first if it has no manifest")
+    parser.add_argument("--originals", type=int, default=1000, help="Originals when generating (default: 1000)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed when generating (default: 0)")
+    parser.add_argument("--tolerance", type=int, default=6, help="Tolerance the engines are timed at (default: 6)")
+    parser.add_argument("--tolerances", type=int, nargs="+", default=list(DEFAULT_TOLERANCES),
+                        help="Tolerances precision and recall are measured at")
+    parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES),
+                        help="Match engines to time; the first also measures accuracy (default: all)")
+    parser.add_argument("--workers", type=int, default=0, help="Hashing processes, 0 for one per CPU (default: 0)")
+    parser.add_argument("--hash", choices=HASH_ALGORITHMS, default=DEFAULT_ALGORITHM, help="Hash used to find candidates")
+    parser.add_argument("--hash-size", type=int, default=DEFAULT_HASH_SIZE, help="Hash edge length")
+    parser.add_argument("--verify", choices=VERIFY_METHODS, default="none", help="Verification of candidates")
+    parser.add_argument("--verify-threshold", type=float,
+                        help="Similarity a candidate needs to be confirmed (default: depends on --verify)")
+    parser.add_argument("--full-decode", action="store_true", help="Decode images at full resolution")
+    parser.add_argument("--output", metavar="FILE", help="Write the report as JSON to this file")
+    parser.add_argument("--baseline", metavar="FILE", help="Earlier JSON report to compare against")
+    args = parser.parse_args()
+
+    if not os.path.exists(os.path.join(args.folder, MANIFEST_NAME)):
+        print(f"Generating corpus of {args.originals} originals in {args.folder}")
+        generate_corpus(args.folder, args.originals, seed=args.seed)
+
+    hasher = Hasher(args.hash, args.hash_size, args.verify, verify_threshold=args.verify_threshold)
+    report = run(args.folder, args.tolerance, args.tolerances, args.engines, args.workers, hasher,
+                 not args.full_decode)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nChange against {args.baseline}:")
+        compare(report, baseline)
+
+
+if __name__ == "__main__":
+    main()
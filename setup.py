@@ -1,4 +1,4 @@
-from setuptools import setup, find_packages
+from setuptools import setup
 
 setup(
     name='DupliPicFinder',
@@ -6,14 +6,25 @@ setup(
     description='A tool to find and manage duplicate images using perceptual hashing.',
     author='Timo Schneider',
     url='https://github.com/timoschneider249/DupliPicFinder',
-    packages=find_packages(),
+    package_dir={'': 'src'},
+    packages=['duplipicfinder'],
+    package_data={'duplipicfinder': ['preferences.yaml']},
+    entry_points={
+        'console_scripts': [
+            'duplipicfinder=duplipicfinder.cli:main',
+        ],
+    },
     install_requires=[
         'imagehash==4.3.1',
         'Pillow==10.4.0',
+        'numpy>=1.17',
         'customtkinter==5.2.2',
         'PyYAML==6.0.1',
     ],
     extras_require={
+        'heif': [
+            'pillow-heif',
+        ],
         'dev': [
             'pip==24.1.2',
             'wheel==0.43.0',
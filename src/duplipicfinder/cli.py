@@ -0,0 +1,450 @@
+# cli.py
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+from .clustering import KEEPER_POLICIES, LINKAGES, group_duplicates
+from .deletion import DEFAULT_DELETE_MODE, DEFAULT_QUARANTINE_FOLDER, DELETE_MODES, DeletionEngine, latest_journal
+from .hash_algorithms import (DEFAULT_ALGORITHM, DEFAULT_HASH_SIZE, DEFAULT_VERIFY_THRESHOLDS, HASH_ALGORITHMS,
+                              VERIFY_METHODS, Hasher)
+from .hash_index import DEFAULT_ENGINE, ENGINES
+from .hash_store import HashStore
+from .image_utils import DEFAULT_CHUNK_SIZE, IMAGE_EXTENSIONS, ImageUtils
+from .instrumentation import ScanReport, format_duration
+from .reference_library import ReferenceLibrary
+from .scanner import DEFAULT_SCAN_WORKERS, DirectoryScanner
+
+# Exit codes, grep style: 1 means the scan worked and found something
+EXIT_OK = 0
+EXIT_DUPLICATES = 1
+EXIT_ERROR = 3  # argparse already uses 2 for usage errors
+EXIT_INCOMPLETE = 4  # The scan completed, but some images could not be read
+
+logger = logging.getLogger("duplipicfinder")
+
+
+class ResultWriter:
+    """
+    Writes pairs, groups or library matches to a stream as JSON Lines or CSV, one record at a time.
+    """
+
+    CSV_HEADERS = {
+        'pair': ["path1", "path2"],
+        'group': ["group", "action", "path"],
+        'match': ["path", "match", "source"],
+        'outcome': ["path", "outcome"],
+    }
+
+    def __init__(self, stream, output_format, record="pair"):
+        """
+        Args:
+            stream (file): The stream to write to.
+            output_format (str): ``"jsonl"`` or ``"csv"``.
+            record (str): The records written, one of ``CSV_HEADERS``.
+        """
+        self.stream = stream
+        self.output_format = output_format
+        self._csv = None
+        if output_format == "csv":
+            self._csv = csv.writer(stream)
+            self._csv.writerow(self.CSV_HEADERS[record])
+
+    def write_pair(self, pair):
+        if self._csv is not None:
+            self._csv.writerow(pair)
+        else:
+            self.stream.write(json.dumps({"path1": pair[0], "path2": pair[1]}) + "\n")
+        self.stream.flush()
+
+    def write_group(self, number, group, actions):
+        if self._csv is not None:
+            self._csv.writerow([number, "keep", group.keeper])
+            for path in group.duplicates:
+                self._csv.writerow([number, actions.get(path, "duplicate"), path])
+        else:
+            record = {"group": number, "keeper": group.keeper, "duplicates": list(group.duplicates)}
+            if actions:
+                record["actions"] = actions
+            self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+    def write_match(self, match):
+        source = "library" if match.in_library else "folder"
+        if self._csv is not None:
+            self._csv.writerow([match.path, match.match, source])
+        else:
+            self.stream.write(json.dumps({"path": match.path, "match": match.match, "source": source}) + "\n")
+        self.stream.flush()
+
+    def write_outcome(self, path, outcome):
+        if self._csv is not None:
+            self._csv.writerow([path, outcome])
+        else:
+            self.stream.write(json.dumps({"path": path, "outcome": outcome}) + "\n")
+        self.stream.flush()
+
+
+def make_hasher(args):
+    return Hasher(args.hash, args.hash_size, args.verify, args.verify_size, args.verify_threshold)
+
+
+def make_scanner(args):
+    return DirectoryScanner(IMAGE_EXTENSIONS, args.include, args.exclude, args.max_depth, args.follow_symlinks,
+                            args.scan_workers)
+
+
+def hashing_options(args):
+    return {
+        'workers': args.workers,
+        'chunk_size': args.chunk_size,
+        'cache_path': args.cache,
+        'fast_decode': not args.full_decode,
+        'exact_prestage': not args.no_exact_prestage,
+    }
+
+
+def make_progress_callback(args):
+    def progress_callback(current, total, progress, phase, eta):
+        if args.progress:
+            remaining = f", {format_duration(eta)} left" if eta is not None else ""
+            print(f"\r{phase.capitalize()}: {current}/{total} images ({progress:.0f}%){remaining}  ", end="",
+                  file=sys.stderr)
+    return progress_callback
+
+
+def save_outputs(report, args, store=None):
+    """
+    Logs the run summary and saves the run report and hash index where requested.
+
+    Returns:
+        bool: Whether everything requested could be saved.
+    """
+    logger.info(report.summary())
+    saved = True
+    if store is not None and args.save_index:
+        try:
+            store.save(args.save_index)
+        except OSError as e:
+            logger.error("Failed to save the hash index to %s: %s", args.save_index, e)
+            saved = False
+    if args.report:
+        try:
+            report.save(args.report)
+        except OSError as e:
+            logger.error("Failed to save the scan report to %s: %s", args.report, e)
+            saved = False
+    return saved
+
+
+def exit_code(report, found, failed):
+    """
+    Returns the exit code of a run: errors go first, then images that could not be read, then whether
+    duplicates were found, so a scan that broke halfway never passes for one that found nothing.
+    """
+    if failed:
+        return EXIT_ERROR
+    if report.errors:
+        return EXIT_INCOMPLETE
+    return EXIT_DUPLICATES if found else EXIT_OK
+
+
+def scan_command(args):
+    if not os.path.isdir(args.folder):
+        print(f"Error: {args.folder} is not a folder", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        hasher = make_hasher(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    grouped = args.group != "none"
+    writer = ResultWriter(output, args.format, "group" if grouped else "pair")
+    report = ScanReport(args.profile, args.trace_memory)
+    store = HashStore(hasher)
+    options = {'engine': args.engine, 'hasher': hasher, 'report': report, **hashing_options(args)}
+
+    failed = False
+    pairs = []
+    try:
+        with report.run():
+            for pair in ImageUtils.iter_duplicates(args.folder, args.tolerance, make_progress_callback(args),
+                                                   make_scanner(args), store, **options):
+                pairs.append(pair)
+                if not grouped:
+                    writer.write_pair(pair)
+            if args.progress:
+                print(file=sys.stderr)
+
+            if grouped:
+                groups = group_duplicates(pairs, args.group, args.keeper, preferred_folders=args.prefer)
+                actions = {}
+                if args.delete != "none":
+                    engine = DeletionEngine(args.delete_mode, args.quarantine)
+                    try:
+                        actions = engine.run(groups, make_progress_callback(args), dry_run=args.delete == "dry-run",
+                                             pairs=pairs)
+                    except OSError as e:
+                        logger.error("Failed to write the deletion journal to %s: %s", args.quarantine, e)
+                        failed = True
+                    if args.progress and engine.journal_path:
+                        print(file=sys.stderr)
+                    failed |= "failed" in actions.values()
+                    # Deliberate skips are not errors, so they are counted in the report instead
+                    report.count("deletion_skipped", sum(action == "skipped" for action in actions.values()))
+                    if engine.journal_path:
+                        logger.info("Deletion journal: %s", engine.journal_path)
+                for number, group in enumerate(groups, 1):
+                    writer.write_group(number, group, {path: actions[path] for path in group.duplicates
+                                                       if path in actions})
+    except BrokenPipeError:
+        raise
+    except Exception as e:
+        # E.g. a hashing process died or the cache broke; the results written so far are incomplete
+        print(f"Error: The scan failed: {e}", file=sys.stderr)
+        failed = True
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    failed |= not save_outputs(report, args, store)
+    return exit_code(report, pairs, failed)
+
+
+def index_command(args):
+    if not os.path.isdir(args.folder):
+        print(f"Error: {args.folder} is not a folder", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        hasher = make_hasher(args)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+
+    report = ScanReport(args.profile, args.trace_memory)
+    try:
+        with report.run():
+            library = ReferenceLibrary.build(args.folder, args.index, make_progress_callback(args), make_scanner(args),
+                                             hasher, report=report, **hashing_options(args))
+    except OSError as e:
+        print(f"Error: Failed to save the library to {args.index}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        print(f"Error: Indexing failed, the library was not saved: {e}", file=sys.stderr)
+        save_outputs(report, args)
+        return EXIT_ERROR
+    if args.progress:
+        print(file=sys.stderr)
+    print(f"Indexed {len(library)} images of {args.folder} in {args.index}", file=sys.stderr)
+    return exit_code(report, False, not save_outputs(report, args))
+
+
+def query_command(args):
+    if not os.path.isdir(args.folder):
+        print(f"Error: {args.folder} is not a folder", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        library = ReferenceLibrary.load(args.index)
+    except (OSError, ValueError) as e:
+        print(f"Error: Failed to load the library {args.index}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if args.verify_threshold is not None:
+        library.hasher.verify_threshold = args.verify_threshold
+
+    output = open(args.output, "w", newline="") if args.output else sys.stdout
+    writer = ResultWriter(output, args.format, "match")
+    report = ScanReport(args.profile, args.trace_memory)
+    found = False
+    failed = False
+    try:
+        with report.run():
+            for match in library.query(args.folder, args.tolerance, make_progress_callback(args), make_scanner(args),
+                                       args.within, args.engine, report=report, **hashing_options(args)):
+                found = True
+                writer.write_match(match)
+            if args.progress:
+                print(file=sys.stderr)
+    except BrokenPipeError:
+        raise
+    except Exception as e:
+        print(f"Error: The query failed: {e}", file=sys.stderr)
+        failed = True
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+    failed |= not save_outputs(report, args)
+    return exit_code(report, found, failed)
+
+
+def undo_command(args):
+    journal = args.journal or latest_journal(args.quarantine)
+    if journal is None:
+        print(f"Error: There is no deletion journal in {args.quarantine}", file=sys.stderr)
+        return EXIT_ERROR
+    try:
+        outcomes = DeletionEngine.undo(journal, make_progress_callback(args))
+    except OSError as e:
+        print(f"Error: Failed to read the deletion journal {journal}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    if args.progress:
+        print(file=sys.stderr)
+
+    writer = ResultWriter(sys.stdout, args.format, "outcome")
+    for path, outcome in outcomes.items():
+        writer.write_outcome(path, outcome)
+    restored = sum(outcome == "restored" for outcome in outcomes.values())
+    print(f"Restored {restored} of {len(outcomes)} images from {journal}", file=sys.stderr)
+    return EXIT_OK if all(outcome in ("restored", "irreversible") for outcome in outcomes.values()) else EXIT_ERROR
+
+
+def add_hasher_arguments(parser):
+    parser.add_argument("--hash", choices=HASH_ALGORITHMS, default=DEFAULT_ALGORITHM,
+                        help=f"Hash used to find candidates (default: {DEFAULT_ALGORITHM})")
+    parser.add_argument("--hash-size", type=int, default=DEFAULT_HASH_SIZE,
+                        help=f"Hash edge length, or bits per bin for colorhash (default: {DEFAULT_HASH_SIZE})")
+    parser.add_argument("--verify", choices=VERIFY_METHODS, default="none",
+                        help="Confirm candidates with a larger pHash or the SSIM of downscaled pixels (default: none)")
+    parser.add_argument("--verify-size", type=int, help="Edge length of the verification pHash or SSIM image")
+
+
+def similarity(text):
+    value = float(text)
+    if not 0 <= value <= 1:
+        raise argparse.ArgumentTypeError(f"{text} is not between 0 and 1")
+    return value
+
+
+def add_verify_threshold_argument(parser):
+    defaults = ", ".join(f"{threshold} for {method}" for method, threshold in DEFAULT_VERIFY_THRESHOLDS.items())
+    parser.add_argument("--verify-threshold", type=similarity,
+                        help=f"Similarity between 0 and 1 a candidate needs to be confirmed (default: {defaults})")
+
+
+def add_hashing_arguments(parser):
+    parser.add_argument("--workers", type=int, default=0, help="Hashing processes, 0 for one per CPU (default: 0)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Images per hashing task")
+    parser.add_argument("--cache", metavar="FILE", help="SQLite file used to reuse hashes of unchanged files")
+    parser.add_argument("--full-decode", action="store_true", help="Decode images at full resolution")
+    parser.add_argument("--no-exact-prestage", action="store_true",
+                        help="Decode byte-identical copies instead of reusing their hash")
+    parser.add_argument("--include", action="append", metavar="GLOB", help="Only scan files matching this pattern")
+    parser.add_argument("--exclude", action="append", metavar="GLOB",
+                        help="Skip files and folders matching this pattern")
+    parser.add_argument("--max-depth", type=int, help="Deepest folder level to scan, 0 for the top folder only")
+    parser.add_argument("--follow-symlinks", action="store_true", help="Follow symbolic links")
+    parser.add_argument("--scan-workers", type=int, default=DEFAULT_SCAN_WORKERS, help="Folders listed concurrently")
+
+
+def add_run_arguments(parser):
+    parser.add_argument("--progress", action="store_true", help="Show hashing progress on stderr")
+    parser.add_argument("--report", metavar="FILE",
+                        help="Write a JSON run report with phase times, counters, slowest files and errors")
+    parser.add_argument("--profile", action="store_true", help="Add a cProfile summary to the run report")
+    parser.add_argument("--trace-memory", action="store_true", help="Add tracemalloc statistics to the run report")
+    parser.add_argument("--verbose", "-v", action="store_true", help="Log the run summary and cache statistics")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="duplipicfinder",
+                                     description="Find duplicate images using perceptual hashing.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    scan = subparsers.add_parser("scan", help="Scan a folder for duplicate images",
+                                 description="Scan a folder for duplicate images. Exits with 0 if no duplicates were "
+                                             "found, 1 if duplicates were found, 2 on usage errors, 3 on errors and 4 "
+                                             "if some images could not be read.")
+    scan.add_argument("folder", help="Folder to scan")
+    scan.add_argument("--tolerance", type=int, default=5,
+                      help="Images whose hashes differ in fewer bits are duplicates (default: 5)")
+    add_hasher_arguments(scan)
+    add_verify_threshold_argument(scan)
+    scan.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE, help="Near-duplicate search engine")
+    add_hashing_arguments(scan)
+    scan.add_argument("--group", choices=LINKAGES + ("none",), default="single",
+                      help="Group duplicates (default: single), or stream raw pairs with 'none'")
+    scan.add_argument("--keeper", choices=KEEPER_POLICIES, default="largest",
+                      help="Image kept in each group: the largest file, the first found, the highest resolution, "
+                           "the oldest file or the one in a --prefer folder (default: largest)")
+    scan.add_argument("--prefer", action="append", metavar="FOLDER",
+                      help="Folder whose images are kept with --keeper folder; repeat in order of preference")
+    scan.add_argument("--delete", choices=("none", "dry-run", "apply"), default="none",
+                      help="Report (dry-run) or remove (apply) every image of a group that matches its keeper")
+    scan.add_argument("--delete-mode", choices=DELETE_MODES, default=DEFAULT_DELETE_MODE,
+                      help=f"Delete duplicates, move them to the quarantine folder or replace byte-identical ones "
+                           f"with hardlinks to their keeper (default: {DEFAULT_DELETE_MODE})")
+    scan.add_argument("--quarantine", metavar="FOLDER", default=DEFAULT_QUARANTINE_FOLDER,
+                      help=f"Folder for quarantined images and deletion journals "
+                           f"(default: {DEFAULT_QUARANTINE_FOLDER})")
+    scan.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl)")
+    scan.add_argument("--output", metavar="FILE", help="Write results to a file instead of stdout")
+    scan.add_argument("--save-index", metavar="FILE",
+                      help="Save the paths and hashes of the scanned images as a compact, memory-mappable index")
+    add_run_arguments(scan)
+    scan.set_defaults(handler=scan_command)
+
+    index = subparsers.add_parser("index", help="Build a reference library from a folder",
+                                  description="Hash a reference folder once and save it as a library that other "
+                                              "folders are checked against with 'query'. With --cache, rebuilding "
+                                              "only hashes new and changed images.")
+    index.add_argument("folder", help="Reference folder")
+    index.add_argument("index", help="Library file to write")
+    add_hasher_arguments(index)
+    add_hashing_arguments(index)
+    add_run_arguments(index)
+    index.set_defaults(handler=index_command, verify_threshold=None)
+
+    query = subparsers.add_parser("query", help="Check a folder against a reference library",
+                                  description="Check the images of a folder against a library built with 'index', "
+                                              "using the hashes of the library. Exits with 0 if no duplicates were "
+                                              "found, 1 if duplicates were found, 2 on usage errors, 3 on errors and "
+                                              "4 if some images could not be read.")
+    query.add_argument("index", help="Library file built with 'index'")
+    query.add_argument("folder", help="Folder to check")
+    query.add_argument("--tolerance", type=int, default=5,
+                       help="Images whose hashes differ in fewer bits are duplicates (default: 5)")
+    add_verify_threshold_argument(query)
+    query.add_argument("--within", action="store_true", help="Also report duplicates within the folder")
+    query.add_argument("--engine", choices=ENGINES, default=DEFAULT_ENGINE,
+                       help="Near-duplicate search engine used within the folder")
+    add_hashing_arguments(query)
+    query.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl)")
+    query.add_argument("--output", metavar="FILE", help="Write results to a file instead of stdout")
+    add_run_arguments(query)
+    query.set_defaults(handler=query_command)
+
+    undo = subparsers.add_parser("undo", help="Restore the images quarantined by 'scan --delete apply'",
+                                 description="Move the images quarantined by a deletion run back to their folders. "
+                                             "Deleted and hardlinked images cannot be restored.")
+    undo.add_argument("journal", nargs="?", help="Deletion journal of the run, by default the most recent one")
+    undo.add_argument("--quarantine", metavar="FOLDER", default=DEFAULT_QUARANTINE_FOLDER,
+                      help=f"Folder searched for the most recent journal (default: {DEFAULT_QUARANTINE_FOLDER})")
+    undo.add_argument("--format", choices=("jsonl", "csv"), default="jsonl", help="Output format (default: jsonl)")
+    undo.add_argument("--progress", action="store_true", help="Show progress on stderr")
+    undo.set_defaults(handler=undo_command)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    # Log messages go to stderr so stdout only carries results
+    logging.basicConfig(stream=sys.stderr, level=logging.INFO if getattr(args, "verbose", False) else logging.WARNING,
+                        format="%(levelname)s: %(message)s")
+    if args.command == "scan" and args.delete != "none" and args.group == "none":
+        parser.error("--delete needs grouped results, it cannot be combined with --group none")
+    if args.command == "scan" and args.keeper == "folder" and not args.prefer:
+        parser.error("--keeper folder needs at least one --prefer folder")
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # The reader of stdout went away (e.g. piped into head); silence the flush at interpreter exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return EXIT_ERROR
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+# clustering.py
+import os
+from collections import namedtuple
+from itertools import count
+from PIL import Image
+
+
+LINKAGES = ("single", "complete")
+KEEPER_POLICIES = ("largest", "first", "resolution", "oldest", "folder")
+
+DuplicateGroup = namedtuple("DuplicateGroup", ["keeper", "duplicates"])
+DuplicateGroup.__doc__ = """
+A set of near-identical images: ``keeper`` is the image to keep, ``duplicates`` a tuple of the others.
+"""
+
+
+class UnionFind:
+    """
+    Disjoint-set forest with path halving and union by size.
+    """
+
+    def __init__(self):
+        self._parent = {}
+        self._size = {}
+
+    def find(self, item):
+        if item not in self._parent:
+            self._parent[item] = item
+            self._size[item] = 1
+            return item
+        while self._parent[item] != item:
+            self._parent[item] = self._parent[self._parent[item]]
+            item = self._parent[item]
+        return item
+
+    def union(self, item1, item2):
+        root1, root2 = self.find(item1), self.find(item2)
+        if root1 == root2:
+            return root1
+        if self._size[root1] < self._size[root2]:
+            root1, root2 = root2, root1
+        self._parent[root2] = root1
+        self._size[root1] += self._size.pop(root2)
+        return root1
+
+    def groups(self):
+        """
+        Returns:
+            list: The members of every set. Members and sets are in first-seen order.
+        """
+        groups = {}
+        for item in self._parent:
+            groups.setdefault(self.find(item), []).append(item)
+        return list(groups.values())
+
+
+class IncrementalGroups:
+    """
+    Single-linkage groups of a growing list of duplicate pairs, for showing results while a scan runs.
+
+    Adding pairs only touches the groups they join, and ``groups`` only rebuilds the groups that changed
+    since it was last called. Groups keep the position of their oldest part; the keeper of a group is
+    its first-seen image, or its first protected one.
+    """
+
+    def __init__(self, protected=None):
+        """
+        Args:
+            protected (set): Paths that are never offered for deletion, see ``group_duplicates``. The set is
+                read when groups are rebuilt, so paths can be added to it while pairs arrive.
+        """
+        self.protected = protected if protected is not None else set()
+        self._union_find = UnionFind()
+        self._seen = {}
+        self._sequence = count()
+        # Members and group of every group by the number of its oldest part, and that number by union-find root
+        self._members = {}
+        self._groups = {}
+        self._numbers = {}
+        self._changed = set()
+
+    def _number(self, path):
+        if path not in self._seen:
+            self._seen[path] = len(self._seen)
+            number = next(self._sequence)
+            self._members[number] = [path]
+            self._groups[number] = None
+            self._numbers[self._union_find.find(path)] = number
+        return self._numbers[self._union_find.find(path)]
+
+    def add(self, pairs):
+        """
+        Args:
+            pairs (iterable): New ``(path1, path2)`` duplicate pairs.
+        """
+        for path1, path2 in pairs:
+            number1, number2 = self._number(path1), self._number(path2)
+            if number1 == number2:
+                continue
+            del self._numbers[self._union_find.find(path1)], self._numbers[self._union_find.find(path2)]
+            keep, drop = min(number1, number2), max(number1, number2)
+            first, second = self._members.pop(keep), self._members.pop(drop)
+            del self._groups[drop]
+            self._changed.discard(drop)
+            # The smaller group is appended to the larger one; ``groups`` restores the first-seen order
+            if len(first) < len(second):
+                first, second = second, first
+            first.extend(second)
+            self._members[keep] = first
+            self._numbers[self._union_find.union(path1, path2)] = keep
+            self._changed.add(keep)
+
+    def groups(self):
+        """
+        Returns:
+            list: ``DuplicateGroup`` tuples in the order the groups were first seen; groups left without
+            duplicates are dropped.
+        """
+        for number in self._changed:
+            members = self._members[number]
+            members.sort(key=self._seen.get)
+            keeper = next((member for member in members if member in self.protected), members[0])
+            duplicates = tuple(member for member in members if member != keeper and member not in self.protected)
+            self._groups[number] = DuplicateGroup(keeper, duplicates) if duplicates else None
+        self._changed.clear()
+        return [group for group in self._groups.values() if group is not None]
+
+
+def _complete_linkage(members, neighbours):
+    # Greedily split a connected component into cliques, so every image in a group matches every other one.
+    # A member joins the first clique it matches entirely; only cliques holding one of its neighbours can
+    # qualify, and it matches a clique entirely when the clique holds as many of its neighbours as members.
+    cliques = []
+    clique_of = {}
+    for member in sorted(members, key=lambda item: -len(neighbours[item])):
+        shared = {}
+        for neighbour in neighbours[member]:
+            index = clique_of.get(neighbour)
+            if index is not None:
+                shared[index] = shared.get(index, 0) + 1
+        index = min((index for index, count in shared.items() if count == len(cliques[index])), default=None)
+        if index is None:
+            index = len(cliques)
+            cliques.append([])
+        cliques[index].append(member)
+        clique_of[member] = index
+    order = {member: i for i, member in enumerate(members)}
+    return [sorted(clique, key=order.get) for clique in cliques]
+
+
+def cluster_pairs(pairs, linkage="single"):
+    """
+    Groups duplicate pairs into clusters of images.
+
+    Args:
+        pairs (iterable): ``(path1, path2)`` duplicate pairs.
+        linkage (str): ``"single"`` joins all connected images (union-find), ``"complete"`` only groups
+            images that all match each other.
+
+    Returns:
+        list: Lists of at least two paths, in first-seen order.
+    """
+    if linkage not in LINKAGES:
+        raise ValueError(f"Unknown linkage: {linkage}")
+
+    union_find = UnionFind()
+    neighbours = {}
+    for path1, path2 in pairs:
+        union_find.union(path1, path2)
+        if linkage == "complete":
+            neighbours.setdefault(path1, set()).add(path2)
+            neighbours.setdefault(path2, set()).add(path1)
+
+    clusters = union_find.groups()
+    if linkage == "complete":
+        clusters = [clique for cluster in clusters for clique in _complete_linkage(cluster, neighbours)]
+    return [cluster for cluster in clusters if len(cluster) > 1]
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return -1
+
+
+def _pixel_count(path):
+    # Only the image header is read
+    try:
+        with Image.open(path) as img:
+            return img.width * img.height
+    except Exception:
+        return -1
+
+
+def _modification_time(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return float("inf")
+
+
+def _folder_rank(path, preferred_folders):
+    # Position of the first preferred folder containing the image, after all of them if none does
+    for rank, folder in enumerate(preferred_folders):
+        if os.path.abspath(path).startswith(os.path.join(os.path.abspath(folder), "")):
+            return rank
+    return len(preferred_folders)
+
+
+def choose_keeper(members, policy="largest", preferred_folders=None):
+    """
+    Picks the image of a cluster that should be kept.
+
+    Ties keep the first-seen image.
+
+    Args:
+        members (list): The paths in the cluster.
+        policy (str): ``"largest"`` keeps the biggest file, ``"first"`` the first-seen image, ``"resolution"``
+            the image with the most pixels, ``"oldest"`` the least recently modified file and ``"folder"``
+            the image in the first of ``preferred_folders`` containing any, the biggest file among several.
+        preferred_folders (list): Folders in order of preference, for the ``"folder"`` policy.
+
+    Returns:
+        str: The path to keep.
+    """
+    if policy == "first":
+        return members[0]
+    # max() and min() return the first of equal members
+    if policy == "largest":
+        return max(members, key=_file_size)
+    if policy == "resolution":
+        return max(members, key=_pixel_count)
+    if policy == "oldest":
+        return min(members, key=_modification_time)
+    if policy == "folder":
+        ranks = {member: _folder_rank(member, preferred_folders or []) for member in members}
+        best = min(ranks.values())
+        return max((member for member in members if ranks[member] == best), key=_file_size)
+    raise ValueError(f"Unknown keeper policy: {policy}")
+
+
+def group_duplicates(pairs, linkage="single", keeper_policy="largest", protected=None, preferred_folders=None):
+    """
+    Turns duplicate pairs into groups with a keeper each.
+
+    Args:
+        pairs (iterable): ``(path1, path2)`` duplicate pairs.
+        linkage (str): One of ``LINKAGES``, see ``cluster_pairs``.
+        keeper_policy (str): One of ``KEEPER_POLICIES``, see ``choose_keeper``.
+        protected (set): Optional paths that must never be offered for deletion, such as the images of a
+            reference library. The keeper is chosen among them where a group has any, and the others
+            are left out of the group's duplicates.
+        preferred_folders (list): Folders in order of preference, for the ``"folder"`` keeper policy.
+
+    Returns:
+        list: ``DuplicateGroup`` tuples; groups left without duplicates are dropped.
+    """
+    protected = protected or set()
+    groups = []
+    for members in cluster_pairs(pairs, linkage):
+        keepers = [member for member in members if member in protected] or members
+        keeper = choose_keeper(keepers, keeper_policy, preferred_folders)
+        duplicates = tuple(member for member in members if member != keeper and member not in protected)
+        if duplicates:
+            groups.append(DuplicateGroup(keeper, duplicates))
+    return groups
@@ -0,0 +1,244 @@
+# deletion.py
+import json
+import logging
+import os
+import shutil
+from datetime import datetime
+from .file_digest import full_digest
+from .instrumentation import ProgressReporter
+from .scan_job import ScanCancelled
+
+
+logger = logging.getLogger(__name__)
+
+DELETE_MODES = ("delete", "quarantine", "hardlink")
+DEFAULT_DELETE_MODE = "quarantine"
+DEFAULT_QUARANTINE_FOLDER = "quarantine"
+# Images removed between progress updates, journal syncs and checks for cancellation
+DEFAULT_BATCH_SIZE = 64
+JOURNAL_PREFIX = "journal-"
+JOURNAL_SUFFIX = ".jsonl"
+# What each mode records in the journal and reports as the action taken
+_DONE = {'delete': "deleted", 'quarantine': "quarantined", 'hardlink': "hardlinked"}
+
+
+def latest_journal(quarantine_folder):
+    """
+    Returns the journal of the most recent deletion run in a quarantine folder, or None if there is none.
+    """
+    try:
+        names = [name for name in os.listdir(quarantine_folder)
+                 if name.startswith(JOURNAL_PREFIX) and name.endswith(JOURNAL_SUFFIX)]
+    except OSError:
+        return None
+    # Journal names start with their timestamp, so they sort chronologically
+    return os.path.join(quarantine_folder, max(names)) if names else None
+
+
+def read_journal(filename):
+    """
+    Returns:
+        list: The entries of a deletion journal as dicts, in the order they were written.
+    """
+    entries = []
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A run that crashed mid-write leaves a truncated last line
+                    logger.warning("Skipping a damaged entry of %s", filename)
+    return entries
+
+
+class DeletionEngine:
+    """
+    Removes the duplicates of duplicate groups in batches, keeping each group's keeper.
+
+    Duplicates are deleted, moved to a quarantine folder, or replaced with a hardlink to their keeper,
+    which frees their space at once while their paths keep working. Every removal is written to a
+    journal in the quarantine folder as soon as it happens; ``undo`` moves quarantined images back.
+    A group whose keeper no longer exists is skipped, so the last copy of an image is never removed,
+    and only byte-identical duplicates are replaced with hardlinks, since a link shows the keeper's content.
+    """
+
+    def __init__(self, mode=DEFAULT_DELETE_MODE, quarantine_folder=DEFAULT_QUARANTINE_FOLDER,
+                 batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Args:
+            mode (str): One of ``DELETE_MODES``.
+            quarantine_folder (str): Where quarantined images and the journals of every run are kept.
+            batch_size (int): Number of images removed between progress updates and journal syncs.
+        """
+        if mode not in DELETE_MODES:
+            raise ValueError(f"Unknown delete mode: {mode}")
+        self.mode = mode
+        self.quarantine_folder = quarantine_folder
+        self.batch_size = max(1, batch_size)
+        self.journal_path = None
+
+    def run(self, groups, progress_callback=None, job=None, dry_run=False, pairs=None):
+        """
+        Removes the duplicates of every group.
+
+        Args:
+            groups (iterable): ``clustering.DuplicateGroup`` tuples.
+            progress_callback (function): Optionally called with ``(current, total, percent, phase, eta)`` after
+                every batch, the phase being the mode.
+            job (scan_job.ScanJob): Optionally checked after every batch; a cancelled run stops there and
+                returns what was done until then.
+            dry_run (bool): Whether to only report what would be done, e.g. ``"would-quarantine"``.
+            pairs (iterable): The ``(path1, path2)`` duplicate pairs the groups were built from. When given, only
+                duplicates paired with their keeper itself are removed; with single linkage a group can chain
+                images that are far more than the tolerance apart, and those are skipped.
+
+        Returns:
+            dict: The action taken per duplicate path: ``"deleted"``, ``"quarantined"``, ``"hardlinked"``,
+            ``"skipped"`` or ``"failed"``. Skipped images were left alone on purpose, e.g. because they do not
+            match their keeper, and are logged at info level rather than as errors.
+        """
+        tasks = [(group.keeper, path) for group in groups for path in group.duplicates]
+        unmatched = set()
+        if pairs is not None:
+            matched = {tuple(sorted(pair)) for pair in pairs}
+            unmatched = {path for keeper, path in tasks if tuple(sorted((keeper, path))) not in matched}
+        progress = ProgressReporter(progress_callback, self.mode, len(tasks)) if progress_callback else None
+        actions = {}
+        digests = {}
+        if dry_run:
+            for keeper, path in tasks:
+                removable = os.path.exists(keeper) and path not in unmatched
+                if removable and self.mode == "hardlink":
+                    try:
+                        removable = self._identical(keeper, path, digests)
+                    except OSError:
+                        removable = False
+                actions[path] = f"would-{self.mode}" if removable else "skipped"
+            return actions
+        if not tasks:
+            return actions
+
+        os.makedirs(self.quarantine_folder, exist_ok=True)
+        run_id = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        run_folder = os.path.join(self.quarantine_folder, run_id)
+        self.journal_path = os.path.join(self.quarantine_folder, JOURNAL_PREFIX + run_id + JOURNAL_SUFFIX)
+        keepers = {}
+        with open(self.journal_path, "a") as journal:
+            try:
+                for start in range(0, len(tasks), self.batch_size):
+                    for keeper, path in tasks[start:start + self.batch_size]:
+                        if path in unmatched:
+                            logger.info("Not removing %s, it is not a duplicate of its keeper %s itself", path, keeper)
+                            actions[path] = "skipped"
+                            continue
+                        if keeper not in keepers:
+                            keepers[keeper] = os.path.exists(keeper)
+                        actions[path] = self._remove(keeper, path, keepers[keeper], run_folder, journal, digests)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+                    if progress is not None:
+                        progress.update(len(actions))
+                    if job is not None:
+                        job.check()
+            except ScanCancelled:
+                logger.info("Deletion cancelled after %d of %d images", len(actions), len(tasks))
+        return actions
+
+    def _remove(self, keeper, path, keeper_exists, run_folder, journal, digests):
+        if not keeper_exists:
+            logger.info("Not removing %s, its keeper %s no longer exists", path, keeper)
+            return "skipped"
+        if not os.path.lexists(path):
+            return "skipped"
+        entry = {'action': _DONE[self.mode], 'path': path, 'keeper': keeper}
+        try:
+            if self.mode == "delete":
+                os.remove(path)
+            elif self.mode == "quarantine":
+                entry['target'] = self._quarantine_target(run_folder, path)
+                os.makedirs(os.path.dirname(entry['target']), exist_ok=True)
+                shutil.move(path, entry['target'])
+            else:
+                if os.path.samefile(path, keeper):
+                    return "skipped"
+                if not self._identical(keeper, path, digests):
+                    logger.info("Not hardlinking %s, its content differs from its keeper %s", path, keeper)
+                    return "skipped"
+                # Link under a temporary name first, so the duplicate is only replaced once the link exists
+                temporary = path + ".dpf-link"
+                os.link(keeper, temporary)
+                try:
+                    os.replace(temporary, path)
+                except OSError:
+                    os.remove(temporary)
+                    raise
+        except OSError as e:
+            logger.error("Error removing %s: %s", path, e, extra={'path': path, 'phase': "delete"})
+            return "failed"
+        journal.write(json.dumps(entry) + "\n")
+        return entry['action']
+
+    @staticmethod
+    def _identical(keeper, path, digests):
+        # Keepers usually have several duplicates, so their digests are kept for the whole run
+        if keeper not in digests:
+            digests[keeper] = full_digest(keeper)
+        return full_digest(path) == digests[keeper]
+
+    @staticmethod
+    def _quarantine_target(run_folder, path):
+        # The absolute path is mirrored below the run folder, so equally named images from different folders
+        # do not collide and everyone can see where a quarantined image came from
+        drive, rest = os.path.splitdrive(os.path.abspath(path))
+        return os.path.join(run_folder, drive.replace(":", ""), rest.lstrip("\\/"))
+
+    @staticmethod
+    def undo(journal_path, progress_callback=None, job=None):
+        """
+        Moves the images a run quarantined back to where they were, newest first.
+
+        Deleted images and images replaced with hardlinks cannot be restored. Restored images are recorded
+        in the journal, so undoing a run again only retries the images that could not be restored.
+
+        Args:
+            journal_path (str): The journal of the run, see ``latest_journal``.
+            progress_callback (function): Optionally called with ``(current, total, percent, phase, eta)``.
+            job (scan_job.ScanJob): Optionally checked after every image; a cancelled undo stops there.
+
+        Returns:
+            dict: The outcome per path: ``"restored"``, ``"irreversible"``, ``"exists"`` if another file took
+            its place, or ``"failed"``.
+        """
+        entries = read_journal(journal_path)
+        restored = {entry['path'] for entry in entries if entry['action'] == "restored"}
+        entries = [entry for entry in reversed(entries) if entry['action'] != "restored"
+                   and entry['path'] not in restored]
+        progress = ProgressReporter(progress_callback, "undo", len(entries)) if progress_callback else None
+        outcomes = {}
+        with open(journal_path, "a") as journal:
+            try:
+                for entry in entries:
+                    path = entry['path']
+                    if entry['action'] != "quarantined":
+                        outcomes[path] = "irreversible"
+                    elif os.path.lexists(path):
+                        outcomes[path] = "exists"
+                    else:
+                        try:
+                            os.makedirs(os.path.dirname(path), exist_ok=True)
+                            shutil.move(entry['target'], path)
+                            journal.write(json.dumps({'action': "restored", 'path': path}) + "\n")
+                            journal.flush()
+                            outcomes[path] = "restored"
+                        except OSError as e:
+                            logger.error("Error restoring %s: %s", path, e, extra={'path': path, 'phase': "undo"})
+                            outcomes[path] = "failed"
+                    if progress is not None:
+                        progress.update(len(outcomes))
+                    if job is not None:
+                        job.check()
+            except ScanCancelled:
+                logger.info("Undo cancelled after %d of %d images", len(outcomes), len(entries))
+        return outcomes
@@ -0,0 +1,171 @@
+# file_digest.py
+import hashlib
+import logging
+import os
+
+
+logger = logging.getLogger(__name__)
+
+# Bytes read from each end of a file for the partial digest
+PARTIAL_SIZE = 64 * 1024
+# Chunk size used when reading whole files
+READ_SIZE = 1024 * 1024
+
+
+def partial_digest(path, size):
+    """
+    Digests the first and last ``PARTIAL_SIZE`` bytes of a file.
+
+    Args:
+        path (str): The file path.
+        size (int): The file size in bytes.
+
+    Returns:
+        bytes: The BLAKE2b digest.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        digest.update(f.read(PARTIAL_SIZE))
+        if size > 2 * PARTIAL_SIZE:
+            f.seek(size - PARTIAL_SIZE)
+            digest.update(f.read(PARTIAL_SIZE))
+        else:
+            digest.update(f.read())
+    return digest.digest()
+
+
+def full_digest(path):
+    """
+    Digests the whole content of a file in ``READ_SIZE`` chunks.
+
+    Args:
+        path (str): The file path.
+
+    Returns:
+        bytes: The BLAKE2b digest.
+    """
+    digest = hashlib.blake2b()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _refine(buckets, key_function):
+    refined = {}
+    for bucket_key, paths in buckets.items():
+        if len(paths) < 2:
+            continue
+        for path in paths:
+            try:
+                key = key_function(path, bucket_key)
+            except OSError as e:
+                logger.warning("Error reading %s: %s", path, e, extra={'path': path, 'phase': "digest"})
+                continue
+            refined.setdefault((bucket_key, key), []).append(path)
+    return refined
+
+
+class IdenticalFiles:
+    """
+    Finds byte-identical files among files added over several calls, e.g. the batches of a scan.
+
+    Files are bucketed by size first, so only files sharing a size are read at all; those are then
+    split by a digest of their first and last bytes, and only the remaining candidates are read in full.
+    Buckets and digests are kept, so the files of a call are also matched against those of earlier
+    calls without reading any file twice. Of each content only the first file is kept, so copies
+    found by a call take no memory afterwards.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+        self._partial = {}
+        self._full = {}
+        self._unreadable = set()
+
+    def _digest(self, digests, path, function, *args):
+        if path not in digests:
+            try:
+                digests[path] = function(path, *args)
+            except OSError:
+                # Logged by ``_refine``; the file is left out of later calls
+                self._unreadable.add(path)
+                raise
+        return digests[path]
+
+    def add(self, paths, sizes=None, report=None):
+        """
+        Adds files and finds the ones identical to each other or to files added before.
+
+        Args:
+            paths (list): The file paths.
+            sizes (list): Optional file sizes matching ``paths``; files are stat'ed when missing.
+            report (instrumentation.ScanReport): Optionally counts the files and bytes read.
+
+        Returns:
+            list: Lists of identical paths that include files of this call. Each starts with the first
+            file added with that content, followed by the files of this call in the order of ``paths``.
+        """
+        added = {}
+        for i, path in enumerate(paths):
+            size = sizes[i] if sizes is not None else None
+            if size is None:
+                try:
+                    size = os.path.getsize(path)
+                except OSError as e:
+                    logger.warning("Error reading %s: %s", path, e, extra={'path': path, 'phase': "digest"})
+                    continue
+            self._buckets.setdefault(size, []).append(path)
+            added[path] = size
+
+        def partial(path, size):
+            if report is not None and path not in self._partial:
+                report.count("digest_partial_reads")
+                report.count("digest_bytes_read", min(size, 2 * PARTIAL_SIZE))
+            return self._digest(self._partial, path, partial_digest, size)
+
+        def full(path, key):
+            # Files no larger than two partial reads were already digested in full
+            if key[0] <= 2 * PARTIAL_SIZE:
+                return b""
+            if report is not None and path not in self._full:
+                report.count("digest_full_reads")
+                report.count("digest_bytes_read", key[0])
+            return self._digest(self._full, path, full_digest)
+
+        buckets = {size: [path for path in self._buckets[size] if path not in self._unreadable]
+                   for size in set(added.values())}
+        buckets = _refine(buckets, partial)
+        buckets = _refine(buckets, full)
+
+        order = {path: i for i, path in enumerate(paths)}
+        groups = []
+        copies = set()
+        for bucket in buckets.values():
+            group = bucket[:1] + [path for path in bucket[1:] if path in added]
+            if len(group) > 1:
+                groups.append(group)
+            copies.update(bucket[1:])
+        # Later copies are matched against the first file of their content, so the others are forgotten
+        for size in {added[path] for path in copies if path in added}:
+            self._buckets[size] = [path for path in self._buckets[size] if path not in copies]
+        for path in copies:
+            self._partial.pop(path, None)
+            self._full.pop(path, None)
+        groups.sort(key=lambda group: order[group[0] if group[0] in added else group[1]])
+        return groups
+
+
+def find_identical_files(paths, sizes=None, report=None):
+    """
+    Finds byte-identical files, see ``IdenticalFiles``.
+
+    Args:
+        paths (list): The file paths.
+        sizes (list): Optional file sizes matching ``paths``; files are stat'ed when missing.
+        report (instrumentation.ScanReport): Optionally counts the files and bytes read.
+
+    Returns:
+        list: Lists of at least two identical paths, in the order of ``paths``.
+    """
+    return IdenticalFiles().add(paths, sizes, report)
@@ -0,0 +1,734 @@
+import tkinter as tk
+import customtkinter as ctk
+from tkinter import filedialog, messagebox
+from PIL import ImageTk
+import logging
+import queue
+from functools import partial
+from .clustering import IncrementalGroups, group_duplicates
+from .deletion import DeletionEngine, latest_journal
+from .instrumentation import ScanReport, format_duration
+from .preferences import PreferencesManager
+from .reference_library import ReferenceLibrary
+from .results_view import ResultsView
+from .scan_job import ScanCancelled, ScanCheckpoint, ScanJob
+from .scan_session import ScanSession
+from .thumbnails import ThumbnailLoader
+
+# How often the UI thread drains events posted by the scan thread
+SCAN_POLL_INTERVAL_MS = 50
+# What the progress label calls each phase of a scan
+PHASE_LABELS = {'digest': "Comparing file contents", 'hash': "Hashing", 'delete': "Deleting",
+                'quarantine': "Moving to quarantine", 'hardlink': "Replacing with hardlinks", 'undo': "Restoring"}
+# Actions of ``DeletionEngine.run`` after which an image is gone from its folder
+REMOVED_ACTIONS = ("deleted", "quarantined", "hardlinked")
+# Confirmation asked before removing the duplicates of the selected groups, per delete mode
+DELETE_PROMPTS = {
+    'delete': "Are you sure you want to delete the {count} duplicates in the {groups} selected groups?",
+    'quarantine': "Move the {count} duplicates in the {groups} selected groups to the quarantine folder? "
+                  "File > Undo Last Deletion moves them back.",
+    'hardlink': "Replace the {count} duplicates in the {groups} selected groups with hardlinks to their keepers? "
+                "This frees their space at once and cannot be undone.",
+}
+LIBRARY_EXTENSION = ".dpflib"
+
+logger = logging.getLogger(__name__)
+
+
+def show_about():
+    messagebox.showinfo("About", "Dupli Pic Finder v0.5.0")
+
+
+class DupliPicFinderApp:
+    def __init__(self, root):
+        self.next_button = None
+        self.page_label = None
+        self.prev_button = None
+        self.pagination_frame = None
+        self.results_view = None
+        self.progress_label = None
+        self.progress_bar = None
+        self.select_all_button = None
+        self.cancel_button = None
+        self.pause_button = None
+        self.delete_all_button = None
+        self.select_button = None
+        self.controls_frame = None
+        self.root = root
+        self.current_page = 0
+        self.total_items = 0
+        self.unique_duplicates = []
+        self.selected_for_deletion = set()
+        self.select_all_state = False
+        self.scan_session = None
+        self.scan_job = None
+        self.library_check = None
+        self.protected_paths = set()
+        self.scan_events = queue.Queue()
+        self.found_pairs = []
+        self.known_pairs = set()
+        self.live_groups = None
+        self.thumbnail_loader = None
+        self.thumbnail_poll = None
+        self.scan_report = None
+        self.preferences_manager = PreferencesManager()
+
+        # Initialize the GUI components
+        self.initialize_gui()
+        self.preferences_manager.load_preferences()
+        self.thumbnail_loader = ThumbnailLoader(**self.preferences_manager.thumbnail_options())
+
+    def close(self):
+        # Stop the thumbnail threads and drop their queue before the window goes away
+        if self.scan_job is not None:
+            self.scan_job.cancel()
+        if self.thumbnail_loader is not None:
+            self.thumbnail_loader.shutdown()
+        self.root.destroy()
+
+    def initialize_gui(self):
+        # Set window title and size
+        self.root.title("DupliPicFinder")
+        self.root.geometry("1200x800")
+        self.root.protocol("WM_DELETE_WINDOW", self.close)
+
+        # Create and configure the menu bar
+        menu_bar = tk.Menu(self.root)
+        self.root.config(menu=menu_bar)
+
+        file_menu = tk.Menu(menu_bar, tearoff=0)
+        file_menu.add_command(label="Select Folder", command=self.select_folder)
+        file_menu.add_command(label="Refresh", command=self.refresh_folder)
+        file_menu.add_command(label="Undo Last Deletion", command=self.undo_last_deletion)
+        file_menu.add_separator()
+        file_menu.add_command(label="Build Reference Library...", command=self.build_library)
+        file_menu.add_command(label="Check Folder Against Library...", command=self.check_against_library)
+        file_menu.add_separator()
+        file_menu.add_command(label="Save Scan Report...", command=self.save_scan_report)
+        file_menu.add_separator()
+        file_menu.add_command(label="Exit", command=self.close)
+        menu_bar.add_cascade(label="File", menu=file_menu)
+
+        preferences_menu = tk.Menu(menu_bar, tearoff=0)
+        preferences_menu.add_command(label="Preferences", command=self.open_preferences)
+        menu_bar.add_cascade(label="Preferences", menu=preferences_menu)
+
+        help_menu = tk.Menu(menu_bar, tearoff=0)
+        help_menu.add_command(label="Help", command=self.show_help)
+        help_menu.add_command(label="About", command=show_about)
+        menu_bar.add_cascade(label="Help", menu=help_menu)
+
+        # Initialize control buttons and progress bar
+        self.controls_frame = ctk.CTkFrame(self.root)
+        self.controls_frame.grid(row=0, column=0, padx=10, pady=10, sticky='ew')
+        self.controls_frame.grid_columnconfigure(0, weight=1)
+
+        self.select_button = ctk.CTkButton(self.controls_frame, text="Select Folder", command=self.select_folder)
+        self.select_button.grid(row=0, column=0, pady=10, padx=5, sticky='ew')
+
+        self.delete_all_button = ctk.CTkButton(self.controls_frame, text="Delete Selected", command=self.delete_selected_images)
+        self.delete_all_button.grid(row=0, column=1, pady=10, padx=5, sticky='ew')
+
+        self.select_all_button = ctk.CTkButton(self.controls_frame, text="Select All", command=self.select_all_images)
+        self.select_all_button.grid(row=0, column=2, pady=10, padx=5, sticky='ew')
+
+        self.pause_button = ctk.CTkButton(self.controls_frame, text="Pause", command=self.toggle_pause,
+                                          state=tk.DISABLED)
+        self.pause_button.grid(row=0, column=3, pady=10, padx=5, sticky='ew')
+
+        self.cancel_button = ctk.CTkButton(self.controls_frame, text="Cancel", command=self.cancel_scan,
+                                           state=tk.DISABLED)
+        self.cancel_button.grid(row=0, column=4, pady=10, padx=5, sticky='ew')
+
+        self.progress_bar = ctk.CTkProgressBar(self.root, width=500)
+        self.progress_bar.grid(row=1, column=0, pady=5, padx=10, sticky='ew')
+
+        self.progress_label = ctk.CTkLabel(self.root, text="0/0 images")
+        self.progress_label.grid(row=2, column=0, pady=5, padx=10, sticky='ew')
+
+        # Initialize the results list; it only creates widgets for the rows on screen
+        self.results_view = ResultsView(self.root, lambda group: group in self.selected_for_deletion,
+                                        self.toggle_selection, self.get_thumbnail, self.view_image,
+                                        self.request_thumbnails)
+        self.results_view.grid(row=3, column=0, padx=10, pady=10, sticky='nsew')
+
+        # Initialize pagination controls
+        self.pagination_frame = ctk.CTkFrame(self.root)
+        self.pagination_frame.grid(row=5, column=0, pady=10, padx=10, sticky='ew')
+        self.pagination_frame.grid_columnconfigure(0, weight=1)
+
+        pagination_inner_frame = tk.Frame(self.pagination_frame)
+        pagination_inner_frame.pack(expand=True, anchor='center')
+
+        self.prev_button = ctk.CTkButton(pagination_inner_frame, text="Previous", command=self.prev_page)
+        self.prev_button.pack(side=tk.LEFT, padx=5)
+
+        self.page_label = ctk.CTkLabel(pagination_inner_frame, text="Page 1")
+        self.page_label.pack(side=tk.LEFT, padx=5)
+
+        self.next_button = ctk.CTkButton(pagination_inner_frame, text="Next", command=self.next_page)
+        self.next_button.pack(side=tk.LEFT, padx=5)
+
+        # Initialize status bar
+        status_bar = tk.Label(self.root, text="Ready", bd=1, relief=tk.SUNKEN, anchor=tk.W)
+        status_bar.grid(row=6, column=0, padx=10, pady=5, sticky='ew')
+
+        # Configure grid rows and columns
+        self.root.grid_rowconfigure(3, weight=1)
+        self.root.grid_columnconfigure(0, weight=1)
+
+        # Bind mouse wheel event for scrolling
+        self.root.bind_all("<MouseWheel>", self.on_mouse_wheel)
+        self.root.bind_all("<Button-4>", self.on_mouse_wheel)
+        self.root.bind_all("<Button-5>", self.on_mouse_wheel)
+
+    def group_results(self, pairs, protected):
+        # Runs on the job thread: choosing keepers stats and may open every grouped image, which would stall the UI
+        pairs = list(dict.fromkeys(tuple(sorted(pair)) for pair in pairs))
+        return pairs, group_duplicates(pairs, self.preferences_manager.linkage, self.preferences_manager.keeper_policy,
+                                       protected, self.preferences_manager.preferred_folders)
+
+    def on_find_duplicates_complete(self, results):
+        # ``results`` are the pairs and groups from ``group_results``
+        self.found_pairs, self.unique_duplicates = results
+        self.known_pairs = set(self.found_pairs)
+        # Keepers change once the scan completes, so selections of groups that no longer exist are dropped
+        self.selected_for_deletion &= set(self.unique_duplicates)
+        self.total_items = len(self.unique_duplicates)
+        self.current_page = min(self.current_page, max(0, (self.total_items - 1) // self.preferences_manager.items_per_page))
+        self.update_pagination()
+        self.load_page(self.current_page)
+        self.select_button.configure(state=tk.NORMAL)
+        self.progress_label.configure(text=f"{self.total_items} duplicate groups")
+        self.progress_bar.set(1)
+
+    def load_page(self, page_number, reset_scroll=False):
+        start_index = page_number * self.preferences_manager.items_per_page
+        end_index = min(start_index + self.preferences_manager.items_per_page, self.total_items)
+        self.results_view.set_items(self.unique_duplicates[start_index:end_index], start_index, reset_scroll)
+
+    def get_thumbnail(self, image_path):
+        if self.thumbnail_loader is None or not self.preferences_manager.show_thumbnails:
+            return None
+        return self.thumbnail_loader.get(image_path)
+
+    def request_thumbnails(self):
+        # Called after every redraw of the results; work queued for rows scrolled away is dropped
+        if self.thumbnail_loader is None or not self.preferences_manager.show_thumbnails:
+            return
+        self.thumbnail_loader.cancel_pending()
+        self.thumbnail_loader.request(self.results_view.visible_paths())
+
+        # Prefetch the next screen of this page and the first screen of the next one
+        visible = self.results_view.visible_rows()
+        items_per_page = self.preferences_manager.items_per_page
+        start_index = self.current_page * items_per_page
+        end_index = start_index + items_per_page
+        next_screen = start_index + self.results_view.first + visible
+        for first, last in ((next_screen, min(next_screen + visible, end_index)), (end_index, end_index + visible)):
+            for group in self.unique_duplicates[first:last]:
+                self.thumbnail_loader.request(self.results_view.row_paths(group))
+
+        if self.thumbnail_poll is None and self.thumbnail_loader.busy:
+            self.thumbnail_poll = self.root.after(SCAN_POLL_INTERVAL_MS, self.process_thumbnail_events)
+
+    def process_thumbnail_events(self):
+        # Runs on the UI thread, which is the only one creating Tk images from the generated thumbnails
+        loaded = self.thumbnail_loader.process_results()
+        if loaded and not set(loaded).isdisjoint(self.results_view.visible_paths()):
+            self.results_view.refresh_thumbnails()
+        if self.thumbnail_loader.busy:
+            self.thumbnail_poll = self.root.after(SCAN_POLL_INTERVAL_MS, self.process_thumbnail_events)
+        else:
+            self.thumbnail_poll = None
+
+    def toggle_selection(self, dup):
+        # Only the clicked row is updated, by the results view itself
+        if dup in self.selected_for_deletion:
+            self.selected_for_deletion.discard(dup)
+        else:
+            self.selected_for_deletion.add(dup)
+
+    def update_pagination(self):
+        self.page_label.configure(text=f"Page {self.current_page + 1} of {-(self.total_items // -self.preferences_manager.items_per_page)}")
+        self.prev_button.configure(state=tk.NORMAL if self.current_page > 0 else tk.DISABLED)
+        self.next_button.configure(
+            state=tk.NORMAL if self.current_page < (self.total_items - 1) // self.preferences_manager.items_per_page else tk.DISABLED)
+
+    def next_page(self):
+        if self.current_page < (self.total_items - 1) // self.preferences_manager.items_per_page:
+            self.current_page += 1
+            self.root.after(0, self.load_page, self.current_page, True)
+            self.update_pagination()
+
+    def prev_page(self):
+        if self.current_page > 0:
+            self.current_page -= 1
+            self.root.after(0, self.load_page, self.current_page, True)
+            self.update_pagination()
+
+    def update_progress(self, current, total, progress, phase=None, eta=None):
+        self.progress_bar.set(progress / 100)
+        text = f"{PHASE_LABELS.get(phase, 'Processing')}: {current}/{total} images"
+        if eta is not None:
+            text += f", {format_duration(eta)} left"
+        if self.scan_job is not None and self.scan_job.paused:
+            text += " (paused)"
+        self.progress_label.configure(text=text)
+
+    def on_duplicates_found(self, duplicates):
+        new_pairs = []
+        for dup in duplicates:
+            dup = tuple(sorted(dup))
+            if dup not in self.known_pairs:
+                self.known_pairs.add(dup)
+                self.found_pairs.append(dup)
+                new_pairs.append(dup)
+
+        # Keepers and the linkage are only applied once the scan completes; until then the groups are updated
+        # with the new pairs alone, joined by single linkage and showing their first-seen image
+        items_per_page = self.preferences_manager.items_per_page
+        start_index = self.current_page * items_per_page
+        visible = self.unique_duplicates[start_index:start_index + items_per_page]
+        self.live_groups.add(new_pairs)
+        self.unique_duplicates = self.live_groups.groups()
+        self.total_items = len(self.unique_duplicates)
+        self.update_pagination()
+        if self.unique_duplicates[start_index:start_index + items_per_page] != visible:
+            self.load_page(self.current_page)
+
+    def process_scan_events(self):
+        # Runs on the UI thread; the scan thread only ever puts events on the queue
+        progress = None
+        duplicates = []
+        result = None
+        cancelled = False
+        failed = False
+        removal = None
+        try:
+            while result is None:
+                event, payload = self.scan_events.get_nowait()
+                if event == "progress":
+                    progress = payload
+                elif event == "duplicate":
+                    duplicates.append(payload)
+                elif event == "report":
+                    self.scan_report = payload
+                elif event == "protected":
+                    self.protected_paths.add(payload)
+                elif event == "info":
+                    messagebox.showinfo("Reference Library", payload)
+                elif event == "error":
+                    messagebox.showerror("Error", payload)
+                elif event == "cancelled":
+                    cancelled = True
+                elif event == "failed":
+                    failed = True
+                elif event in ("deleted", "restored"):
+                    removal = event
+                    result = payload
+                else:
+                    result = payload
+        except queue.Empty:
+            pass
+
+        if progress is not None:
+            self.update_progress(*progress)
+        if duplicates:
+            self.on_duplicates_found(duplicates)
+        if result is None:
+            self.root.after(SCAN_POLL_INTERVAL_MS, self.process_scan_events)
+            return
+        self.scan_job = None
+        self.pause_button.configure(state=tk.DISABLED, text="Pause")
+        self.cancel_button.configure(state=tk.DISABLED)
+        if removal == "deleted":
+            self.on_deletion_complete(result)
+        elif removal == "restored":
+            self.on_undo_complete(result)
+        else:
+            self.on_find_duplicates_complete(result)
+            if cancelled:
+                self.progress_label.configure(text=f"Scan cancelled, {self.total_items} duplicate groups found so far")
+            elif failed:
+                self.progress_label.configure(text=f"Scan failed, {self.total_items} duplicate groups found before "
+                                                   f"the error")
+
+    def run_scan(self, scan, report, report_file, found, protected, job):
+        # Runs on the scan thread, so results are marshalled to the UI thread through the event queue.
+        # ``found`` collects the pairs as they arrive and ``protected`` the paths that must be kept.
+        pairs = None
+
+        def duplicate_callback(dup):
+            found.append(dup)
+            self.scan_events.put(("duplicate", dup))
+
+        try:
+            with report.run():
+                pairs = scan(lambda *progress: self.scan_events.put(("progress", progress)), duplicate_callback,
+                             report, job)
+        except ScanCancelled:
+            logger.info("Scan cancelled")
+            self.scan_events.put(("cancelled", None))
+        except Exception as e:
+            # E.g. a hashing process died or the cache broke; what was found until then is still shown
+            logger.exception("Scan failed")
+            self.scan_events.put(("error", f"The scan failed: {e}"))
+            self.scan_events.put(("failed", None))
+        else:
+            logger.info(report.summary())
+            if report_file:
+                try:
+                    report.save(report_file)
+                except OSError as e:
+                    logger.error("Failed to save the scan report to %s: %s", report_file, e)
+        finally:
+            # Keep what was matched before a scan stopped; a session scan is continued with File > Refresh
+            if pairs is None:
+                pairs = self.scan_session.duplicates() if self.scan_session is not None else found
+            self.scan_events.put(("report", report))
+            self.scan_events.put(("complete", self.group_results(pairs, protected)))
+
+    def save_scan_report(self):
+        if self.scan_report is None:
+            messagebox.showinfo("Scan Report", "There is no scan report yet, please scan a folder first.")
+            return
+        filename = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON", "*.json")])
+        if not filename:
+            return
+        try:
+            self.scan_report.save(filename)
+        except OSError as e:
+            messagebox.showerror("Error", f"Failed to save the scan report: {e}")
+
+    def view_image(self, image_path):
+        # The image is decoded in the background; the window opens once it is ready
+        future = self.thumbnail_loader.load_preview(image_path)
+        self.root.after(SCAN_POLL_INTERVAL_MS, self.show_image, image_path, future)
+
+    def show_image(self, image_path, future):
+        if not future.done():
+            self.root.after(SCAN_POLL_INTERVAL_MS, self.show_image, image_path, future)
+            return
+        try:
+            img = future.result()
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to open {image_path}: {e}")
+            return
+        top = tk.Toplevel(self.root)
+        top.title(image_path)
+        img = ImageTk.PhotoImage(img)
+        label = tk.Label(top, image=img)
+        label.image = img
+        label.pack()
+
+    def scan_running(self):
+        if self.scan_job is None:
+            return False
+        messagebox.showinfo("Scan Running", "Please wait for the current scan to finish or cancel it first.")
+        return True
+
+    def toggle_pause(self):
+        if self.scan_job is None:
+            return
+        if self.scan_job.paused:
+            self.scan_job.resume()
+            self.pause_button.configure(text="Pause")
+        else:
+            self.scan_job.pause()
+            self.pause_button.configure(text="Resume")
+            self.progress_label.configure(text=self.progress_label.cget("text") + " (paused)")
+
+    def cancel_scan(self):
+        if self.scan_job is not None:
+            self.scan_job.cancel()
+            self.cancel_button.configure(state=tk.DISABLED)
+            self.progress_label.configure(text="Cancelling...")
+
+    def open_checkpoint(self, folder_path):
+        # Offers to resume an interrupted scan of the same folder; a checkpoint of another scan is started over
+        filename = self.preferences_manager.checkpoint_path
+        if not filename:
+            return None
+        checkpoint = ScanCheckpoint(filename, folder_path, self.scan_session.algorithm,
+                                    self.preferences_manager.checkpoint_interval)
+        if checkpoint.resumable and not messagebox.askyesno(
+                "Resume Scan", f"A scan of {folder_path} was interrupted after {checkpoint.hashed} images. "
+                               f"Resume it instead of starting over?"):
+            checkpoint.clear()
+        return checkpoint
+
+    def select_folder(self):
+        if self.scan_running():
+            return
+        folder_path = filedialog.askdirectory()
+        if not folder_path:
+            return
+
+        tolerance = self.preferences_manager.tolerance
+        try:
+            tolerance = int(tolerance)
+        except ValueError:
+            messagebox.showerror("Invalid Input", "Please enter a valid integer for tolerance.")
+            return
+
+        session = ScanSession(folder_path, tolerance, **self.preferences_manager.scan_options())
+        self.scan_session = session
+        self.library_check = None
+        checkpoint = self.open_checkpoint(folder_path)
+        if checkpoint is None:
+            self.start_scan(session.scan, keep_results=False)
+            return
+
+        def scan(progress_callback, duplicate_callback, report, job):
+            # Runs on the scan thread; the checkpoint is only kept if the scan does not complete
+            try:
+                duplicates = session.scan(progress_callback, duplicate_callback, report, job, checkpoint)
+            except BaseException:
+                checkpoint.close()
+                raise
+            checkpoint.discard()
+            return duplicates
+
+        self.start_scan(scan, keep_results=False)
+
+    def refresh_folder(self):
+        if self.scan_running():
+            return
+        if self.library_check is not None:
+            self.start_library_check(keep_results=True)
+            return
+        if self.scan_session is None:
+            self.select_folder()
+            return
+        self.start_scan(self.scan_session.refresh, keep_results=True)
+
+    def build_library(self):
+        if self.scan_running():
+            return
+        folder_path = filedialog.askdirectory(title="Select the reference folder")
+        if not folder_path:
+            return
+        filename = filedialog.asksaveasfilename(title="Save the reference library as",
+                                                defaultextension=LIBRARY_EXTENSION,
+                                                filetypes=[("Reference library", "*" + LIBRARY_EXTENSION)])
+        if not filename:
+            return
+        options = self.preferences_manager.scan_options()
+        del options['engine']
+
+        def build(progress_callback, duplicate_callback, report, job):
+            # Runs on the scan thread
+            try:
+                library = ReferenceLibrary.build(folder_path, filename, progress_callback, report=report, job=job,
+                                                 **options)
+                self.scan_events.put(("info", f"Indexed {len(library)} images of {folder_path} in {filename}."))
+            except OSError as e:
+                self.scan_events.put(("error", f"Failed to save the reference library: {e}"))
+            return []
+
+        self.scan_session = None
+        self.library_check = None
+        self.start_scan(build, keep_results=False)
+
+    def check_against_library(self):
+        if self.scan_running():
+            return
+        filename = filedialog.askopenfilename(title="Select a reference library",
+                                              filetypes=[("Reference library", "*" + LIBRARY_EXTENSION),
+                                                         ("All files", "*")])
+        if not filename:
+            return
+        folder_path = filedialog.askdirectory(title="Select the folder to check")
+        if not folder_path:
+            return
+        try:
+            library = ReferenceLibrary.load(filename)
+            tolerance = int(self.preferences_manager.tolerance)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Failed to load the reference library: {e}")
+            return
+        if self.preferences_manager.verify_threshold is not None:
+            library.hasher.verify_threshold = self.preferences_manager.verify_threshold
+        options = self.preferences_manager.scan_options()
+        del options['hasher']
+
+        self.scan_session = None
+        self.library_check = (library, folder_path, tolerance, options)
+        self.start_library_check(keep_results=False)
+
+    def start_library_check(self, keep_results):
+        # The scan thread chooses the keepers, so it collects the protected library images itself
+        protected = set(self.protected_paths) if keep_results else set()
+        self.start_scan(partial(self.run_library_check, protected), keep_results, protected)
+
+    def run_library_check(self, protected, progress_callback, duplicate_callback, report, job=None):
+        # Runs on the scan thread; library images are protected so only images of the checked folder get deleted
+        library, folder_path, tolerance, options = self.library_check
+        pairs = []
+        for match in library.query(folder_path, tolerance, progress_callback, within_batch=True, report=report,
+                                   job=job, **options):
+            if match.in_library:
+                protected.add(match.match)
+                self.scan_events.put(("protected", match.match))
+            pairs.append((match.match, match.path))
+            duplicate_callback(pairs[-1])
+        return pairs
+
+    def start_scan(self, scan, keep_results, protected=None):
+        self.select_button.configure(state=tk.DISABLED)
+        self.progress_label.configure(text="Processing...")
+
+        if not keep_results:
+            self.unique_duplicates = []
+            self.found_pairs = []
+            self.known_pairs = set()
+            self.total_items = 0
+            self.current_page = 0
+            self.selected_for_deletion.clear()
+            self.protected_paths = set()
+            self.load_page(self.current_page, reset_scroll=True)
+
+        self.live_groups = IncrementalGroups(self.protected_paths)
+        self.live_groups.add(self.found_pairs)
+        report = ScanReport(**self.preferences_manager.report_options())
+        self.start_job(self.run_scan, scan, report, self.preferences_manager.report_file, list(self.found_pairs),
+                       set() if protected is None else protected)
+
+    def start_job(self, target, *args):
+        # Runs ``target(*args, job)`` in the background; it reports back through the scan event queue
+        self.select_button.configure(state=tk.DISABLED)
+        self.scan_job = ScanJob()
+        self.scan_job.start(target, *args, self.scan_job)
+        self.pause_button.configure(state=tk.NORMAL, text="Pause")
+        self.cancel_button.configure(state=tk.NORMAL)
+        self.root.after(SCAN_POLL_INTERVAL_MS, self.process_scan_events)
+
+    def delete_selected_images(self):
+        if self.scan_running():
+            return
+        if len(self.selected_for_deletion) < 1:
+            messagebox.showinfo("Invalid Input", "Please select at least one image to delete.")
+            return
+        image_count = sum(len(group.duplicates) for group in self.selected_for_deletion)
+        prompt = DELETE_PROMPTS[self.preferences_manager.delete_mode].format(count=image_count,
+                                                                            groups=len(self.selected_for_deletion))
+        if not messagebox.askyesno("Delete Images", prompt + " The image in the Keep column of each group is kept."):
+            return
+        engine = DeletionEngine(**self.preferences_manager.deletion_options())
+        self.progress_label.configure(text="Removing duplicates...")
+        self.start_job(self.run_deletion, engine, list(self.selected_for_deletion), list(self.found_pairs),
+                       set(self.protected_paths))
+
+    def run_deletion(self, engine, groups, pairs, protected, job):
+        # Runs on the job thread, so large selections and regrouping what is left do not block the UI
+        actions = {}
+        try:
+            actions = engine.run(groups, lambda *progress: self.scan_events.put(("progress", progress)), job,
+                                 pairs=pairs)
+        except OSError as e:
+            self.scan_events.put(("error", f"Failed to remove the duplicates: {e}"))
+        finally:
+            removed = {path for path, action in actions.items() if action in REMOVED_ACTIONS}
+            if self.scan_session is None:
+                pairs = [pair for pair in pairs if pair[0] not in removed and pair[1] not in removed]
+            else:
+                # Drop the removed images from the in-memory index instead of rescanning the folder
+                self.scan_session.remove_images(removed)
+                pairs = self.scan_session.duplicates()
+            self.scan_events.put(("deleted", (actions, self.group_results(pairs, protected))))
+
+    def on_deletion_complete(self, result):
+        actions, results = result
+        removed = sum(action in REMOVED_ACTIONS for action in actions.values())
+        failed = sum(action == "failed" for action in actions.values())
+        skipped = sum(action == "skipped" for action in actions.values())
+        self.selected_for_deletion.clear()
+        self.on_find_duplicates_complete(results)
+        message = f"Removed {removed} duplicates."
+        if failed:
+            message += f" {failed} could not be removed, see the log for details."
+        if skipped:
+            message += f" {skipped} were skipped, e.g. because they differ too much from their keeper, see the log."
+        messagebox.showinfo("Deleted", message)
+
+    def undo_last_deletion(self):
+        if self.scan_running():
+            return
+        journal = latest_journal(self.preferences_manager.quarantine_folder)
+        if journal is None:
+            messagebox.showinfo("Undo Last Deletion", "There is no deletion to undo.")
+            return
+        if not messagebox.askyesno("Undo Last Deletion", "Move the images quarantined by the last deletion back to "
+                                                         "their folders?"):
+            return
+        self.progress_label.configure(text="Restoring...")
+        self.start_job(self.run_undo, journal)
+
+    def run_undo(self, journal, job):
+        # Runs on the job thread
+        outcomes = {}
+        try:
+            outcomes = DeletionEngine.undo(journal, lambda *progress: self.scan_events.put(("progress", progress)),
+                                           job)
+        except OSError as e:
+            self.scan_events.put(("error", f"Failed to read the deletion journal {journal}: {e}"))
+        finally:
+            self.scan_events.put(("restored", outcomes))
+
+    def on_undo_complete(self, outcomes):
+        restored = sum(outcome == "restored" for outcome in outcomes.values())
+        irreversible = sum(outcome == "irreversible" for outcome in outcomes.values())
+        failed = len(outcomes) - restored - irreversible
+        message = f"Restored {restored} images."
+        if irreversible:
+            message += f" {irreversible} deleted or hardlinked images cannot be restored."
+        if failed:
+            message += f" {failed} could not be restored, see the log for details."
+        messagebox.showinfo("Undo Last Deletion", message)
+        self.select_button.configure(state=tk.NORMAL)
+        self.progress_label.configure(text=f"{self.total_items} duplicate groups")
+        # Restored images are matched again; their hashes usually come from the cache
+        if restored and (self.scan_session is not None or self.library_check is not None):
+            self.refresh_folder()
+
+    def select_all_images(self):
+        if self.select_all_state:
+            self.selected_for_deletion.clear()
+            self.select_all_state = False
+            self.select_all_button.configure(text="Select All")
+        else:
+            self.selected_for_deletion = set(self.unique_duplicates)
+            self.select_all_state = True
+            self.select_all_button.configure(text="Deselect All")
+        self.load_page(self.current_page)
+
+    def show_help(self):
+        top = tk.Toplevel(self.root)
+        top.title("Help")
+        help_text_area = ctk.CTkTextbox(top, height=15, width=90)
+        help_text_area.insert("1.0", "More info on how to use this application...\n\n"
+                                     "1. Select Folder: Use this button to choose a folder containing images.\n"
+                                     "   File > Refresh picks up added and deleted images without rescanning everything.\n"
+                                     "   Pause and Cancel stop a running scan; an interrupted scan of the same folder "
+                                     "can be resumed.\n"
+                                     "2. Tolerance Level: Enter the tolerance level for finding duplicates.\n"
+                                     "3. Delete: Deletes the duplicates of the selected groups, keeping the image in the Keep column.\n"
+                                     "   The preferences choose which image is kept and whether duplicates are "
+                                     "deleted, moved to a quarantine folder or replaced with hardlinks. "
+                                     "File > Undo Last Deletion moves quarantined images back.\n"
+                                     "4. View: Click a thumbnail to open the image in a new window.\n"
+                                     "5. Reference Library: File > Build Reference Library hashes a folder once; "
+                                     "File > Check Folder Against Library then finds the images of another folder "
+                                     "that are already in it. Library images are always kept.\n\n"
+                                     "For more information, visit https://github.com/timoschneider249/DupliPicFinder")
+        help_text_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ctk.CTkScrollbar(top, command=help_text_area.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        help_text_area.configure(yscrollcommand=scrollbar.set)
+
+    def open_preferences(self):
+        self.preferences_manager.open_preferences(self.root, self.update_pagination, self.load_page, self.current_page)
+
+    def on_mouse_wheel(self, event):
+        self.results_view.on_mouse_wheel(event)
@@ -0,0 +1,221 @@
+# hash_algorithms.py
+from collections import namedtuple
+import imagehash
+import numpy as np
+from PIL import Image
+from .hash_index import hash_to_int, hamming_distance
+
+
+HASH_ALGORITHMS = ("ahash", "dhash", "phash", "whash", "colorhash")
+DEFAULT_ALGORITHM = "phash"
+DEFAULT_HASH_SIZE = 8
+VERIFY_METHODS = ("none", "phash", "ssim")
+# pHash edge length and SSIM image edge length used by the verification stage
+DEFAULT_VERIFY_SIZES = {"phash": 16, "ssim": 32}
+# Similarity a candidate needs per verification method, from the benchmark corpus: unrelated candidates reach
+# at most 0.66 with a 256-bit pHash, whose bits are correlated, and 0.44 with SSIM, while SSIM keeps every true pair
+DEFAULT_VERIFY_THRESHOLDS = {"phash": 0.75, "ssim": 0.6}
+
+_HASH_FUNCTIONS = {
+    "ahash": imagehash.average_hash,
+    "dhash": imagehash.dhash,
+    "phash": imagehash.phash,
+    "whash": imagehash.whash,
+    "colorhash": lambda image, hash_size: imagehash.colorhash(image, binbits=hash_size),
+}
+
+Fingerprint = namedtuple("Fingerprint", ["hash", "verify"])
+Fingerprint.__doc__ = """
+What an image is matched by: ``hash`` is the ``imagehash.ImageHash`` searched for candidates, ``verify``
+the data the verification stage confirms candidates with (an integer pHash, an SSIM pixel array, or None).
+"""
+
+
+def ssim(image1, image2):
+    """
+    Computes the mean structural similarity of two equally sized grayscale images over 7x7 windows.
+
+    Args:
+        image1 (numpy.ndarray): The first image as a 2D array of 0-255 values.
+        image2 (numpy.ndarray): The second image.
+
+    Returns:
+        float: The similarity, 1.0 for identical images.
+    """
+    a = image1.astype(np.float64)
+    b = image2.astype(np.float64)
+    window = min(7, *a.shape)
+    c1 = (0.01 * 255) ** 2
+    c2 = (0.03 * 255) ** 2
+
+    def window_mean(x):
+        # Box filter over every full window, through a summed-area table
+        table = np.pad(x.cumsum(axis=0).cumsum(axis=1), ((1, 0), (1, 0)))
+        sums = table[window:, window:] - table[:-window, window:] - table[window:, :-window] + table[:-window, :-window]
+        return sums / (window * window)
+
+    mean_a, mean_b = window_mean(a), window_mean(b)
+    variance_a = window_mean(a * a) - mean_a ** 2
+    variance_b = window_mean(b * b) - mean_b ** 2
+    covariance = window_mean(a * b) - mean_a * mean_b
+    similarity = ((2 * mean_a * mean_b + c1) * (2 * covariance + c2)) / \
+                 ((mean_a ** 2 + mean_b ** 2 + c1) * (variance_a + variance_b + c2))
+    return float(similarity.mean())
+
+
+class Hasher:
+    """
+    Computes every hash an image is matched by from a single decoded image.
+
+    The search hash finds candidate pairs through the match index. With a verification method the
+    candidates are then confirmed with a more expensive comparison, a larger pHash or the SSIM of
+    downscaled pixels, which is computed in the same pass but only ever compared for candidate pairs.
+    """
+
+    def __init__(self, algorithm=DEFAULT_ALGORITHM, hash_size=DEFAULT_HASH_SIZE, verify="none", verify_size=None,
+                 verify_threshold=None):
+        """
+        Args:
+            algorithm (str): The search hash, one of ``HASH_ALGORITHMS``.
+            hash_size (int): Edge length of the search hash, or bits per bin for ``colorhash``.
+            verify (str): The verification method, one of ``VERIFY_METHODS``.
+            verify_size (int): Edge length of the verification pHash or SSIM image, by default
+                from ``DEFAULT_VERIFY_SIZES``.
+            verify_threshold (float): Minimum similarity, between 0 and 1, a candidate pair needs to be confirmed,
+                by default from ``DEFAULT_VERIFY_THRESHOLDS``. For pHash the similarity is the fraction of equal bits.
+        """
+        if algorithm not in HASH_ALGORITHMS:
+            raise ValueError(f"Unknown hash algorithm: {algorithm}")
+        if verify not in VERIFY_METHODS:
+            raise ValueError(f"Unknown verification method: {verify}")
+        if hash_size < 2 or (algorithm == "whash" and hash_size & (hash_size - 1)):
+            raise ValueError(f"Invalid hash size for {algorithm}: {hash_size}")
+        if verify_threshold is not None and not 0 <= verify_threshold <= 1:
+            raise ValueError(f"Invalid verification threshold: {verify_threshold}")
+        self.algorithm = algorithm
+        self.hash_size = hash_size
+        self.verify = verify
+        self.verify_size = verify_size or DEFAULT_VERIFY_SIZES.get(verify, 0)
+        self.verify_threshold = verify_threshold if verify_threshold is not None else \
+            DEFAULT_VERIFY_THRESHOLDS.get(verify, 0.0)
+
+    @property
+    def identifier(self):
+        """
+        str: Identifies the hashes this hasher computes; the threshold is not part of it since it only
+        affects comparisons.
+        """
+        identifier = f"{self.algorithm}:{self.hash_size}"
+        if self.verify != "none":
+            identifier += f"+{self.verify}:{self.verify_size}"
+        return identifier
+
+    @property
+    def mode(self):
+        """
+        str: The image mode hashes are computed from; only ``colorhash`` needs color.
+        """
+        return "RGB" if self.algorithm == "colorhash" else "L"
+
+    @property
+    def bits(self):
+        return self.hash_size * (14 if self.algorithm == "colorhash" else self.hash_size)
+
+    @property
+    def verify_bytes(self):
+        """
+        int: Bytes the verification data of one image takes when packed, 0 without verification.
+        """
+        if self.verify == "phash":
+            return -(-self.verify_size ** 2 // 8)
+        if self.verify == "ssim":
+            return self.verify_size ** 2
+        return 0
+
+    def hash_image(self, image):
+        """
+        Computes the search hash and the verification data of a decoded image.
+
+        Args:
+            image (PIL.Image.Image): The image in ``mode``; hashes resize it themselves.
+
+        Returns:
+            Fingerprint: The hashes of the image.
+        """
+        hash_value = _HASH_FUNCTIONS[self.algorithm](image, hash_size=self.hash_size)
+        verify = None
+        if self.verify != "none":
+            gray = image.convert("L") if image.mode != "L" else image
+            if self.verify == "phash":
+                verify = hash_to_int(imagehash.phash(gray, hash_size=self.verify_size))
+            else:
+                verify = np.asarray(gray.resize((self.verify_size, self.verify_size), Image.LANCZOS), dtype=np.uint8)
+        return Fingerprint(hash_value, verify)
+
+    def similarity(self, fingerprint1, fingerprint2):
+        """
+        Returns how similar two fingerprints are according to the verification method, between 0 and 1.
+        """
+        if self.verify == "phash":
+            return 1 - hamming_distance(fingerprint1.verify, fingerprint2.verify) / self.verify_size ** 2
+        if self.verify == "ssim":
+            return ssim(fingerprint1.verify, fingerprint2.verify)
+        return 1.0
+
+    def confirms(self, fingerprint1, fingerprint2):
+        """
+        Returns whether the verification stage confirms a candidate pair; always True without verification.
+        """
+        return self.verify == "none" or self.similarity(fingerprint1, fingerprint2) >= self.verify_threshold
+
+    def to_text(self, fingerprint):
+        """
+        Serializes a fingerprint to hex text, e.g. for the hash cache.
+        """
+        text = str(fingerprint.hash)
+        if self.verify == "phash":
+            text += f";{fingerprint.verify:0{self.verify_size ** 2 // 4}x}"
+        elif self.verify == "ssim":
+            text += ";" + fingerprint.verify.tobytes().hex()
+        return text
+
+    def pack_verify(self, verify):
+        """
+        Packs verification data into ``verify_bytes`` bytes, e.g. for a ``hash_store.HashStore``.
+        """
+        if self.verify == "phash":
+            return verify.to_bytes(self.verify_bytes, "big")
+        if self.verify == "ssim":
+            return np.ascontiguousarray(verify, dtype=np.uint8).tobytes()
+        return b""
+
+    def unpack_verify(self, data):
+        """
+        Restores verification data packed by ``pack_verify``.
+        """
+        if self.verify == "phash":
+            return int.from_bytes(bytes(data), "big")
+        if self.verify == "ssim":
+            return np.frombuffer(data, dtype=np.uint8).reshape(self.verify_size, self.verify_size)
+        return None
+
+    def hash_from_int(self, value):
+        """
+        Restores a search hash from its bits packed into an integer, see ``hash_index.hash_to_int``.
+        """
+        bits = format(value, f"0{self.bits}b")[-self.bits:]
+        return imagehash.ImageHash(np.array([bit == "1" for bit in bits]).reshape(-1, self.hash_size))
+
+    def from_text(self, text):
+        """
+        Restores a fingerprint serialized by ``to_text``.
+        """
+        hash_text, _, verify_text = text.partition(";")
+        hash_value = self.hash_from_int(int(hash_text, 16))
+        verify = None
+        if self.verify == "phash":
+            verify = int(verify_text, 16)
+        elif self.verify == "ssim":
+            verify = np.frombuffer(bytes.fromhex(verify_text), dtype=np.uint8)
+            verify = verify.reshape(self.verify_size, self.verify_size)
+        return Fingerprint(hash_value, verify)
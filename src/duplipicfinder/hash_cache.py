@@ -0,0 +1,103 @@
+# hash_cache.py
+import os
+import sqlite3
+
+
+class HashCache:
+    """
+    Persistent SQLite store of image hashes keyed by path, file size, modification time and hash algorithm.
+
+    An entry is only returned while all four still match, so edited or replaced files are re-hashed
+    automatically. Use as a context manager so pending writes are committed on exit.
+    """
+
+    def __init__(self, filename, algorithm):
+        self.filename = filename
+        self.algorithm = algorithm
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.pruned = 0
+        self._connection = sqlite3.connect(filename)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT NOT NULL, algorithm TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+            "hash TEXT NOT NULL, PRIMARY KEY (path, algorithm))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, path, size, mtime_ns):
+        """
+        Looks up the cached hash of a file.
+
+        Args:
+            path (str): The file path.
+            size (int): The current file size in bytes.
+            mtime_ns (int): The current modification time in nanoseconds.
+
+        Returns:
+            str: The cached hash as a hex string.
+            None: If the file is not cached or has changed since it was hashed.
+        """
+        row = self._connection.execute(
+            "SELECT hash FROM hashes WHERE path = ? AND algorithm = ? AND size = ? AND mtime_ns = ?",
+            (path, self.algorithm, size, mtime_ns)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def put(self, path, size, mtime_ns, hash_hex):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO hashes (path, algorithm, size, mtime_ns, hash) VALUES (?, ?, ?, ?, ?)",
+            (path, self.algorithm, size, mtime_ns, hash_hex)
+        )
+        self.stored += 1
+
+    def prune(self, folder_path, seen_paths):
+        """
+        Removes entries for files below ``folder_path`` that no longer exist.
+
+        Args:
+            folder_path (str): The folder that was just scanned.
+            seen_paths (set): The paths found during that scan.
+
+        Returns:
+            int: The number of removed entries.
+        """
+        prefix = os.path.join(folder_path, "")
+        rows = self._connection.execute(
+            "SELECT DISTINCT path FROM hashes WHERE substr(path, 1, ?) = ?", (len(prefix), prefix)
+        ).fetchall()
+        vanished = [(path,) for path, in rows if path not in seen_paths]
+        self._connection.executemany("DELETE FROM hashes WHERE path = ?", vanished)
+        self.pruned += len(vanished)
+        return len(vanished)
+
+    def commit(self):
+        self._connection.commit()
+
+    def close(self):
+        self._connection.commit()
+        self._connection.close()
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hit_rate,
+            'stored': self.stored,
+            'pruned': self.pruned,
+        }
@@ -0,0 +1,455 @@
+# hash_index.py
+from itertools import combinations
+from .popcount_matcher import PackedIndex, iter_pairs, pack_hashes
+
+
+ENGINES = ("mih", "bktree", "numpy", "pairwise")
+DEFAULT_ENGINE = "mih"
+# Hashes the numpy engine buffers before matching them in one tiled XOR+popcount pass, see ``MatchGraph.push``
+MATCH_BATCH_SIZE = 256
+
+
+def hash_to_int(image_hash):
+    """
+    Converts a perceptual hash into a plain integer bit string.
+
+    Args:
+        image_hash (imagehash.ImageHash): The hash to convert.
+
+    Returns:
+        int: The hash bits packed into an integer (first bit is the most significant).
+    """
+    return int(str(image_hash), 16)
+
+
+def hamming_distance(value1, value2):
+    """
+    Counts the number of differing bits between two integer hashes.
+
+    Args:
+        value1 (int): The first hash.
+        value2 (int): The second hash.
+
+    Returns:
+        int: The Hamming distance between the two hashes.
+    """
+    return bin(value1 ^ value2).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over the Hamming metric.
+
+    Each node stores a hash value, the ids sharing that exact value and its children keyed by
+    their distance to the node. Range queries only descend into children whose edge distance lies
+    within ``radius`` of the query's distance to the node (triangle inequality).
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, item_id, value):
+        self._size += 1
+        if self._root is None:
+            self._root = [value, [item_id], {}]
+            return
+
+        node = self._root
+        while True:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                node[1].append(item_id)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item_id], {}]
+                return
+            node = child
+
+    def remove(self, item_id, value):
+        """
+        Removes an id stored under ``value``. Emptied nodes are kept to route later queries.
+        """
+        node = self._root
+        while node is not None:
+            distance = hamming_distance(value, node[0])
+            if distance == 0:
+                if item_id in node[1]:
+                    node[1].remove(item_id)
+                    self._size -= 1
+                return
+            node = node[2].get(distance)
+
+    def query(self, value, radius):
+        """
+        Finds all stored ids whose hash lies within ``radius`` bits of ``value``.
+
+        Args:
+            value (int): The query hash.
+            radius (int): The maximum Hamming distance (inclusive).
+
+        Returns:
+            list: ``(item_id, distance)`` tuples.
+        """
+        results = []
+        if self._root is None or radius < 0:
+            return results
+
+        stack = [self._root]
+        while stack:
+            node_value, ids, children = stack.pop()
+            distance = hamming_distance(value, node_value)
+            if distance <= radius:
+                results.extend((item_id, distance) for item_id in ids)
+            low, high = distance - radius, distance + radius
+            for edge, child in children.items():
+                if low <= edge <= high:
+                    stack.append(child)
+        return results
+
+
+class MultiIndexHash:
+    """
+    Pigeonhole multi-index hashing over fixed-width integer hashes.
+
+    The hash is split into ``bands`` disjoint bit ranges, each with its own lookup table. If two
+    hashes differ in at most ``radius`` bits then at least one band differs in at most
+    ``radius // bands`` bits, so probing every band with all variants inside that sub-radius yields
+    a complete candidate set which is then verified against the full distance.
+    """
+
+    def __init__(self, bits=64, bands=4):
+        self.bits = bits
+        self.bands = max(1, min(bands, bits))
+        self._values = {}
+        self._tables = [{} for _ in range(self.bands)]
+
+        # Spread the bits as evenly as possible over the bands
+        self._layout = []
+        offset = 0
+        for band in range(self.bands):
+            width = bits // self.bands + (1 if band < bits % self.bands else 0)
+            self._layout.append((offset, width))
+            offset += width
+
+    def __len__(self):
+        return len(self._values)
+
+    def _band_keys(self, value):
+        return [(value >> offset) & ((1 << width) - 1) for offset, width in self._layout]
+
+    def add(self, item_id, value):
+        self._values[item_id] = value
+        for table, key in zip(self._tables, self._band_keys(value)):
+            table.setdefault(key, []).append(item_id)
+
+    def remove(self, item_id, value=None):
+        value = self._values.pop(item_id, None)
+        if value is None:
+            return
+        for table, key in zip(self._tables, self._band_keys(value)):
+            bucket = table[key]
+            bucket.remove(item_id)
+            if not bucket:
+                del table[key]
+
+    def _probe_count(self, width, sub_radius):
+        count, term = 0, 1
+        for k in range(sub_radius + 1):
+            count += term
+            term = term * (width - k) // (k + 1)
+        return count
+
+    def query(self, value, radius):
+        """
+        Finds all stored ids whose hash lies within ``radius`` bits of ``value``.
+
+        Args:
+            value (int): The query hash.
+            radius (int): The maximum Hamming distance (inclusive).
+
+        Returns:
+            list: ``(item_id, distance)`` tuples.
+        """
+        if radius < 0 or not self._values:
+            return []
+
+        sub_radius = radius // self.bands
+        probes = sum(self._probe_count(width, sub_radius) for _, width in self._layout)
+        if probes >= len(self._values):
+            # Enumerating the band neighbourhoods would cost more than a linear scan
+            candidates = self._values.keys()
+        else:
+            candidates = set()
+            for (offset, width), table, key in zip(self._layout, self._tables, self._band_keys(value)):
+                for k in range(sub_radius + 1):
+                    for flipped in combinations(range(width), k):
+                        probe = key
+                        for bit in flipped:
+                            probe ^= 1 << bit
+                        candidates.update(table.get(probe, ()))
+
+        results = []
+        for item_id in candidates:
+            distance = hamming_distance(value, self._values[item_id])
+            if distance <= radius:
+                results.append((item_id, distance))
+        return results
+
+
+class LinearIndex:
+    """
+    Index that compares a query against every stored hash, matching the original pairwise loop.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, item_id, value):
+        self._values[item_id] = value
+
+    def remove(self, item_id, value=None):
+        self._values.pop(item_id, None)
+
+    def query(self, value, radius):
+        results = []
+        for item_id, other in self._values.items():
+            distance = hamming_distance(value, other)
+            if distance <= radius:
+                results.append((item_id, distance))
+        return results
+
+
+def create_index(engine=DEFAULT_ENGINE, bits=64):
+    """
+    Creates an empty Hamming-distance index for the given engine name.
+
+    Every index supports ``add(item_id, value)``, ``remove(item_id, value)`` and
+    ``query(value, radius)``, so matches can be updated as images are added or deleted.
+
+    Args:
+        engine (str): One of ``ENGINES``.
+        bits (int): The width of the hashes that will be stored.
+
+    Returns:
+        BKTree | MultiIndexHash | PackedIndex | LinearIndex: The new index.
+    """
+    if engine == "bktree":
+        return BKTree()
+    if engine == "mih":
+        return MultiIndexHash(bits=bits)
+    if engine == "numpy":
+        return PackedIndex(bits=bits)
+    if engine == "pairwise":
+        return LinearIndex()
+    raise ValueError(f"Unknown match engine: {engine}")
+
+
+def find_pairs(values, tolerance, engine=DEFAULT_ENGINE, bits=64):
+    """
+    Finds all index pairs whose hashes differ by less than ``tolerance`` bits.
+
+    Every engine returns the same pairs as comparing each hash with every later one.
+
+    Args:
+        values (list): Integer hashes.
+        tolerance (int): Pairs are reported when their Hamming distance is strictly below this.
+        engine (str): One of ``ENGINES``.
+        bits (int): The width of the hashes.
+
+    Returns:
+        list: Sorted ``(i, j)`` tuples with ``i < j``.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown match engine: {engine}")
+
+    radius = tolerance - 1
+    pairs = []
+    if radius < 0:
+        return pairs
+
+    if engine == "numpy":
+        for rows, cols in iter_pairs(pack_hashes(values, bits), tolerance):
+            pairs.extend(zip(rows.tolist(), cols.tolist()))
+        return pairs
+
+    if engine == "pairwise":
+        for i in range(len(values)):
+            for j in range(i + 1, len(values)):
+                if hamming_distance(values[i], values[j]) <= radius:
+                    pairs.append((i, j))
+        return pairs
+
+    index = create_index(engine, bits)
+    for i, value in enumerate(values):
+        for j, _ in index.query(value, radius):
+            pairs.append((j, i))
+        index.add(i, value)
+
+    pairs.sort()
+    return pairs
+
+
+class MatchGraph:
+    """
+    Near-duplicate graph maintained incrementally on top of a Hamming-distance index.
+
+    Each added hash is queried against the hashes already present before being inserted, so the
+    pairs involving an image are known as soon as it is added and can be reported right away.
+    Only linked images get a neighbour set, so the many images without a duplicate cost nothing
+    beyond their entry in the index.
+    """
+
+    def __init__(self, tolerance, engine=DEFAULT_ENGINE, store=None):
+        """
+        Args:
+            tolerance (int): Hashes less than this many bits apart are linked.
+            engine (str): One of ``ENGINES``.
+            store (hash_store.HashStore): Optionally the store the hashes are put in before they are added,
+                under the same ids. The graph then reads them from its packed array instead of keeping a copy,
+                and an image counts as added while the store holds its fingerprint.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown match engine: {engine}")
+        self.tolerance = tolerance
+        self.engine = engine
+        self.store = store
+        self.bits = None
+        self._index = None
+        self._values = {} if store is None else None
+        self._count = 0
+        self._neighbours = {}
+        self._pending = []
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, item_id):
+        return item_id in self._values if self.store is None else item_id in self.store
+
+    def _insert(self, item_id, value, matches):
+        if self._values is not None:
+            self._values[item_id] = value
+        self._count += 1
+        if matches:
+            self._neighbours.setdefault(item_id, set()).update(matches)
+            for other_id in matches:
+                self._neighbours.setdefault(other_id, set()).add(item_id)
+        self._index.add(item_id, value)
+
+    def add(self, item_id, value, bits=64, accept=None):
+        """
+        Adds a hash and links it to every stored hash less than ``tolerance`` bits away.
+
+        Args:
+            item_id (int): The id of the image.
+            value (int): The integer hash.
+            bits (int): The width of the hash; the first added hash fixes it for the graph.
+            accept (function): Optionally called with the id of each candidate; only candidates it
+                returns True for are linked.
+
+        Returns:
+            list: The ids of the newly linked images.
+        """
+        if self._index is None:
+            self.bits = bits
+            self._index = create_index(self.engine, bits)
+
+        matches = [other_id for other_id, _ in self._index.query(value, self.tolerance - 1)
+                   if accept is None or accept(other_id)]
+        self._insert(item_id, value, matches)
+        return matches
+
+    def push(self, item_id, value, bits=64, accept=None, batch_size=MATCH_BATCH_SIZE):
+        """
+        Adds a hash like ``add``, but lets the numpy engine match hashes in batches.
+
+        The numpy engine buffers up to ``batch_size`` hashes and matches them in one pass: against each other
+        with the tiled all-pairs matcher and against the stored hashes a tile at a time, instead of scanning
+        the whole array once per hash. The links found are the same as with ``add``, but reported up to a
+        batch later; call ``flush`` after the last hash and before ``add`` or ``remove``. The other engines
+        add every hash right away.
+
+        Args:
+            item_id (int): The id of the image.
+            value (int): The integer hash.
+            bits (int): The width of the hash, see ``add``.
+            accept (function): Optionally called with ``(item_id, other_id)`` for each candidate; only candidates
+                it returns True for are linked.
+            batch_size (int): Hashes buffered by the numpy engine.
+
+        Returns:
+            list: ``(item_id, matches)`` for every hash added by this call, ``matches`` being the ids of the
+            newly linked images.
+        """
+        if self.engine != "numpy":
+            return [(item_id, self.add(item_id, value, bits,
+                                       None if accept is None else lambda other_id: accept(item_id, other_id)))]
+        self.bits = self.bits or bits
+        self._pending.append((item_id, value))
+        return self.flush(accept) if len(self._pending) >= batch_size else []
+
+    def flush(self, accept=None):
+        """
+        Adds the hashes buffered by ``push``.
+
+        Returns:
+            list: ``(item_id, matches)`` for every hash added, see ``push``.
+        """
+        batch, self._pending = self._pending, []
+        return self._add_batch(batch, accept) if batch else []
+
+    def _add_batch(self, batch, accept):
+        if self._index is None:
+            self._index = create_index(self.engine, self.bits)
+        ids = [item_id for item_id, _ in batch]
+        packed = pack_hashes([value for _, value in batch], 64 * self._index.words)
+        candidates = [[] for _ in batch]
+        for row, other_id in self._index.query_many(packed, self.tolerance - 1):
+            candidates[row].append(other_id)
+        # Within the batch each hash is linked to the ones before it, as if they had been added one by one
+        for rows, cols in iter_pairs(packed, self.tolerance):
+            for row, col in zip(rows.tolist(), cols.tolist()):
+                candidates[col].append(ids[row])
+
+        added = []
+        for (item_id, value), others in zip(batch, candidates):
+            matches = [other_id for other_id in others if accept is None or accept(item_id, other_id)]
+            self._insert(item_id, value, matches)
+            added.append((item_id, matches))
+        return added
+
+    def remove(self, item_id):
+        """
+        Removes a hash together with all of its links. Unknown ids are ignored.
+        """
+        if item_id not in self:
+            return
+        if self._values is not None:
+            value = self._values.pop(item_id)
+        else:
+            value = self.store.value(item_id)
+        self._count -= 1
+        self._index.remove(item_id, value)
+        for other_id in self._neighbours.pop(item_id, ()):
+            others = self._neighbours[other_id]
+            others.discard(item_id)
+            if not others:
+                del self._neighbours[other_id]
+
+    def neighbours(self, item_id):
+        return self._neighbours.get(item_id, set())
+
+    def pairs(self):
+        """
+        Returns:
+            list: Sorted ``(id1, id2)`` tuples with ``id1 < id2`` for every linked pair.
+        """
+        return sorted((id1, id2) for id1, others in self._neighbours.items() for id2 in others if id1 < id2)
@@ -0,0 +1,317 @@
+# hash_store.py
+import json
+import mmap
+import os
+import struct
+import numpy as np
+from .hash_algorithms import Fingerprint, Hasher
+from .hash_index import hash_to_int
+from .popcount_matcher import pack_hashes
+
+
+MAGIC = b"DPFHSTO1"
+STORE_VERSION = 1
+_HEADER_LENGTH = struct.Struct("<Q")
+
+
+def _padding(length):
+    # Sections of a store file start at multiples of 8 bytes so they can be mapped as uint64 arrays
+    return -length % 8
+
+
+class PathTable:
+    """
+    Sequence of file paths interned in a single byte buffer with an offset array.
+
+    A path costs its UTF-8 bytes plus an 8-byte offset instead of a Python string object. Paths are
+    immutable once added and addressed by their position.
+    """
+
+    def __init__(self, capacity=1024):
+        self._data = bytearray()
+        self._offsets = np.zeros(max(1, capacity) + 1, dtype=np.int64)
+        self._count = 0
+
+    @classmethod
+    def from_buffers(cls, data, offsets):
+        """
+        Wraps existing buffers, e.g. slices of a memory-mapped file, without copying them.
+
+        Args:
+            data (bytes-like): The concatenated UTF-8 paths.
+            offsets (numpy.ndarray): ``int64`` start of every path plus the end of the last one.
+        """
+        table = cls.__new__(cls)
+        table._data = data
+        table._offsets = offsets
+        table._count = len(offsets) - 1
+        return table
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if not -self._count <= index < self._count:
+            raise IndexError("path index out of range")
+        index %= self._count
+        start, end = self._offsets[index], self._offsets[index + 1]
+        return bytes(self._data[start:end]).decode("utf-8", "surrogateescape")
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        return len(self._data) + self._offsets.nbytes
+
+    def append(self, path):
+        """
+        Adds a path and returns its position.
+        """
+        if not isinstance(self._data, bytearray):
+            # Buffers of a loaded table are read-only, copy them on the first write
+            self._data = bytearray(self._data)
+            self._offsets = np.array(self._offsets)
+        if self._count + 1 == len(self._offsets):
+            self._offsets = np.resize(self._offsets, 2 * len(self._offsets))
+        self._data += path.encode("utf-8", "surrogateescape")
+        self._count += 1
+        self._offsets[self._count] = len(self._data)
+        return self._count - 1
+
+    def buffers(self):
+        """
+        Returns:
+            tuple: The path bytes and the ``count + 1`` offsets, as passed to ``from_buffers``.
+        """
+        return self._data[:self._offsets[self._count]], self._offsets[:self._count + 1]
+
+
+class HashStore:
+    """
+    Compact in-memory store of the fingerprints of a library, addressed by integer ids.
+
+    Search hashes are kept in a packed ``uint64`` array, verification data in a fixed-width byte
+    array and paths in a ``PathTable``, so an image costs a few dozen bytes rather than the hundreds
+    an ``imagehash.ImageHash`` and its path string take. Ids are positions: an image is added with
+    its path first and its fingerprint is put once it has been computed. A store can be saved to a
+    single file and loaded again memory-mapped, which is instant and only pages in what is read.
+    """
+
+    def __init__(self, hasher=None, capacity=1024):
+        """
+        Args:
+            hasher (hash_algorithms.Hasher): The hashes stored, by default a 64-bit pHash.
+            capacity (int): Number of images space is reserved for; the store grows as needed.
+        """
+        self.hasher = hasher or Hasher()
+        self.words = max(1, -(-self.hasher.bits // 64))
+        capacity = max(1, capacity)
+        self.paths = PathTable(capacity)
+        self._hashes = np.zeros((capacity, self.words), dtype=np.uint64)
+        self._verify = np.zeros((capacity, self.hasher.verify_bytes), dtype=np.uint8)
+        self._live = np.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, item_id):
+        return 0 <= item_id < len(self.paths) and bool(self._live[item_id])
+
+    @property
+    def packed(self):
+        """
+        numpy.ndarray: The ``(len(self), words)`` hash array, see ``popcount_matcher.pack_hashes``.
+        Rows of images without a fingerprint are zero.
+        """
+        return self._hashes[:len(self)]
+
+    @property
+    def nbytes(self):
+        """
+        int: Bytes the store takes, including the reserved capacity.
+        """
+        return self.paths.nbytes + self._hashes.nbytes + self._verify.nbytes + self._live.nbytes
+
+    def _reserve(self, count):
+        if count <= len(self._hashes) and self._hashes.flags.writeable:
+            return
+        capacity = max(count, 2 * len(self._hashes))
+        hashes = np.zeros((capacity, self.words), dtype=np.uint64)
+        verify = np.zeros((capacity, self.hasher.verify_bytes), dtype=np.uint8)
+        live = np.zeros(capacity, dtype=bool)
+        used = len(self)
+        hashes[:used], verify[:used], live[:used] = self._hashes[:used], self._verify[:used], self._live[:used]
+        self._hashes, self._verify, self._live = hashes, verify, live
+
+    def add(self, path, fingerprint=None):
+        """
+        Adds an image and returns its id.
+
+        Args:
+            path (str): The image file path.
+            fingerprint (hash_algorithms.Fingerprint): Its fingerprint, or None to ``put`` it later.
+        """
+        self._reserve(len(self) + 1)
+        item_id = self.paths.append(path)
+        if fingerprint is not None:
+            self.put(item_id, fingerprint)
+        return item_id
+
+    def put(self, item_id, fingerprint):
+        """
+        Stores the fingerprint of an added image.
+
+        Returns:
+            int: The search hash as an integer, as used by the match index.
+        """
+        self._reserve(len(self))
+        value = hash_to_int(fingerprint.hash)
+        self._hashes[item_id] = pack_hashes([value], 64 * self.words)[0]
+        if self.hasher.verify != "none":
+            self._verify[item_id] = np.frombuffer(self.hasher.pack_verify(fingerprint.verify), dtype=np.uint8)
+        self._live[item_id] = True
+        return value
+
+    def remove(self, item_id):
+        """
+        Drops the fingerprint of an image. Its id and path stay reserved so other ids do not change.
+        """
+        self._live[item_id] = False
+
+    def ids(self):
+        """
+        Returns:
+            numpy.ndarray: The ids of every image with a fingerprint, in ascending order.
+        """
+        return np.flatnonzero(self._live[:len(self)])
+
+    def value(self, item_id):
+        """
+        Returns the search hash of an image as an integer.
+        """
+        return sum(int(word) << (64 * k) for k, word in enumerate(self._hashes[item_id]))
+
+    def verify_data(self, item_id):
+        """
+        Returns the verification data of an image, see ``hash_algorithms.Fingerprint``.
+        """
+        return self.hasher.unpack_verify(self._verify[item_id])
+
+    def fingerprint(self, item_id):
+        """
+        Restores the fingerprint of an image, see ``hash_algorithms.Fingerprint``.
+        """
+        return Fingerprint(self.hasher.hash_from_int(self.value(item_id)), self.verify_data(item_id))
+
+    def confirms(self, item_id, other_id, other_store=None):
+        """
+        Returns whether the hasher's verification stage confirms two stored images as duplicates.
+
+        Args:
+            item_id (int): The id of the first image.
+            other_id (int): The id of the second image.
+            other_store (HashStore): The store holding the second image, by default this one. It must
+                hold the same hashes.
+        """
+        if self.hasher.verify == "none":
+            return True
+        other_store = other_store if other_store is not None else self
+        return self.hasher.confirms(Fingerprint(None, self.verify_data(item_id)),
+                                    Fingerprint(None, other_store.verify_data(other_id)))
+
+    def save(self, filename):
+        """
+        Writes the images with a fingerprint to a file; ids are renumbered in ascending order.
+
+        The file holds a JSON header followed by the hash, offset, verification and path sections,
+        each starting at a multiple of 8 bytes so ``load`` can map them without copying.
+        """
+        ids = self.ids()
+        if len(ids) == len(self):
+            data, offsets = self.paths.buffers()
+        else:
+            table = PathTable(len(ids))
+            for item_id in ids.tolist():
+                table.append(self.paths[item_id])
+            data, offsets = table.buffers()
+        verify = self._verify[ids]
+        header = json.dumps({
+            'version': STORE_VERSION,
+            'algorithm': self.hasher.algorithm,
+            'hash_size': self.hasher.hash_size,
+            'verify': self.hasher.verify,
+            'verify_size': self.hasher.verify_size,
+            'count': len(ids),
+            'words': self.words,
+            'verify_bytes': self.hasher.verify_bytes,
+            'path_bytes': len(data),
+        }).encode("utf-8")
+        header += b" " * _padding(len(MAGIC) + _HEADER_LENGTH.size + len(header))
+
+        temporary = filename + ".tmp"
+        with open(temporary, "wb") as f:
+            f.write(MAGIC + _HEADER_LENGTH.pack(len(header)) + header)
+            f.write(np.ascontiguousarray(self._hashes[ids]).tobytes())
+            f.write(np.ascontiguousarray(offsets, dtype="<i8").tobytes())
+            f.write(verify.tobytes() + b"\0" * _padding(verify.nbytes))
+            f.write(data)
+        os.replace(temporary, filename)
+
+    @classmethod
+    def load(cls, filename, hasher=None, memory_map=True):
+        """
+        Loads a store written by ``save``.
+
+        Args:
+            filename (str): The store file.
+            hasher (hash_algorithms.Hasher): Optionally the hasher the store must have been built with;
+                its verification threshold is used for comparisons. By default it is rebuilt from the file.
+            memory_map (bool): Whether to map the file instead of reading it; mapped stores are only paged
+                in as they are accessed and copied on the first change.
+
+        Returns:
+            HashStore: The store.
+
+        Raises:
+            ValueError: If the file is not a hash store or was built with different hashes than ``hasher``.
+        """
+        with open(filename, "rb") as f:
+            if memory_map and os.path.getsize(filename) > 0:
+                buffer = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            else:
+                buffer = memoryview(f.read())
+
+        prefix = len(MAGIC) + _HEADER_LENGTH.size
+        if bytes(buffer[:len(MAGIC)]) != MAGIC:
+            raise ValueError(f"{filename} is not a hash store")
+        header_length, = _HEADER_LENGTH.unpack(buffer[len(MAGIC):prefix])
+        header = json.loads(bytes(buffer[prefix:prefix + header_length]))
+        if header['version'] != STORE_VERSION:
+            raise ValueError(f"Unsupported hash store version {header['version']} in {filename}")
+
+        stored = Hasher(header['algorithm'], header['hash_size'], header['verify'], header['verify_size'])
+        if hasher is None:
+            hasher = stored
+        elif hasher.identifier != stored.identifier:
+            raise ValueError(f"{filename} holds {stored.identifier} hashes, not {hasher.identifier}")
+
+        count, words, verify_bytes = header['count'], header['words'], header['verify_bytes']
+        offset = prefix + header_length
+        hashes = np.frombuffer(buffer, np.uint64, count * words, offset).reshape(count, words)
+        offset += hashes.nbytes
+        offsets = np.frombuffer(buffer, np.int64, count + 1, offset)
+        offset += offsets.nbytes
+        verify = np.frombuffer(buffer, np.uint8, count * verify_bytes, offset).reshape(count, verify_bytes)
+        offset += verify.nbytes + _padding(verify.nbytes)
+        data = buffer[offset:offset + header['path_bytes']]
+
+        store = cls.__new__(cls)
+        store.hasher = hasher
+        store.words = words
+        store.paths = PathTable.from_buffers(data, offsets)
+        store._hashes = hashes
+        store._verify = verify
+        store._live = np.ones(count, dtype=bool)
+        return store
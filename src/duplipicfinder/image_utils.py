@@ -0,0 +1,665 @@
+# image_utils.py
+from PIL import Image
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from .file_digest import IdenticalFiles
+from .hash_algorithms import Hasher
+from .hash_cache import HashCache
+from .hash_index import DEFAULT_ENGINE, MatchGraph
+from .hash_store import HashStore
+from .instrumentation import ProgressReporter, timed
+from .scan_job import ScanCancelled
+from .scanner import DirectoryScanner
+
+try:
+    from pillow_heif import register_heif_opener
+    register_heif_opener()
+    HEIF_SUPPORTED = True
+except ImportError:
+    HEIF_SUPPORTED = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 16
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.tif', '.tiff', '.bmp', '.gif') + \
+                   (('.heic', '.heif') if HEIF_SUPPORTED else ())
+# Smallest edge length kept by the fast decode path; smaller drafts measurably change the hashes
+DECODE_SIZE = 256
+# Modes whose pixel values can be box-averaged; palette, bilevel and 16-bit images are converted before reducing
+_REDUCIBLE_MODES = ("L", "LA", "RGB", "RGBA", "CMYK", "YCbCr", "I", "F")
+
+
+def _timed_fingerprint(image_path, fast_decode, hasher):
+    # Errors are returned rather than logged, since workers cannot reach the parent's logging handlers
+    start = time.perf_counter()
+    try:
+        fingerprint = hasher.hash_image(ImageUtils.open_for_hashing(image_path, fast_decode, hasher.mode))
+        return fingerprint, time.perf_counter() - start, None
+    except Exception as e:
+        return None, time.perf_counter() - start, str(e)
+
+
+def _hash_chunk(start, image_paths, fast_decode, hasher):
+    # Runs inside a worker process, so it has to live at module level to be picklable
+    return [(start + offset,) + _timed_fingerprint(path, fast_decode, hasher)
+            for offset, path in enumerate(image_paths)]
+
+
+class HashPipeline:
+    """
+    Hashing resources shared by the ``iter_hashes`` calls of a scan that hashes its images in batches.
+
+    One pool of hashing processes and one open hash cache serve every batch, and byte-identical files
+    are found across batches, so a copy of an image decoded in an earlier batch is not decoded again.
+    Use as a context manager; the pool is shut down and the cache closed on exit.
+    """
+
+    def __init__(self, workers=0, cache_path=None, fast_decode=True, hasher=None, lookup=None):
+        """
+        Args:
+            workers (int): Number of hashing processes, 0 for one per CPU.
+            cache_path (str): SQLite file used to reuse hashes of unchanged files, or None to disable caching.
+            fast_decode (bool): Whether images are decoded at reduced resolution, which the cache is keyed by.
+            hasher (Hasher): The hashes computed, which the cache is keyed by.
+            lookup (function): Optionally returns the fingerprint of an image hashed in an earlier batch, or
+                None, e.g. from the ``HashStore`` the batches fill; copies of images it does not know are decoded.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        algorithm = ImageUtils.hash_algorithm(fast_decode, hasher or Hasher())
+        self.cache = HashCache(cache_path, algorithm) if cache_path else None
+        self.identical = IdenticalFiles()
+        self.lookup = lookup
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def executor(self):
+        # Started on first use, so scans answered from the cache start no processes
+        if self._executor is None and self.workers > 1:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            # Chunks not yet started were cancelled by ``compute_hashes``, so this only waits for running ones
+            self._executor.shutdown()
+        if self.cache is not None:
+            self.cache.close()
+            logger.info("Hash cache: %d hits, %d misses (%.0f%% hit rate), %d pruned", self.cache.hits,
+                        self.cache.misses, self.cache.hit_rate * 100, self.cache.pruned)
+
+
+class ImageUtils:
+    @staticmethod
+    def hash_algorithm(fast_decode=True, hasher=None):
+        """
+        Returns the identifier of the hashing pipeline used by ``compute_fingerprint``.
+
+        Args:
+            fast_decode (bool): Whether the reduced decode path is used.
+            hasher (Hasher): The hashes computed, by default a 64-bit pHash.
+
+        Returns:
+            str: The identifier, used to key cached hashes.
+        """
+        hasher = hasher or Hasher()
+        return f"{hasher.identifier}:{'draft' if fast_decode else 'full'}"
+
+    @staticmethod
+    def open_for_hashing(image_path, fast_decode=True, mode="L"):
+        """
+        Opens an image and converts it to grayscale (or another mode), ready to be hashed.
+
+        With ``fast_decode`` JPEGs are decoded through DCT scaling at the smallest draft size of at
+        least ``DECODE_SIZE`` pixels, and other formats are box-reduced to about that size right
+        after decoding and before the mode conversion, so large images are never converted or
+        resized at full resolution. Only palette and other modes that cannot be averaged are
+        converted first.
+
+        Args:
+            image_path (str): The file path to the image.
+            fast_decode (bool): Whether to decode at reduced resolution.
+            mode (str): The mode to convert the image to.
+
+        Returns:
+            PIL.Image.Image: The decoded image.
+        """
+        with Image.open(image_path) as img:
+            if fast_decode:
+                img.draft(mode, (DECODE_SIZE, DECODE_SIZE))
+                factor = min(img.size) // DECODE_SIZE
+                if factor > 1:
+                    if img.mode not in _REDUCIBLE_MODES:
+                        img = img.convert(mode)
+                    img = img.reduce(factor)
+            return img.convert(mode)
+
+    @staticmethod
+    def compute_fingerprint(image_path, fast_decode=True, hasher=None):
+        """
+        Computes the search hash and verification data of an image from a single decode.
+
+        The decoded image is handed to the hash functions as is; they scale it to the size they need
+        themselves, e.g. 32x32 for a 64-bit pHash, so its DCT sees more than just the hash grid.
+
+        Args:
+            image_path (str): The file path to the image.
+            fast_decode (bool): Whether to decode at reduced resolution (see ``open_for_hashing``).
+            hasher (Hasher): The hashes to compute, by default a 64-bit pHash.
+
+        Returns:
+            hash_algorithms.Fingerprint: The hashes of the image.
+            None: If an error occurs during processing.
+        """
+        fingerprint, _, error = _timed_fingerprint(image_path, fast_decode, hasher or Hasher())
+        if error is not None:
+            logger.warning("Error processing %s: %s", image_path, error, extra={'path': image_path, 'phase': "hash"})
+        return fingerprint
+
+    @staticmethod
+    def compute_hash(image_path, fast_decode=True, hasher=None):
+        """
+        Computes the perceptual hash of an image.
+
+        Args:
+            image_path (str): The file path to the image.
+            fast_decode (bool): Whether to decode at reduced resolution (see ``open_for_hashing``).
+            hasher (Hasher): The hash to compute, by default a 64-bit pHash.
+
+        Returns:
+            imagehash.ImageHash: The perceptual hash of the image.
+            None: If an error occurs during processing.
+        """
+        fingerprint = ImageUtils.compute_fingerprint(image_path, fast_decode, hasher)
+        return fingerprint.hash if fingerprint is not None else None
+
+    @staticmethod
+    def compute_hashes(image_paths, workers=0, chunk_size=DEFAULT_CHUNK_SIZE, fast_decode=True, hasher=None,
+                       executor=None):
+        """
+        Computes the fingerprints of many images on a pool of worker processes.
+
+        The paths are split into chunks of ``chunk_size`` which are handed to the workers; results
+        are yielded as soon as each chunk finishes, so the order follows completion rather than
+        input order. At most two chunks per worker are in flight at any time.
+
+        Args:
+            image_paths (list): The file paths to hash.
+            workers (int): Number of worker processes. 0 uses every CPU, 1 hashes in this process.
+            chunk_size (int): Number of images sent to a worker at a time.
+            fast_decode (bool): Whether to decode at reduced resolution (see ``open_for_hashing``).
+            hasher (Hasher): The hashes to compute, by default a 64-bit pHash.
+            executor (concurrent.futures.ProcessPoolExecutor): Optionally a running pool of ``workers`` processes
+                to hash on, which is left running; by default a pool is started and shut down again.
+
+        Yields:
+            tuple: ``(index, fingerprint, seconds, error)`` where ``index`` is the position in ``image_paths``,
+            ``fingerprint`` is a ``hash_algorithms.Fingerprint`` or None if the image could not be processed,
+            ``seconds`` the time spent decoding and hashing it and ``error`` the error message or None.
+        """
+        workers = workers or os.cpu_count() or 1
+        chunk_size = max(1, chunk_size)
+        hasher = hasher or Hasher()
+
+        if workers == 1 or len(image_paths) <= chunk_size:
+            for i, image_path in enumerate(image_paths):
+                yield (i,) + _timed_fingerprint(image_path, fast_decode, hasher)
+            return
+
+        chunks = ((start, image_paths[start:start + chunk_size]) for start in range(0, len(image_paths), chunk_size))
+        pending = set()
+        with nullcontext(executor) if executor is not None else ProcessPoolExecutor(max_workers=workers) as executor:
+            try:
+                for start, chunk in chunks:
+                    pending.add(executor.submit(_hash_chunk, start, chunk, fast_decode, hasher))
+                    if len(pending) < workers * 2:
+                        continue
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+            finally:
+                # A shared pool outlives a cancelled scan, so chunks it has not started are dropped
+                for future in pending:
+                    future.cancel()
+
+    @staticmethod
+    def are_hashes_equal(hash1, hash2, tolerance):
+        """
+        Compares two perceptual hashes to determine if they are similar.
+
+        Args:
+            hash1 (imagehash.ImageHash): The first image hash.
+            hash2 (imagehash.ImageHash): The second image hash.
+            tolerance (int): The tolerance level for hash difference.
+
+        Returns:
+            bool: True if the hashes are within the tolerance level, False otherwise.
+        """
+        return abs(hash1 - hash2) < tolerance
+
+    @staticmethod
+    def scan_folder(folder_path, scanner=None, report=None):
+        """
+        Collects the image files in a folder and its subfolders together with their size and mtime.
+
+        Args:
+            folder_path (str): The path to the folder containing images.
+            scanner (DirectoryScanner): The scanner to use, by default one collecting ``IMAGE_EXTENSIONS``.
+            report (instrumentation.ScanReport): Optionally records the walk time and the files discovered.
+
+        Returns:
+            list: ``scanner.ScanEntry`` tuples in walk order.
+        """
+        if scanner is None:
+            scanner = DirectoryScanner(IMAGE_EXTENSIONS)
+        with timed(report, "walk"):
+            entries = scanner.scan(folder_path)
+        if report is not None:
+            report.count("files_discovered", len(entries))
+            report.count("bytes_discovered", sum(entry.size for entry in entries))
+        return entries
+
+    @staticmethod
+    def iter_folder(folder_path, scanner=None, report=None):
+        """
+        Streams the image files of a folder as the walk discovers them, see ``DirectoryScanner.iter_scan``.
+
+        The walk only runs a few directories ahead of the consumer, so a large tree is never held in memory.
+
+        Args:
+            folder_path (str): The path to the folder containing images.
+            scanner (DirectoryScanner): The scanner to use, see ``scan_folder``.
+            report (instrumentation.ScanReport): Optionally records the walk time and the files discovered.
+
+        Yields:
+            scanner.ScanEntry: Every image file, in walk order.
+        """
+        if scanner is None:
+            scanner = DirectoryScanner(IMAGE_EXTENSIONS)
+        entries = scanner.iter_scan(folder_path)
+        while True:
+            # Only the walk is timed, not the consumer
+            with timed(report, "walk"):
+                entry = next(entries, None)
+            if entry is None:
+                return
+            if report is not None:
+                report.count("files_discovered")
+                report.count("bytes_discovered", entry.size)
+            yield entry
+
+    @staticmethod
+    def find_images(folder_path, scanner=None):
+        """
+        Collects the image files in a folder and its subfolders.
+
+        Args:
+            folder_path (str): The path to the folder containing images.
+            scanner (DirectoryScanner): The scanner to use, see ``scan_folder``.
+
+        Returns:
+            list: The image file paths in walk order.
+        """
+        return [entry.path for entry in ImageUtils.scan_folder(folder_path, scanner)]
+
+    @staticmethod
+    def scan_into_store(folder_path, scanner=None, report=None, store=None, hasher=None):
+        """
+        Collects the image files of a folder into a hash store, interning their paths in walk order.
+
+        Args:
+            folder_path (str): The path to the folder containing images.
+            scanner (DirectoryScanner): The scanner to use, see ``scan_folder``.
+            report (instrumentation.ScanReport): Optionally records the walk, see ``scan_folder``.
+            store (HashStore): An empty store to fill, by default a new one for ``hasher``.
+            hasher (Hasher): The hashes a new store holds, by default a 64-bit pHash.
+
+        Returns:
+            tuple: The store, whose ids are the walk positions, and the ``(size, mtime_ns)`` of every image.
+        """
+        entries = ImageUtils.scan_folder(folder_path, scanner, report)
+        if store is None:
+            store = HashStore(hasher, len(entries))
+        stats = []
+        for entry in entries:
+            store.add(entry.path)
+            stats.append((entry.size, entry.mtime_ns))
+        return store, stats
+
+    @staticmethod
+    def iter_hashes(images, progress_callback, workers=0, chunk_size=DEFAULT_CHUNK_SIZE, cache_path=None,
+                    fast_decode=True, prune_folder=None, exact_prestage=True, stats=None, hasher=None, report=None,
+                    job=None, checkpoint=None, pipeline=None):
+        """
+        Computes the fingerprints of a list of images, reusing cached fingerprints of unchanged files.
+
+        Cached hashes are yielded first, then freshly computed ones in completion order. With
+        ``exact_prestage`` the uncached images are first grouped into byte-identical files and only
+        one image per group is decoded; its hash is reused for the other copies.
+
+        Args:
+            images (list): The image file paths.
+            progress_callback (function): Called with ``(current, total, percent, phase, eta)`` as images
+                complete, ``eta`` being the estimated seconds left or None; see ``instrumentation.ProgressReporter``.
+            workers (int): Number of hashing processes, 0 for one per CPU.
+            chunk_size (int): Number of images handed to a hashing process at a time.
+            cache_path (str): SQLite file used to reuse hashes of unchanged files, or None to disable caching.
+            fast_decode (bool): Whether to decode images at reduced resolution before hashing.
+            prune_folder (str): If set, cache entries below this folder that are not in ``images`` are removed.
+            exact_prestage (bool): Whether to skip decoding byte-identical copies.
+            stats (list): Optional ``(size, mtime_ns)`` per image from the directory scan; missing ones are stat'ed.
+            hasher (Hasher): The hashes to compute, by default a 64-bit pHash.
+            report (instrumentation.ScanReport): Optionally records phase times, counters and decode times.
+            job (scan_job.ScanJob): Optionally checked after every image, so the job can pause or cancel hashing.
+            checkpoint (scan_job.ScanCheckpoint): Optionally records every computed fingerprint; fingerprints
+                it already holds for unchanged files are reused like cached ones.
+            pipeline (HashPipeline): Optionally the hashing processes, hash cache and byte-identical files shared
+                with the other batches of a scan; ``workers`` and ``cache_path`` are then taken from it.
+
+        Yields:
+            tuple: ``(index, fingerprint)`` for every image that could be hashed, ``index`` being its position
+            in ``images`` and ``fingerprint`` a ``hash_algorithms.Fingerprint``.
+        """
+        total_images = len(images)
+        stats = list(stats) if stats is not None else [None] * total_images
+        pending = list(range(total_images))
+        cached_hashes = []
+        resumed = 0
+        hasher = hasher or Hasher()
+        if pipeline is not None:
+            cache = pipeline.cache
+        else:
+            cache = HashCache(cache_path, ImageUtils.hash_algorithm(fast_decode, hasher)) if cache_path else None
+        # A shared cache counts for the whole scan, so only what this call adds is reported
+        cache_counts = (cache.hits, cache.misses, cache.pruned) if cache is not None else None
+        progress = ProgressReporter(progress_callback, "hash", total_images)
+
+        try:
+            # Reuse hashes of files that have not changed since the last scan or an interrupted one
+            if cache is not None or checkpoint is not None:
+                pending = []
+                with timed(report, "cache"):
+                    for i, image in enumerate(images):
+                        if stats[i] is None:
+                            try:
+                                stat = os.stat(image)
+                            except OSError as e:
+                                logger.warning("Error reading %s: %s", image, e,
+                                               extra={'path': image, 'phase': "cache"})
+                                continue
+                            stats[i] = (stat.st_size, stat.st_mtime_ns)
+                        cached = checkpoint.get(image, *stats[i]) if checkpoint is not None else None
+                        if cached is not None:
+                            resumed += 1
+                        elif cache is not None:
+                            cached = cache.get(image, *stats[i])
+                        if cached is not None:
+                            cached_hashes.append((i, hasher.from_text(cached)))
+                        else:
+                            pending.append(i)
+                    if prune_folder is not None and cache is not None:
+                        cache.prune(prune_folder, set(images))
+
+            completed = total_images - len(pending)
+            if completed:
+                progress.update(completed)
+            for cached_hash in cached_hashes:
+                if job is not None:
+                    job.check()
+                yield cached_hash
+
+            # Only decode one image per group of byte-identical files, those groups go first. Copies of an image
+            # decoded in an earlier batch of the pipeline reuse its fingerprint
+            copies = {}
+            reused = []
+            if exact_prestage and (len(pending) > 1 or pipeline is not None and pending):
+                identical = pipeline.identical if pipeline is not None else IdenticalFiles()
+                position = {images[i]: i for i in pending}
+                sizes = [stats[i][0] if stats[i] is not None else None for i in pending]
+                progress_callback(completed, total_images, completed / total_images * 100, "digest", None)
+                with timed(report, "digest"):
+                    for group in identical.add([images[i] for i in pending], sizes, report):
+                        if group[0] not in position:
+                            fingerprint = pipeline.lookup(group[0]) if pipeline.lookup is not None else None
+                            group = group[1:]
+                            if fingerprint is not None:
+                                reused.extend((position[path], fingerprint) for path in group)
+                                continue
+                            if len(group) < 2:
+                                continue
+                        copies[position[group[0]]] = [position[path] for path in group[1:]]
+                skipped = {i for group_copies in copies.values() for i in group_copies}
+                skipped.update(i for i, _ in reused)
+                pending = list(copies) + [i for i in pending if i not in copies and i not in skipped]
+                if report is not None:
+                    report.count("identical_copies", len(skipped))
+
+            for i, fingerprint in reused:
+                if stats[i] is not None:
+                    text = hasher.to_text(fingerprint)
+                    if cache is not None:
+                        cache.put(images[i], *stats[i], text)
+                    if checkpoint is not None:
+                        checkpoint.put(images[i], *stats[i], text)
+                completed += 1
+                progress.update(completed)
+                yield i, fingerprint
+                if job is not None:
+                    job.check()
+
+            # Compute hashes for all remaining images, timing only the wait for results and not the consumer
+            pending_images = [images[i] for i in pending]
+            if pipeline is not None:
+                # Batches small enough to be hashed in this process do not start the pool, see ``compute_hashes``
+                executor = pipeline.executor if len(pending_images) > max(1, chunk_size) else None
+                results = ImageUtils.compute_hashes(pending_images, pipeline.workers, chunk_size, fast_decode, hasher,
+                                                    executor)
+            else:
+                results = ImageUtils.compute_hashes(pending_images, workers, chunk_size, fast_decode, hasher)
+            progress.restart()
+            while True:
+                with timed(report, "hash"):
+                    result = next(results, None)
+                if result is None:
+                    break
+                j, hash_value, seconds, error = result
+                i = pending[j]
+                if report is not None:
+                    report.record_decode(images[i], seconds)
+                    report.count("images_hashed")
+                    if stats[i] is not None:
+                        report.count("bytes_decoded", stats[i][0])
+                if hash_value is None:
+                    logger.warning("Unable to compute hash for image %s: %s", images[i], error,
+                                   extra={'path': images[i], 'phase': "hash"})
+                text = hasher.to_text(hash_value) if hash_value is not None else None
+                for k in [i] + copies.get(i, []):
+                    if text is not None and stats[k] is not None:
+                        if cache is not None:
+                            cache.put(images[k], *stats[k], text)
+                        if checkpoint is not None:
+                            checkpoint.put(images[k], *stats[k], text)
+                    completed += 1
+                    progress.update(completed)
+                    if hash_value is not None:
+                        yield k, hash_value
+                if job is not None:
+                    job.check()
+        except ScanCancelled:
+            raise
+        except Exception as e:
+            # Images that fail to decode are reported by ``_hash_chunk``; anything caught here, such as a dead
+            # hashing process or a broken cache, ends the scan early and must not pass for a complete result
+            if report is not None:
+                report.add_error(report.current_phase or "hash", None, str(e))
+            raise
+        finally:
+            if checkpoint is not None:
+                checkpoint.commit()
+                if report is not None:
+                    report.count("checkpoint_hits", resumed)
+            if cache is not None:
+                if pipeline is None:
+                    cache.close()
+                    logger.info("Hash cache: %d hits, %d misses (%.0f%% hit rate), %d pruned", cache.hits,
+                                cache.misses, cache.hit_rate * 100, cache.pruned)
+                else:
+                    cache.commit()
+                if report is not None:
+                    report.count("cache_hits", cache.hits - cache_counts[0])
+                    report.count("cache_misses", cache.misses - cache_counts[1])
+                    report.count("cache_pruned", cache.pruned - cache_counts[2])
+
+    @staticmethod
+    def hash_images(images, progress_callback, workers=0, chunk_size=DEFAULT_CHUNK_SIZE, cache_path=None,
+                    fast_decode=True, prune_folder=None, exact_prestage=True, stats=None, hasher=None, report=None):
+        """
+        Computes the fingerprints of a list of images, see ``iter_hashes``.
+
+        Returns:
+            list: One ``hash_algorithms.Fingerprint`` per image, or None where the image could not be hashed.
+        """
+        hashes = [None] * len(images)
+        for i, hash_value in ImageUtils.iter_hashes(images, progress_callback, workers, chunk_size, cache_path,
+                                                    fast_decode, prune_folder, exact_prestage, stats, hasher,
+                                                    report):
+            hashes[i] = hash_value
+        return hashes
+
+    @staticmethod
+    def match_images(images, tolerance: int, progress_callback, engine: str = DEFAULT_ENGINE, workers: int = 0,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE, cache_path: str = None, fast_decode: bool = True,
+                     exact_prestage: bool = True, prune_folder: str = None, stats: list = None, hasher=None,
+                     report=None, store=None):
+        """
+        Hashes a list of images and streams near-duplicate index pairs as soon as they are discovered.
+
+        Every hash is matched against the hashes completed before it the moment it arrives, so pairs
+        are produced while hashing is still in progress instead of after every image is done. If the
+        hasher verifies, candidate pairs are only reported once the verification stage confirms them.
+
+        Fingerprints are kept in a compact ``HashStore`` rather than as ``imagehash.ImageHash`` objects,
+        so only the match index grows with the number of images beyond a few dozen bytes each.
+
+        Args:
+            images (list): The image file paths.
+            prune_folder (str): Folder whose vanished cache entries are removed, see ``iter_hashes``.
+            stats (list): Optional ``(size, mtime_ns)`` per image, see ``iter_hashes``.
+            store (HashStore): Optionally receives the fingerprints; it must hold exactly the paths of ``images``
+                in the same order, e.g. from ``scan_into_store``. By default a store is created.
+            See ``find_duplicates`` for the remaining arguments.
+
+        Yields:
+            tuple: ``(i, j)`` positions in ``images`` with ``i < j``.
+        """
+        hasher = hasher or Hasher()
+        if store is None:
+            store = HashStore(hasher, len(images))
+            for image in images:
+                store.add(image)
+        graph = MatchGraph(tolerance, engine, store)
+
+        def accept(i, j):
+            # Every candidate the index finds within tolerance is evaluated here
+            confirmed = store.confirms(i, j)
+            if report is not None:
+                report.count("pairs_evaluated")
+                if not confirmed:
+                    report.count("pairs_rejected")
+            return confirmed
+
+        def linked(added):
+            for i, matches in added:
+                if report is not None:
+                    report.count("pairs_found", len(matches))
+                for j in matches:
+                    yield (j, i) if j < i else (i, j)
+
+        for i, fingerprint in ImageUtils.iter_hashes(images, progress_callback, workers, chunk_size, cache_path,
+                                                     fast_decode, prune_folder, exact_prestage, stats, hasher,
+                                                     report):
+            value = store.put(i, fingerprint)
+            with timed(report, "match"):
+                added = graph.push(i, value, hasher.bits, accept)
+            yield from linked(added)
+        with timed(report, "match"):
+            added = graph.flush(accept)
+        yield from linked(added)
+
+    @staticmethod
+    def iter_duplicates(folder_path: str, tolerance: int, progress_callback, scanner=None, store=None, **options):
+        """
+        Streams the duplicate pairs of a folder as soon as they are discovered.
+
+        Args:
+            folder_path (str): The path to the folder containing images.
+            tolerance (int): The tolerance level for considering two images as duplicates.
+            progress_callback (function): A callback function to update progress.
+            scanner (DirectoryScanner): The scanner to use, see ``scan_folder``.
+            store (HashStore): Optionally an empty store that receives the paths and fingerprints, e.g. to save it.
+            **options: The remaining keyword arguments of ``find_duplicates``.
+
+        Yields:
+            tuple: ``(path1, path2)`` with ``path1`` coming before ``path2`` in walk order.
+        """
+        store, stats = ImageUtils.scan_into_store(folder_path, scanner, options.get('report'), store,
+                                                  options.get('hasher'))
+        for i, j in ImageUtils.match_images(store.paths, tolerance, progress_callback, prune_folder=folder_path,
+                                            stats=stats, store=store, **options):
+            yield store.paths[i], store.paths[j]
+
+    @staticmethod
+    def find_duplicates(folder_path: str, tolerance: int, progress_callback, complete_callback,
+                        engine: str = DEFAULT_ENGINE, workers: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        cache_path: str = None, fast_decode: bool = True, exact_prestage: bool = True,
+                        scanner=None, duplicate_callback=None, hasher=None, report=None):
+        """
+        Finds duplicate images in a given folder and its subfolders based on perceptual hashing.
+
+        Args:
+            folder_path (str): The path to the folder containing images.
+            tolerance (int): The tolerance level for considering two images as duplicates.
+            progress_callback (function): A callback function to update progress.
+            complete_callback (function): A callback function to handle the result when processing is complete.
+            engine (str): The near-duplicate search engine, one of ``hash_index.ENGINES``.
+            workers (int): Number of hashing processes, 0 for one per CPU.
+            chunk_size (int): Number of images handed to a hashing process at a time.
+            cache_path (str): SQLite file used to reuse hashes of unchanged files, or None to disable caching.
+            fast_decode (bool): Whether to decode images at reduced resolution before hashing.
+            exact_prestage (bool): Whether to group byte-identical files first and decode only one of each group.
+            scanner (DirectoryScanner): The scanner used to collect images, by default one for ``IMAGE_EXTENSIONS``.
+            duplicate_callback (function): Optionally called with each ``(path1, path2)`` pair as soon as it is found.
+            hasher (hash_algorithms.Hasher): The hashes images are matched and verified by, by default a 64-bit pHash.
+            report (instrumentation.ScanReport): Optionally records timings, counters and errors of the scan.
+
+        Returns:
+            None
+        """
+        store, stats = ImageUtils.scan_into_store(folder_path, scanner, report, hasher=hasher)
+        images = store.paths
+        pairs = []
+        for i, j in ImageUtils.match_images(images, tolerance, progress_callback, engine, workers, chunk_size,
+                                            cache_path, fast_decode, exact_prestage, prune_folder=folder_path,
+                                            stats=stats, hasher=hasher, report=report, store=store):
+            pairs.append((i, j))
+            if duplicate_callback is not None:
+                duplicate_callback((images[i], images[j]))
+
+        # Report the pairs in walk order regardless of the order hashes completed in
+        pairs.sort()
+        duplicates = [(images[i], images[j]) for i, j in pairs]
+
+        # Call the complete callback with the duplicates found
+        complete_callback(duplicates)
@@ -0,0 +1,243 @@
+# instrumentation.py
+import cProfile
+import heapq
+import io
+import json
+import logging
+import platform
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+
+# Upper bounds in milliseconds of the decode time histogram buckets; slower decodes land in the last bucket
+DECODE_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+DEFAULT_SLOWEST_FILES = 10
+PROFILE_FUNCTIONS = 30
+TRACEMALLOC_TOP = 15
+
+
+def format_duration(seconds):
+    """
+    Formats a duration as ``m:ss``, or ``h:mm:ss`` from an hour on.
+    """
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+
+
+def timed(report, phase):
+    """
+    Returns a context manager timing a phase of ``report``, or one doing nothing if ``report`` is None.
+    """
+    return report.phase(phase) if report is not None else nullcontext()
+
+
+class ProgressReporter:
+    """
+    Calls a progress callback with ``(current, total, percent, phase, eta)`` for one phase of a scan.
+
+    The estimated seconds left are derived from the rate since ``restart``, so items completed
+    instantly before it (such as cached hashes) do not make the estimate too optimistic. While
+    ``total_known`` is False, e.g. while files are still being discovered, no estimate is given.
+    """
+
+    def __init__(self, callback, phase, total):
+        self.callback = callback
+        self.phase = phase
+        self.total = total
+        self.total_known = True
+        self.completed = 0
+        self._rate_start = time.perf_counter()
+        self._rate_base = 0
+
+    def restart(self):
+        self._rate_start = time.perf_counter()
+        self._rate_base = self.completed
+
+    def update(self, completed):
+        self.completed = completed
+        done = completed - self._rate_base
+        elapsed = time.perf_counter() - self._rate_start
+        eta = (self.total - completed) * elapsed / done if self.total_known and done > 0 and elapsed > 0 else None
+        percent = completed / self.total * 100 if self.total else 100.0
+        self.callback(completed, self.total, percent, self.phase, eta)
+
+
+class _ErrorHandler(logging.Handler):
+    # Collects log records that name the file they are about, see ``ScanReport.capture_errors``
+    def __init__(self, report):
+        super().__init__(logging.WARNING)
+        self.report = report
+
+    def emit(self, record):
+        path = getattr(record, "path", None)
+        if path is not None:
+            self.report.add_error(getattr(record, "phase", None) or self.report.current_phase, path,
+                                  record.getMessage())
+
+
+class ScanReport:
+    """
+    Timers, counters and errors of a scan, exported as a machine-readable run report.
+
+    Phases are timed with ``phase``; counters, decode times and errors are recorded by the pipeline
+    as it goes. Warnings logged with a ``path`` in their ``extra`` become structured errors while
+    ``run`` (or ``capture_errors``) is active. Optionally the run is profiled with cProfile and its
+    allocations traced with tracemalloc. Recording is thread-safe.
+    """
+
+    def __init__(self, profile=False, trace_memory=False, slowest_files=DEFAULT_SLOWEST_FILES):
+        """
+        Args:
+            profile (bool): Whether ``run`` profiles the calling thread with cProfile.
+            trace_memory (bool): Whether ``run`` traces allocations with tracemalloc.
+            slowest_files (int): Number of slowest files to keep.
+        """
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.slowest_files = slowest_files
+        self.current_phase = None
+        self.phases = {}
+        self.counters = {}
+        self.decode_histogram = [0] * (len(DECODE_BUCKETS_MS) + 1)
+        self.errors = []
+        self.seconds = 0.0
+        self.profile_stats = None
+        self.memory = None
+        self._slowest = []
+        self._lock = threading.Lock()
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Times a block as part of a phase; a phase entered several times accumulates its time.
+        """
+        previous, self.current_phase = self.current_phase, name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self.current_phase = previous
+
+    def record_decode(self, path, seconds):
+        """
+        Records how long decoding and hashing a file took.
+        """
+        milliseconds = seconds * 1000
+        bucket = next((i for i, bound in enumerate(DECODE_BUCKETS_MS) if milliseconds < bound), len(DECODE_BUCKETS_MS))
+        with self._lock:
+            self.decode_histogram[bucket] += 1
+            entry = (seconds, path)
+            if len(self._slowest) < self.slowest_files:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def add_error(self, phase, path, message):
+        with self._lock:
+            self.errors.append({'phase': phase, 'path': path, 'error': message})
+
+    @contextmanager
+    def capture_errors(self):
+        """
+        Turns warnings logged with a ``path`` into report errors while the block runs.
+        """
+        handler = _ErrorHandler(self)
+        logging.getLogger().addHandler(handler)
+        try:
+            yield self
+        finally:
+            logging.getLogger().removeHandler(handler)
+
+    @contextmanager
+    def run(self):
+        """
+        Wraps a whole scan: measures its total time, captures errors and runs the optional profilers.
+        """
+        profiler = cProfile.Profile() if self.profile else None
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        start = time.perf_counter()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            with self.capture_errors():
+                yield self
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self.profile_stats = self._profile_summary(profiler)
+            self.seconds += time.perf_counter() - start
+            if self.trace_memory and tracemalloc.is_tracing():
+                self.memory = self._memory_summary()
+                if started_tracing:
+                    tracemalloc.stop()
+
+    @staticmethod
+    def _profile_summary(profiler):
+        stream = io.StringIO()
+        stats = pstats.Stats(profiler, stream=stream)
+        stats.sort_stats("cumulative").print_stats(PROFILE_FUNCTIONS)
+        return stream.getvalue()
+
+    @staticmethod
+    def _memory_summary():
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics("lineno")[:TRACEMALLOC_TOP]
+        return {
+            'current_bytes': current,
+            'peak_bytes': peak,
+            'top_allocations': [{'location': str(stat.traceback), 'bytes': stat.size, 'blocks': stat.count}
+                                for stat in top],
+        }
+
+    def slowest(self):
+        """
+        Returns:
+            list: ``{'path', 'ms'}`` dicts of the slowest files to decode, slowest first.
+        """
+        return [{'path': path, 'ms': seconds * 1000} for seconds, path in sorted(self._slowest, reverse=True)]
+
+    def to_dict(self):
+        bounds = [f"<{bound}" for bound in DECODE_BUCKETS_MS] + [f">={DECODE_BUCKETS_MS[-1]}"]
+        report = {
+            'python': platform.python_version(),
+            'seconds': self.seconds,
+            'phases': dict(self.phases),
+            'counters': dict(self.counters),
+            'decode_ms_histogram': dict(zip(bounds, self.decode_histogram)),
+            'slowest_files': self.slowest(),
+            'errors': list(self.errors),
+        }
+        if self.profile_stats is not None:
+            report['profile'] = self.profile_stats
+        if self.memory is not None:
+            report['memory'] = self.memory
+        return report
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def summary(self):
+        """
+        Returns a few human-readable lines describing where the time went.
+        """
+        lines = [f"Scan took {format_duration(self.seconds)}"]
+        for name, seconds in self.phases.items():
+            lines.append(f"  {name}: {seconds:.2f}s")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name}: {value}")
+        if self.errors:
+            lines.append(f"  errors: {len(self.errors)}")
+        return "\n".join(lines)
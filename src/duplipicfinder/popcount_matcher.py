@@ -0,0 +1,270 @@
+# popcount_matcher.py
+from itertools import combinations
+import numpy as np
+
+
+DEFAULT_TILE_SIZE = 1024
+# Width of the bands a BandIndex sorts, and the most bits it flips per band before scanning linearly
+BAND_BITS = 16
+MAX_BAND_FLIPS = 2
+LINEAR_TILE_SIZE = 65536
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words):
+        return np.bitwise_count(words)
+else:
+    _POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+    def _popcount(words):
+        as_bytes = words.view(np.uint8).reshape(words.shape + (8,))
+        return _POPCOUNT_TABLE[as_bytes].sum(axis=-1, dtype=np.uint8)
+
+
+def pack_hashes(values, bits=64):
+    """
+    Packs integer hashes into a contiguous ``uint64`` array.
+
+    Args:
+        values (list): Integer hashes.
+        bits (int): The width of the hashes.
+
+    Returns:
+        numpy.ndarray: Array of shape ``(len(values), words)`` with one row per hash.
+    """
+    words = max(1, -(-bits // 64))
+    packed = np.empty((len(values), words), dtype=np.uint64)
+    mask = (1 << 64) - 1
+    for word in range(words):
+        shift = 64 * word
+        packed[:, word] = [(value >> shift) & mask for value in values]
+    return packed
+
+
+def hamming_distances(packed, other):
+    """
+    Computes the Hamming distance between every row of ``packed`` and every row of ``other``.
+
+    Args:
+        packed (numpy.ndarray): Array of shape ``(n, words)``.
+        other (numpy.ndarray): Array of shape ``(m, words)``.
+
+    Returns:
+        numpy.ndarray: ``(n, m)`` array of distances.
+    """
+    # Word by word, so no (n, m, words) intermediate is materialized and single-word hashes need no sum
+    distances = _popcount(np.bitwise_xor(packed[:, None, 0], other[None, :, 0]))
+    if packed.shape[1] > 1:
+        distances = distances.astype(np.uint16)
+        for word in range(1, packed.shape[1]):
+            distances += _popcount(np.bitwise_xor(packed[:, None, word], other[None, :, word]))
+    return distances
+
+
+def iter_pairs(packed, tolerance, tile_size=DEFAULT_TILE_SIZE):
+    """
+    Finds all row pairs whose Hamming distance is below ``tolerance`` using blocked XOR+popcount.
+
+    Each row block is compared against itself and every later row in ``tile_size`` square tiles,
+    so peak memory is bounded by the tile size rather than the number of hashes.
+
+    Args:
+        packed (numpy.ndarray): Array of shape ``(n, words)`` as returned by ``pack_hashes``.
+        tolerance (int): Pairs are reported when their distance is strictly below this.
+        tile_size (int): Number of rows per tile side.
+
+    Yields:
+        tuple: ``(rows, cols)`` index arrays for one row block, sorted with ``rows < cols``.
+    """
+    total = len(packed)
+    if tolerance <= 0 or total < 2:
+        return
+
+    for row_start in range(0, total, tile_size):
+        row_end = min(row_start + tile_size, total)
+        row_block = packed[row_start:row_end]
+        found_rows, found_cols = [], []
+
+        for col_start in range(row_start, total, tile_size):
+            col_end = min(col_start + tile_size, total)
+            close = hamming_distances(row_block, packed[col_start:col_end]) < tolerance
+            if col_start == row_start:
+                # Only keep the upper triangle of the diagonal tile
+                close &= np.triu(np.ones(close.shape, dtype=bool), k=1)
+            rows, cols = np.nonzero(close)
+            if len(rows):
+                found_rows.append(rows + row_start)
+                found_cols.append(cols + col_start)
+
+        if found_rows:
+            rows = np.concatenate(found_rows)
+            cols = np.concatenate(found_cols)
+            order = np.lexsort((cols, rows))
+            yield rows[order], cols[order]
+
+
+class PackedIndex:
+    """
+    Growable packed ``uint64`` hash array answering radius queries with one vectorized XOR+popcount.
+
+    Removed hashes are masked out rather than compacted, so ids keep their slot.
+    """
+
+    def __init__(self, bits=64, capacity=1024):
+        self.words = max(1, -(-bits // 64))
+        self._packed = np.zeros((capacity, self.words), dtype=np.uint64)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._live = np.zeros(capacity, dtype=bool)
+        self._slots = {}
+        self._used = 0
+
+    def __len__(self):
+        return len(self._slots)
+
+    def add(self, item_id, value):
+        if self._used == len(self._packed):
+            capacity = 2 * len(self._packed)
+            self._packed = np.resize(self._packed, (capacity, self.words))
+            self._ids = np.resize(self._ids, capacity)
+            self._live = np.resize(self._live, capacity)
+            self._live[self._used:] = False
+
+        slot = self._used
+        self._packed[slot] = pack_hashes([value], 64 * self.words)[0]
+        self._ids[slot] = item_id
+        self._live[slot] = True
+        self._slots[item_id] = slot
+        self._used += 1
+
+    def remove(self, item_id, value=None):
+        slot = self._slots.pop(item_id, None)
+        if slot is not None:
+            self._live[slot] = False
+
+    def query(self, value, radius):
+        """
+        Finds all stored ids whose hash lies within ``radius`` bits of ``value``.
+
+        Args:
+            value (int): The query hash.
+            radius (int): The maximum Hamming distance (inclusive).
+
+        Returns:
+            list: ``(item_id, distance)`` tuples.
+        """
+        if radius < 0 or not self._slots:
+            return []
+
+        query = pack_hashes([value], 64 * self.words)
+        distances = hamming_distances(query, self._packed[:self._used])[0]
+        hits = np.nonzero((distances <= radius) & self._live[:self._used])[0]
+        return list(zip(self._ids[hits].tolist(), distances[hits].tolist()))
+
+    def query_many(self, packed, radius, tile_size=4 * DEFAULT_TILE_SIZE):
+        """
+        Finds the stored ids within ``radius`` bits of each of several hashes, one tile of stored hashes at a time.
+
+        Args:
+            packed (numpy.ndarray): The query hashes as returned by ``pack_hashes``.
+            radius (int): The maximum Hamming distance (inclusive).
+            tile_size (int): Number of stored hashes compared against all queries at once.
+
+        Returns:
+            list: ``(row, item_id)`` tuples, ``row`` being the position of the query in ``packed``.
+        """
+        if radius < 0 or not self._slots or not len(packed):
+            return []
+
+        results = []
+        for start in range(0, self._used, tile_size):
+            end = min(start + tile_size, self._used)
+            close = (hamming_distances(packed, self._packed[start:end]) <= radius) & self._live[start:end]
+            # Hits are rare, and finding them in the flattened tile is much cheaper than a 2D nonzero
+            rows, cols = np.divmod(np.flatnonzero(close), end - start)
+            results.extend(zip(rows.tolist(), self._ids[cols + start].tolist()))
+        return results
+
+
+def _flip_masks(flips):
+    # Every mask of a band with at most ``flips`` bits set
+    masks = [sum(1 << bit for bit in bits) for k in range(flips + 1) for bits in combinations(range(BAND_BITS), k)]
+    return np.array(masks, dtype=np.uint16)
+
+
+class BandIndex:
+    """
+    Read-only multi-index over a packed hash array, for querying a large library that does not change.
+
+    The hashes are split into 16-bit bands and every band is sorted once, which takes a few bytes
+    per hash and band instead of the dicts of ``hash_index.MultiIndexHash``. A query probes each
+    band with all variants within ``radius // bands`` bits by binary search (pigeonhole principle)
+    and verifies the candidates against the full distance; for radii that would need too many
+    probes it falls back to a tiled linear scan.
+    """
+
+    def __init__(self, packed, bits=64, ids=None):
+        """
+        Args:
+            packed (numpy.ndarray): Array of shape ``(n, words)`` as returned by ``pack_hashes``.
+            bits (int): The width of the hashes.
+            ids (numpy.ndarray): The id of every row, by default its position.
+        """
+        self.packed = packed
+        self.bits = bits
+        self.ids = np.arange(len(packed)) if ids is None else np.asarray(ids)
+        self.bands = max(1, -(-bits // BAND_BITS))
+        index_type = np.int32 if len(packed) < 2 ** 31 else np.int64
+        self._keys = []
+        self._order = []
+        for band in range(self.bands):
+            keys = self._band_keys(packed, band)
+            order = np.argsort(keys, kind="stable").astype(index_type)
+            self._keys.append(keys[order])
+            self._order.append(order)
+
+    def __len__(self):
+        return len(self.packed)
+
+    @staticmethod
+    def _band_keys(packed, band):
+        word, shift = divmod(band * BAND_BITS, 64)
+        return ((packed[:, word] >> np.uint64(shift)) & np.uint64(2 ** BAND_BITS - 1)).astype(np.uint16)
+
+    def _candidates(self, query, flips):
+        masks = _flip_masks(flips)
+        rows = []
+        for band in range(self.bands):
+            probes = self._band_keys(query, band)[0] ^ masks
+            keys = self._keys[band]
+            starts = np.searchsorted(keys, probes, "left")
+            ends = np.searchsorted(keys, probes, "right")
+            rows.extend(self._order[band][start:end] for start, end in zip(starts, ends) if end > start)
+        return np.unique(np.concatenate(rows)) if rows else np.empty(0, dtype=np.int64)
+
+    def query(self, value, radius):
+        """
+        Finds all stored ids whose hash lies within ``radius`` bits of ``value``.
+
+        Args:
+            value (int): The query hash.
+            radius (int): The maximum Hamming distance (inclusive).
+
+        Returns:
+            list: ``(item_id, distance)`` tuples.
+        """
+        if radius < 0 or not len(self.packed):
+            return []
+
+        query = pack_hashes([value], 64 * self.packed.shape[1])
+        flips = radius // self.bands
+        results = []
+        if flips <= MAX_BAND_FLIPS:
+            rows = self._candidates(query, flips)
+            distances = hamming_distances(query, self.packed[rows])[0]
+            hits = distances <= radius
+            results.extend(zip(self.ids[rows[hits]].tolist(), distances[hits].tolist()))
+        else:
+            for start in range(0, len(self.packed), LINEAR_TILE_SIZE):
+                distances = hamming_distances(query, self.packed[start:start + LINEAR_TILE_SIZE])[0]
+                hits = np.flatnonzero(distances <= radius)
+                results.extend(zip(self.ids[hits + start].tolist(), distances[hits].tolist()))
+        return results
@@ -0,0 +1,439 @@
+import yaml
+import os
+import tkinter as tk
+import customtkinter as ctk
+from tkinter import messagebox
+from .clustering import KEEPER_POLICIES, LINKAGES
+from .deletion import DEFAULT_DELETE_MODE, DEFAULT_QUARANTINE_FOLDER, DELETE_MODES
+from .hash_algorithms import (DEFAULT_ALGORITHM, DEFAULT_HASH_SIZE, HASH_ALGORITHMS,
+                              VERIFY_METHODS, Hasher)
+from .hash_index import DEFAULT_ENGINE, ENGINES
+from .image_utils import DEFAULT_CHUNK_SIZE, IMAGE_EXTENSIONS
+from .scan_job import DEFAULT_CHECKPOINT_INTERVAL
+from .scanner import DEFAULT_SCAN_WORKERS, DirectoryScanner
+from .thumbnails import DEFAULT_MEMORY_BUDGET, DEFAULT_THUMBNAIL_WORKERS
+
+
+# Preferences shipped with the package, copied to the user's preferences file on first start
+DEFAULT_PREFERENCES_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preferences.yaml")
+
+
+class PreferencesManager:
+    def __init__(self, filename="preferences.yaml"):
+        self.filename = filename
+        self.items_per_page = 20
+        self.tolerance = 5
+        self.match_engine = DEFAULT_ENGINE
+        self.hash_workers = 0
+        self.hash_chunk_size = DEFAULT_CHUNK_SIZE
+        self.use_hash_cache = True
+        self.hash_cache_file = "hash_cache.db"
+        self.fast_decode = True
+        self.linkage = "single"
+        self.exact_prestage = True
+        self.hash_algorithm = DEFAULT_ALGORITHM
+        self.hash_size = DEFAULT_HASH_SIZE
+        self.verify_method = "none"
+        self.verify_threshold = None
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.max_depth = None
+        self.follow_symlinks = False
+        self.scan_workers = DEFAULT_SCAN_WORKERS
+        self.show_thumbnails = True
+        self.thumbnail_memory_mb = DEFAULT_MEMORY_BUDGET // (1024 * 1024)
+        self.thumbnail_folder = None
+        self.thumbnail_workers = DEFAULT_THUMBNAIL_WORKERS
+        self.profile_scans = False
+        self.trace_memory = False
+        self.report_file = None
+        self.use_checkpoint = True
+        self.checkpoint_file = "scan_checkpoint.db"
+        self.checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL
+        self.delete_mode = DEFAULT_DELETE_MODE
+        self.quarantine_folder = DEFAULT_QUARANTINE_FOLDER
+        self.keeper_policy = "largest"
+        self.preferred_folders = []
+
+    def load_preferences(self):
+        filename = self.filename
+        if not os.path.exists(filename):
+            if not os.path.exists(DEFAULT_PREFERENCES_FILE):
+                self.save_default_preferences()
+                return
+            filename = DEFAULT_PREFERENCES_FILE
+
+        try:
+            with open(filename, "r") as f:
+                preferences = yaml.safe_load(f) or {}
+                self.items_per_page = preferences.get('pagination', {}).get('items_per_page', 20)
+                self.tolerance = preferences.get('system', {}).get('image_tolerance', 5)
+                self.match_engine = preferences.get('system', {}).get('match_engine', DEFAULT_ENGINE)
+                if self.match_engine not in ENGINES:
+                    self.match_engine = DEFAULT_ENGINE
+                self.hash_workers = preferences.get('system', {}).get('hash_workers', 0)
+                self.hash_chunk_size = preferences.get('system', {}).get('hash_chunk_size', DEFAULT_CHUNK_SIZE)
+                self.fast_decode = preferences.get('system', {}).get('fast_decode', True)
+                self.linkage = preferences.get('system', {}).get('linkage', "single")
+                self.exact_prestage = preferences.get('system', {}).get('exact_prestage', True)
+                if self.linkage not in LINKAGES:
+                    self.linkage = "single"
+                self.hash_algorithm = preferences.get('system', {}).get('hash_algorithm', DEFAULT_ALGORITHM)
+                if self.hash_algorithm not in HASH_ALGORITHMS:
+                    self.hash_algorithm = DEFAULT_ALGORITHM
+                self.hash_size = preferences.get('system', {}).get('hash_size', DEFAULT_HASH_SIZE)
+                self.verify_method = preferences.get('system', {}).get('verify', "none")
+                if self.verify_method not in VERIFY_METHODS:
+                    self.verify_method = "none"
+                # A hand-edited hash size the hasher rejects would otherwise fail every scan
+                try:
+                    Hasher(self.hash_algorithm, self.hash_size)
+                except (TypeError, ValueError):
+                    self.hash_size = DEFAULT_HASH_SIZE
+                # None uses the default threshold of the verification method
+                self.verify_threshold = preferences.get('system', {}).get('verify_threshold')
+                if not isinstance(self.verify_threshold, (int, float)) or not 0 <= self.verify_threshold <= 1:
+                    self.verify_threshold = None
+                self.include_patterns = preferences.get('scan', {}).get('include', [])
+                self.exclude_patterns = preferences.get('scan', {}).get('exclude', [])
+                self.max_depth = preferences.get('scan', {}).get('max_depth')
+                self.follow_symlinks = preferences.get('scan', {}).get('follow_symlinks', False)
+                self.scan_workers = preferences.get('scan', {}).get('workers', DEFAULT_SCAN_WORKERS)
+                self.use_hash_cache = preferences.get('cache', {}).get('enabled', True)
+                self.hash_cache_file = preferences.get('cache', {}).get('file', "hash_cache.db")
+                self.show_thumbnails = preferences.get('thumbnails', {}).get('enabled', True)
+                self.thumbnail_memory_mb = preferences.get('thumbnails', {}).get(
+                    'memory_mb', DEFAULT_MEMORY_BUDGET // (1024 * 1024))
+                self.thumbnail_folder = preferences.get('thumbnails', {}).get('folder')
+                self.thumbnail_workers = preferences.get('thumbnails', {}).get('workers', DEFAULT_THUMBNAIL_WORKERS)
+                self.profile_scans = preferences.get('diagnostics', {}).get('profile', False)
+                self.trace_memory = preferences.get('diagnostics', {}).get('trace_memory', False)
+                self.report_file = preferences.get('diagnostics', {}).get('report_file')
+                self.use_checkpoint = preferences.get('checkpoint', {}).get('enabled', True)
+                self.checkpoint_file = preferences.get('checkpoint', {}).get('file', "scan_checkpoint.db")
+                self.checkpoint_interval = preferences.get('checkpoint', {}).get('interval',
+                                                                                 DEFAULT_CHECKPOINT_INTERVAL)
+                self.delete_mode = preferences.get('deletion', {}).get('mode', DEFAULT_DELETE_MODE)
+                if self.delete_mode not in DELETE_MODES:
+                    self.delete_mode = DEFAULT_DELETE_MODE
+                self.quarantine_folder = preferences.get('deletion', {}).get('quarantine_folder',
+                                                                             DEFAULT_QUARANTINE_FOLDER)
+                self.keeper_policy = preferences.get('deletion', {}).get('keeper', "largest")
+                if self.keeper_policy not in KEEPER_POLICIES:
+                    self.keeper_policy = "largest"
+                self.preferred_folders = preferences.get('deletion', {}).get('preferred_folders', [])
+        except yaml.YAMLError as e:
+            messagebox.showerror("Error", f"Failed to load preferences: {e}")
+            self.save_default_preferences()
+        else:
+            if filename != self.filename:
+                self.save_preferences()
+
+    def save_preferences(self):
+        try:
+            preferences = {
+                'pagination': {'items_per_page': self.items_per_page},
+                'system': {
+                    'image_tolerance': self.tolerance,
+                    'hash_workers': self.hash_workers,
+                    'hash_chunk_size': self.hash_chunk_size,
+                    'match_engine': self.match_engine,
+                    'fast_decode': self.fast_decode,
+                    'linkage': self.linkage,
+                    'exact_prestage': self.exact_prestage,
+                    'hash_algorithm': self.hash_algorithm,
+                    'hash_size': self.hash_size,
+                    'verify': self.verify_method,
+                    'verify_threshold': self.verify_threshold,
+                },
+                'scan': {
+                    'include': self.include_patterns,
+                    'exclude': self.exclude_patterns,
+                    'max_depth': self.max_depth,
+                    'follow_symlinks': self.follow_symlinks,
+                    'workers': self.scan_workers,
+                },
+                'cache': {'enabled': self.use_hash_cache, 'file': self.hash_cache_file},
+                'thumbnails': {
+                    'enabled': self.show_thumbnails,
+                    'memory_mb': self.thumbnail_memory_mb,
+                    'folder': self.thumbnail_folder,
+                    'workers': self.thumbnail_workers,
+                },
+                'diagnostics': {
+                    'profile': self.profile_scans,
+                    'trace_memory': self.trace_memory,
+                    'report_file': self.report_file,
+                },
+                'checkpoint': {
+                    'enabled': self.use_checkpoint,
+                    'file': self.checkpoint_file,
+                    'interval': self.checkpoint_interval,
+                },
+                'deletion': {
+                    'mode': self.delete_mode,
+                    'quarantine_folder': self.quarantine_folder,
+                    'keeper': self.keeper_policy,
+                    'preferred_folders': self.preferred_folders,
+                },
+            }
+            with open(self.filename, "w") as f:
+                yaml.safe_dump(preferences, f)
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to save preferences: {e}")
+
+    def save_default_preferences(self):
+        self.items_per_page = 20
+        self.tolerance = 5
+        self.match_engine = DEFAULT_ENGINE
+        self.hash_workers = 0
+        self.hash_chunk_size = DEFAULT_CHUNK_SIZE
+        self.use_hash_cache = True
+        self.hash_cache_file = "hash_cache.db"
+        self.fast_decode = True
+        self.linkage = "single"
+        self.exact_prestage = True
+        self.hash_algorithm = DEFAULT_ALGORITHM
+        self.hash_size = DEFAULT_HASH_SIZE
+        self.verify_method = "none"
+        self.verify_threshold = None
+        self.include_patterns = []
+        self.exclude_patterns = []
+        self.max_depth = None
+        self.follow_symlinks = False
+        self.scan_workers = DEFAULT_SCAN_WORKERS
+        self.show_thumbnails = True
+        self.thumbnail_memory_mb = DEFAULT_MEMORY_BUDGET // (1024 * 1024)
+        self.thumbnail_folder = None
+        self.thumbnail_workers = DEFAULT_THUMBNAIL_WORKERS
+        self.profile_scans = False
+        self.trace_memory = False
+        self.report_file = None
+        self.use_checkpoint = True
+        self.checkpoint_file = "scan_checkpoint.db"
+        self.checkpoint_interval = DEFAULT_CHECKPOINT_INTERVAL
+        self.delete_mode = DEFAULT_DELETE_MODE
+        self.quarantine_folder = DEFAULT_QUARANTINE_FOLDER
+        self.keeper_policy = "largest"
+        self.preferred_folders = []
+        self.save_preferences()
+
+    @property
+    def hash_cache_path(self):
+        return self.hash_cache_file if self.use_hash_cache else None
+
+    @property
+    def checkpoint_path(self):
+        return self.checkpoint_file if self.use_checkpoint else None
+
+    def scan_options(self):
+        """
+        Returns the keyword arguments for ``ImageUtils.find_duplicates`` derived from the preferences.
+        """
+        return {
+            'engine': self.match_engine,
+            'workers': self.hash_workers,
+            'chunk_size': self.hash_chunk_size,
+            'cache_path': self.hash_cache_path,
+            'fast_decode': self.fast_decode,
+            'exact_prestage': self.exact_prestage,
+            'hasher': Hasher(self.hash_algorithm, self.hash_size, self.verify_method,
+                             verify_threshold=self.verify_threshold),
+            'scanner': DirectoryScanner(IMAGE_EXTENSIONS, self.include_patterns, self.exclude_patterns, self.max_depth,
+                                        self.follow_symlinks, self.scan_workers),
+        }
+
+    def thumbnail_options(self):
+        """
+        Returns the keyword arguments for ``thumbnails.ThumbnailLoader`` derived from the preferences.
+        """
+        return {
+            'memory_budget': self.thumbnail_memory_mb * 1024 * 1024,
+            'store_folder': self.thumbnail_folder,
+            'workers': self.thumbnail_workers,
+        }
+
+    def deletion_options(self):
+        """
+        Returns the keyword arguments for ``deletion.DeletionEngine`` derived from the preferences.
+        """
+        return {'mode': self.delete_mode, 'quarantine_folder': self.quarantine_folder}
+
+    def report_options(self):
+        """
+        Returns the keyword arguments for ``instrumentation.ScanReport`` derived from the preferences.
+        """
+        return {'profile': self.profile_scans, 'trace_memory': self.trace_memory}
+
+    def open_preferences(self, root, update_pagination, load_page, current_page):
+        pref_window = tk.Toplevel(root)
+        pref_window.title("Preferences")
+        pref_frame = ctk.CTkFrame(pref_window)
+        pref_frame.pack(padx=10, pady=10)
+
+        tolerance_label = ctk.CTkLabel(pref_frame, text="Tolerance Level:")
+        tolerance_label.grid(row=0, column=0, pady=5, sticky='w')
+        tolerance_entry = ctk.CTkEntry(pref_frame)
+        tolerance_entry.grid(row=0, column=1, pady=5, sticky='w')
+        tolerance_entry.insert(0, str(self.tolerance))
+
+        workers_label = ctk.CTkLabel(pref_frame, text="Hashing Processes (0 = all CPUs):")
+        workers_label.grid(row=1, column=0, pady=5, sticky='w')
+        workers_entry = ctk.CTkEntry(pref_frame)
+        workers_entry.grid(row=1, column=1, pady=5, sticky='w')
+        workers_entry.insert(0, str(self.hash_workers))
+
+        chunk_label = ctk.CTkLabel(pref_frame, text="Images Per Chunk:")
+        chunk_label.grid(row=2, column=0, pady=5, sticky='w')
+        chunk_entry = ctk.CTkEntry(pref_frame)
+        chunk_entry.grid(row=2, column=1, pady=5, sticky='w')
+        chunk_entry.insert(0, str(self.hash_chunk_size))
+
+        engine_label = ctk.CTkLabel(pref_frame, text="Match Engine:")
+        engine_label.grid(row=3, column=0, pady=5, sticky='w')
+        engine_menu = ctk.CTkOptionMenu(pref_frame, values=list(ENGINES))
+        engine_menu.grid(row=3, column=1, pady=5, sticky='w')
+        engine_menu.set(self.match_engine)
+
+        linkage_label = ctk.CTkLabel(pref_frame, text="Grouping:")
+        linkage_label.grid(row=4, column=0, pady=5, sticky='w')
+        linkage_menu = ctk.CTkOptionMenu(pref_frame, values=list(LINKAGES))
+        linkage_menu.grid(row=4, column=1, pady=5, sticky='w')
+        linkage_menu.set(self.linkage)
+
+        hash_label = ctk.CTkLabel(pref_frame, text="Hash Algorithm:")
+        hash_label.grid(row=5, column=0, pady=5, sticky='w')
+        hash_menu = ctk.CTkOptionMenu(pref_frame, values=list(HASH_ALGORITHMS))
+        hash_menu.grid(row=5, column=1, pady=5, sticky='w')
+        hash_menu.set(self.hash_algorithm)
+
+        hash_size_label = ctk.CTkLabel(pref_frame, text="Hash Size:")
+        hash_size_label.grid(row=6, column=0, pady=5, sticky='w')
+        hash_size_entry = ctk.CTkEntry(pref_frame)
+        hash_size_entry.grid(row=6, column=1, pady=5, sticky='w')
+        hash_size_entry.insert(0, str(self.hash_size))
+
+        verify_label = ctk.CTkLabel(pref_frame, text="Verify Candidates With:")
+        verify_label.grid(row=7, column=0, pady=5, sticky='w')
+        verify_menu = ctk.CTkOptionMenu(pref_frame, values=list(VERIFY_METHODS))
+        verify_menu.grid(row=7, column=1, pady=5, sticky='w')
+        verify_menu.set(self.verify_method)
+
+        items_label = ctk.CTkLabel(pref_frame, text="Items Per Page:")
+        items_label.grid(row=8, column=0, pady=5, sticky='w')
+        items_entry = ctk.CTkEntry(pref_frame)
+        items_entry.grid(row=8, column=1, pady=5, sticky='w')
+        items_entry.insert(0, str(self.items_per_page))
+
+        cache_var = tk.BooleanVar(value=self.use_hash_cache)
+        cache_checkbox = ctk.CTkCheckBox(pref_frame, text="Cache hashes between scans", variable=cache_var)
+        cache_checkbox.grid(row=9, column=0, columnspan=2, pady=5, sticky='w')
+
+        fast_decode_var = tk.BooleanVar(value=self.fast_decode)
+        fast_decode_checkbox = ctk.CTkCheckBox(pref_frame, text="Fast decoding (reduced resolution)",
+                                               variable=fast_decode_var)
+        fast_decode_checkbox.grid(row=10, column=0, columnspan=2, pady=5, sticky='w')
+
+        exact_prestage_var = tk.BooleanVar(value=self.exact_prestage)
+        exact_prestage_checkbox = ctk.CTkCheckBox(pref_frame, text="Decode byte-identical copies only once",
+                                                  variable=exact_prestage_var)
+        exact_prestage_checkbox.grid(row=11, column=0, columnspan=2, pady=5, sticky='w')
+
+        include_label = ctk.CTkLabel(pref_frame, text="Include Patterns (comma separated):")
+        include_label.grid(row=12, column=0, pady=5, sticky='w')
+        include_entry = ctk.CTkEntry(pref_frame)
+        include_entry.grid(row=12, column=1, pady=5, sticky='w')
+        include_entry.insert(0, ", ".join(self.include_patterns))
+
+        exclude_label = ctk.CTkLabel(pref_frame, text="Exclude Patterns (comma separated):")
+        exclude_label.grid(row=13, column=0, pady=5, sticky='w')
+        exclude_entry = ctk.CTkEntry(pref_frame)
+        exclude_entry.grid(row=13, column=1, pady=5, sticky='w')
+        exclude_entry.insert(0, ", ".join(self.exclude_patterns))
+
+        depth_label = ctk.CTkLabel(pref_frame, text="Max Folder Depth (empty = unlimited):")
+        depth_label.grid(row=14, column=0, pady=5, sticky='w')
+        depth_entry = ctk.CTkEntry(pref_frame)
+        depth_entry.grid(row=14, column=1, pady=5, sticky='w')
+        depth_entry.insert(0, "" if self.max_depth is None else str(self.max_depth))
+
+        symlinks_var = tk.BooleanVar(value=self.follow_symlinks)
+        symlinks_checkbox = ctk.CTkCheckBox(pref_frame, text="Follow symbolic links", variable=symlinks_var)
+        symlinks_checkbox.grid(row=15, column=0, columnspan=2, pady=5, sticky='w')
+
+        thumbnails_var = tk.BooleanVar(value=self.show_thumbnails)
+        thumbnails_checkbox = ctk.CTkCheckBox(pref_frame, text="Show thumbnails", variable=thumbnails_var)
+        thumbnails_checkbox.grid(row=16, column=0, columnspan=2, pady=5, sticky='w')
+
+        profile_var = tk.BooleanVar(value=self.profile_scans)
+        profile_checkbox = ctk.CTkCheckBox(pref_frame, text="Profile scans (slower, added to the scan report)",
+                                           variable=profile_var)
+        profile_checkbox.grid(row=17, column=0, columnspan=2, pady=5, sticky='w')
+
+        trace_memory_var = tk.BooleanVar(value=self.trace_memory)
+        trace_memory_checkbox = ctk.CTkCheckBox(pref_frame, text="Trace memory allocations of scans",
+                                                variable=trace_memory_var)
+        trace_memory_checkbox.grid(row=18, column=0, columnspan=2, pady=5, sticky='w')
+
+        checkpoint_var = tk.BooleanVar(value=self.use_checkpoint)
+        checkpoint_checkbox = ctk.CTkCheckBox(pref_frame, text="Checkpoint scans so interrupted ones can be resumed",
+                                              variable=checkpoint_var)
+        checkpoint_checkbox.grid(row=19, column=0, columnspan=2, pady=5, sticky='w')
+
+        delete_mode_label = ctk.CTkLabel(pref_frame, text="Remove Duplicates By:")
+        delete_mode_label.grid(row=20, column=0, pady=5, sticky='w')
+        delete_mode_menu = ctk.CTkOptionMenu(pref_frame, values=list(DELETE_MODES))
+        delete_mode_menu.grid(row=20, column=1, pady=5, sticky='w')
+        delete_mode_menu.set(self.delete_mode)
+
+        keeper_label = ctk.CTkLabel(pref_frame, text="Keep In Each Group:")
+        keeper_label.grid(row=21, column=0, pady=5, sticky='w')
+        keeper_menu = ctk.CTkOptionMenu(pref_frame, values=list(KEEPER_POLICIES))
+        keeper_menu.grid(row=21, column=1, pady=5, sticky='w')
+        keeper_menu.set(self.keeper_policy)
+
+        preferred_label = ctk.CTkLabel(pref_frame, text="Preferred Folders (comma separated):")
+        preferred_label.grid(row=22, column=0, pady=5, sticky='w')
+        preferred_entry = ctk.CTkEntry(pref_frame)
+        preferred_entry.grid(row=22, column=1, pady=5, sticky='w')
+        preferred_entry.insert(0, ", ".join(self.preferred_folders))
+
+        def save_preferences_and_close():
+            try:
+                # Raises ValueError for hash sizes the algorithm does not support
+                hash_size = Hasher(hash_menu.get(), int(hash_size_entry.get())).hash_size
+                self.tolerance = int(tolerance_entry.get())
+                self.hash_workers = max(0, int(workers_entry.get()))
+                self.hash_chunk_size = max(1, int(chunk_entry.get()))
+                self.items_per_page = int(items_entry.get())
+                self.use_hash_cache = cache_var.get()
+                self.fast_decode = fast_decode_var.get()
+                self.exact_prestage = exact_prestage_var.get()
+                self.include_patterns = [pattern.strip() for pattern in include_entry.get().split(",") if pattern.strip()]
+                self.exclude_patterns = [pattern.strip() for pattern in exclude_entry.get().split(",") if pattern.strip()]
+                self.max_depth = int(depth_entry.get()) if depth_entry.get().strip() else None
+                self.follow_symlinks = symlinks_var.get()
+                self.show_thumbnails = thumbnails_var.get()
+                self.profile_scans = profile_var.get()
+                self.trace_memory = trace_memory_var.get()
+                self.use_checkpoint = checkpoint_var.get()
+                self.delete_mode = delete_mode_menu.get()
+                self.keeper_policy = keeper_menu.get()
+                self.preferred_folders = [folder.strip() for folder in preferred_entry.get().split(",")
+                                          if folder.strip()]
+                self.match_engine = engine_menu.get()
+                self.linkage = linkage_menu.get()
+                self.hash_algorithm = hash_menu.get()
+                self.hash_size = hash_size
+                self.verify_method = verify_menu.get()
+                self.save_preferences()
+                pref_window.destroy()
+                update_pagination()
+                root.after(0, load_page, current_page)  # Schedule on main thread
+            except ValueError:
+                messagebox.showerror("Invalid Input", "Please enter valid integers for tolerance, hashing processes, "
+                                                      "images per chunk, hash size, items per page and max folder "
+                                                      "depth. wHash needs a power of two as hash size.")
+
+        save_button = ctk.CTkButton(pref_frame, text="Save", command=save_preferences_and_close)
+        save_button.grid(row=23, column=0, columnspan=2, pady=10)
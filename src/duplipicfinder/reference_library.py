@@ -0,0 +1,144 @@
+# reference_library.py
+import os
+from collections import namedtuple
+from .hash_index import DEFAULT_ENGINE, MatchGraph
+from .hash_store import HashStore
+from .image_utils import DEFAULT_CHUNK_SIZE, ImageUtils
+from .instrumentation import timed
+from .popcount_matcher import BandIndex
+
+
+LibraryMatch = namedtuple("LibraryMatch", ["path", "match", "in_library"])
+LibraryMatch.__doc__ = """
+A duplicate found while checking a folder against a library: ``path`` is the image of the checked folder,
+``match`` the image it duplicates, which lies in the library if ``in_library`` and in the checked folder otherwise.
+"""
+
+
+class ReferenceLibrary:
+    """
+    Persisted hash index of a reference folder that other folders are checked against.
+
+    The library is hashed once with ``build`` and saved as a ``HashStore`` file. Checking a folder
+    with ``query`` then only hashes that folder and looks every image up in a ``BandIndex`` over the
+    memory-mapped library, so an incoming batch costs work proportional to the batch, not the library.
+    Library and checked images are recorded with absolute paths, whatever directory the folders were given from.
+    """
+
+    def __init__(self, store):
+        """
+        Args:
+            store (HashStore): The fingerprints of the library images.
+        """
+        self.store = store
+        self._index = None
+
+    def __len__(self):
+        return len(self.store.ids())
+
+    @property
+    def hasher(self):
+        return self.store.hasher
+
+    @classmethod
+    def build(cls, folder_path, filename, progress_callback, scanner=None, hasher=None, workers=0,
+              chunk_size=DEFAULT_CHUNK_SIZE, cache_path=None, fast_decode=True, exact_prestage=True, report=None,
+              job=None):
+        """
+        Hashes a folder and saves it as a library. With a hash cache, rebuilding an existing library only
+        hashes the images added or changed since.
+
+        Args:
+            folder_path (str): The reference folder.
+            filename (str): The file the library is saved to.
+            progress_callback (function): Called with ``(current, total, percent, phase, eta)`` while hashing.
+            scanner (DirectoryScanner): The scanner to use, see ``ImageUtils.scan_folder``.
+            hasher (hash_algorithms.Hasher): The hashes to compute, by default a 64-bit pHash. Folders are
+                checked against the library with the same hashes.
+            report (instrumentation.ScanReport): Optionally records timings, counters and errors.
+            job (scan_job.ScanJob): Optionally lets hashing be paused and cancelled; a cancelled build saves nothing.
+            See ``ImageUtils.iter_hashes`` for the remaining arguments.
+
+        Returns:
+            ReferenceLibrary: The library.
+        """
+        folder_path = os.path.abspath(folder_path)
+        store, stats = ImageUtils.scan_into_store(folder_path, scanner, report, hasher=hasher)
+        for i, fingerprint in ImageUtils.iter_hashes(store.paths, progress_callback, workers, chunk_size, cache_path,
+                                                     fast_decode, folder_path, exact_prestage, stats, store.hasher,
+                                                     report, job):
+            store.put(i, fingerprint)
+        store.save(filename)
+        return cls(store)
+
+    @classmethod
+    def load(cls, filename, hasher=None):
+        """
+        Loads a library saved by ``build``, memory-mapped; see ``HashStore.load``.
+        """
+        return cls(HashStore.load(filename, hasher))
+
+    def index(self):
+        """
+        Returns the ``BandIndex`` over the library, building it on first use.
+        """
+        if self._index is None:
+            ids = self.store.ids()
+            packed = self.store.packed if len(ids) == len(self.store) else self.store.packed[ids]
+            self._index = BandIndex(packed, self.hasher.bits, ids)
+        return self._index
+
+    def query(self, folder_path, tolerance, progress_callback, scanner=None, within_batch=False,
+              engine=DEFAULT_ENGINE, workers=0, chunk_size=DEFAULT_CHUNK_SIZE, cache_path=None, fast_decode=True,
+              exact_prestage=True, report=None, job=None):
+        """
+        Checks the images of a folder against the library and streams the duplicates as they are found.
+
+        Images of the folder that are also in the library under the same path are not reported as
+        duplicates of themselves, also when the folder is given relative to another directory or in
+        another case on a case-insensitive file system.
+
+        Args:
+            folder_path (str): The folder to check.
+            tolerance (int): Images whose hashes differ in fewer bits are duplicates.
+            progress_callback (function): Called with ``(current, total, percent, phase, eta)`` while hashing.
+            scanner (DirectoryScanner): The scanner to use, see ``ImageUtils.scan_folder``.
+            within_batch (bool): Whether to also match the images of the folder against each other.
+            engine (str): The match engine used within the folder, one of ``hash_index.ENGINES``.
+            report (instrumentation.ScanReport): Optionally records timings, counters and errors.
+            job (scan_job.ScanJob): Optionally lets hashing be paused and cancelled.
+            See ``ImageUtils.iter_hashes`` for the remaining arguments.
+
+        Yields:
+            LibraryMatch: Every duplicate found.
+        """
+        index = self.index()
+        batch, stats = ImageUtils.scan_into_store(os.path.abspath(folder_path), scanner, report, hasher=self.hasher)
+        graph = MatchGraph(tolerance, engine, batch) if within_batch else None
+
+        def accept(i, match_id, store):
+            confirmed = batch.confirms(i, match_id, store)
+            if report is not None:
+                report.count("pairs_evaluated")
+                if not confirmed:
+                    report.count("pairs_rejected")
+            return confirmed
+
+        for i, fingerprint in ImageUtils.iter_hashes(batch.paths, progress_callback, workers, chunk_size, cache_path,
+                                                     fast_decode, None, exact_prestage, stats, self.hasher, report,
+                                                     job):
+            value = batch.put(i, fingerprint)
+            path = batch.paths[i]
+            normalized = os.path.normcase(path)
+            matches = []
+            with timed(report, "match"):
+                for match_id, _ in sorted(index.query(value, tolerance - 1)):
+                    match = self.store.paths[match_id]
+                    if os.path.normcase(match) != normalized and accept(i, match_id, self.store):
+                        matches.append(LibraryMatch(path, match, True))
+                if graph is not None:
+                    for j in sorted(graph.add(i, value, self.hasher.bits, lambda j: accept(i, j, batch))):
+                        matches.append(LibraryMatch(path, batch.paths[j], False))
+            if report is not None:
+                report.count("pairs_found", len(matches))
+            yield from matches
@@ -0,0 +1,244 @@
+# results_view.py
+import tkinter as tk
+import customtkinter as ctk
+from PIL import Image
+from .thumbnails import THUMBNAIL_SIZE
+
+
+# Fixed height of a result row; rows must share one height so the visible slice can be computed from the scroll offset
+ROW_HEIGHT = 64
+# Duplicate paths listed in a row before the rest are summarized
+ROW_LINES = 3
+# Header text and the columns it spans
+COLUMN_HEADERS = [('Index', 0, 1), ('Select', 1, 1), ('Keep', 2, 2), ('Duplicates', 4, 2)]
+
+
+def _configure_columns(frame):
+    # Shared by the header and every row so the columns line up
+    frame.grid_columnconfigure(0, minsize=60)
+    frame.grid_columnconfigure(1, minsize=130)
+    frame.grid_columnconfigure(2, minsize=THUMBNAIL_SIZE + 10)
+    frame.grid_columnconfigure(3, weight=1, uniform="path")
+    frame.grid_columnconfigure(4, minsize=(THUMBNAIL_SIZE + 4) * ROW_LINES + 10)
+    frame.grid_columnconfigure(5, weight=1, uniform="path")
+
+
+class _ResultRow:
+    """
+    One pooled row. Its widgets are created once and re-pointed at whichever group scrolls into its slot.
+    """
+
+    def __init__(self, master, on_toggle, on_view):
+        self.index = None
+        self.paths = []
+        self.frame = ctk.CTkFrame(master, height=ROW_HEIGHT, corner_radius=0)
+        _configure_columns(self.frame)
+        self.number_label = ctk.CTkLabel(self.frame, text="")
+        self.number_label.grid(row=0, column=0, sticky='nsew')
+        self.selected = tk.BooleanVar(value=False)
+        self.checkbox = ctk.CTkCheckBox(self.frame, text="Mark Delete", variable=self.selected,
+                                        command=lambda: on_toggle(self.index))
+        self.checkbox.grid(row=0, column=1, sticky='ew')
+        self.keeper_label = ctk.CTkLabel(self.frame, text="", anchor='w', justify=tk.LEFT)
+        self.keeper_label.grid(row=0, column=3, sticky='nsew', padx=5)
+        self.duplicates_label = ctk.CTkLabel(self.frame, text="", anchor='w', justify=tk.LEFT)
+        self.duplicates_label.grid(row=0, column=5, sticky='nsew', padx=5)
+
+        # Thumbnails of the keeper and the first duplicates; clicking one opens the image
+        self.thumbnail_labels = [ctk.CTkLabel(self.frame, text="", width=THUMBNAIL_SIZE, height=THUMBNAIL_SIZE)]
+        self.thumbnail_labels[0].grid(row=0, column=2, padx=5)
+        duplicates_frame = ctk.CTkFrame(self.frame, fg_color="transparent")
+        duplicates_frame.grid(row=0, column=4, sticky='w', padx=5)
+        for slot in range(ROW_LINES):
+            label = ctk.CTkLabel(duplicates_frame, text="", width=THUMBNAIL_SIZE, height=THUMBNAIL_SIZE)
+            label.pack(side=tk.LEFT, padx=2)
+            self.thumbnail_labels.append(label)
+        for slot, label in enumerate(self.thumbnail_labels):
+            label.bind("<Button-1>", lambda e, slot=slot: on_view(self.paths[slot]) if slot < len(self.paths) else None)
+
+    def show(self, index, number, group, selected):
+        self.index = index
+        self.paths = ResultsView.row_paths(group)
+        self.number_label.configure(text=number)
+        self.selected.set(selected)
+        self.keeper_label.configure(text=group.keeper)
+        lines = list(group.duplicates[:ROW_LINES])
+        if len(group.duplicates) > ROW_LINES:
+            lines[-1] = f"... and {len(group.duplicates) - ROW_LINES + 1} more"
+        self.duplicates_label.configure(text="\n".join(lines))
+
+    def show_thumbnails(self, image_for, placeholder):
+        for slot, label in enumerate(self.thumbnail_labels):
+            image = image_for(self.paths[slot]) if slot < len(self.paths) else None
+            label.configure(image=image or placeholder)
+
+
+class ResultsView(ctk.CTkFrame):
+    """
+    Scrollable list of duplicate groups that only ever creates widgets for the rows that fit on screen.
+
+    Scrolling re-fills the same pool of row widgets with other groups instead of creating new ones, so
+    showing, scrolling and selecting costs the same for ten groups as for a hundred thousand.
+    """
+
+    def __init__(self, master, is_selected, on_toggle, thumbnail=None, on_view=None, on_redraw=None):
+        """
+        Args:
+            master: The parent widget.
+            is_selected (function): Called with a group, returns whether it is marked for deletion.
+            on_toggle (function): Called with a group whose checkbox was clicked.
+            thumbnail (function): Optionally called with an image path, returns its ``PIL.Image.Image``
+                thumbnail or None while it is not available.
+            on_view (function): Optionally called with the path of a clicked thumbnail.
+            on_redraw (function): Optionally called after the rows were filled, e.g. to load their thumbnails.
+        """
+        super().__init__(master)
+        self.is_selected = is_selected
+        self.on_toggle = on_toggle
+        self.thumbnail = thumbnail
+        self.on_view = on_view
+        self.on_redraw = on_redraw
+        self.items = []
+        self.offset = 0
+        self.first = 0
+        self.rows = []
+        # Tk images of the thumbnails on screen; rebuilt on every redraw, so it never outgrows the visible rows
+        self._photos = {}
+        blank = Image.new("RGB", (THUMBNAIL_SIZE, THUMBNAIL_SIZE), "gray")
+        self._placeholder = ctk.CTkImage(blank, blank, size=blank.size)
+
+        self.grid_rowconfigure(1, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        header = ctk.CTkFrame(self, corner_radius=0)
+        header.grid(row=0, column=0, sticky='ew')
+        _configure_columns(header)
+        for text, col, span in COLUMN_HEADERS:
+            ctk.CTkLabel(header, text=text, anchor='w' if col > 1 else 'center').grid(
+                row=0, column=col, columnspan=span, sticky='nsew', padx=5 if col > 1 else 0)
+
+        self.body = tk.Frame(self)
+        self.body.grid(row=1, column=0, sticky='nsew')
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.on_scrollbar)
+        self.scrollbar.grid(row=1, column=1, sticky='ns')
+
+        self.body.bind("<Configure>", lambda e: self.redraw())
+
+    def set_items(self, items, offset=0, reset_scroll=False):
+        """
+        Shows a new list of groups, reusing the row widgets.
+
+        Args:
+            items (list): The ``clustering.DuplicateGroup`` tuples to show.
+            offset (int): Number added to the list position to give the displayed index.
+            reset_scroll (bool): Whether to scroll back to the first group; otherwise the position is kept.
+        """
+        self.items = items
+        self.offset = offset
+        if reset_scroll:
+            self.first = 0
+        self.redraw()
+
+    def visible_rows(self):
+        return max(1, self.body.winfo_height() // ROW_HEIGHT)
+
+    def scroll_to(self, first):
+        self.first = max(0, min(first, len(self.items) - self.visible_rows()))
+        self.redraw()
+
+    def redraw(self):
+        """
+        Fills the pooled rows with the groups from the current scroll position.
+        """
+        visible = self.visible_rows()
+        self.first = max(0, min(self.first, len(self.items) - visible))
+        while len(self.rows) < visible:
+            self.rows.append(_ResultRow(self.body, self._toggle, self._view))
+
+        for slot, row in enumerate(self.rows):
+            index = self.first + slot
+            if slot < visible and index < len(self.items):
+                row.show(index, self.offset + index + 1, self.items[index], self.is_selected(self.items[index]))
+                row.frame.place(x=0, y=slot * ROW_HEIGHT, relwidth=1, height=ROW_HEIGHT)
+            else:
+                row.index = None
+                row.frame.place_forget()
+        self.refresh_thumbnails()
+        if self.on_redraw is not None:
+            self.on_redraw()
+
+        if self.items:
+            self.scrollbar.set(self.first / len(self.items), min(1.0, (self.first + visible) / len(self.items)))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def refresh_item(self, index):
+        """
+        Updates the checkbox of a single group if it is on screen.
+
+        Args:
+            index (int): Position of the group in the shown list.
+        """
+        for row in self.rows:
+            if row.index == index:
+                row.selected.set(self.is_selected(self.items[index]))
+
+    @staticmethod
+    def row_paths(group):
+        """
+        Returns the paths of the images a row shows thumbnails for: the keeper and the first duplicates.
+        """
+        return [group.keeper] + list(group.duplicates[:ROW_LINES])
+
+    def visible_paths(self):
+        """
+        Returns the paths of the images whose thumbnails are on screen, in display order.
+        """
+        return [path for row in self.rows if row.index is not None for path in row.paths]
+
+    def refresh_thumbnails(self):
+        """
+        Shows the thumbnails that became available for the rows on screen.
+        """
+        if self.thumbnail is None:
+            return
+        photos = {}
+
+        def image_for(path):
+            if path not in photos:
+                photo = self._photos.get(path)
+                if photo is None:
+                    image = self.thumbnail(path)
+                    photo = ctk.CTkImage(image, image, size=image.size) if image is not None else None
+                photos[path] = photo
+            return photos[path]
+
+        for row in self.rows:
+            if row.index is not None:
+                row.show_thumbnails(image_for, self._placeholder)
+        self._photos = {path: photo for path, photo in photos.items() if photo is not None}
+
+    def _view(self, path):
+        if self.on_view is not None:
+            self.on_view(path)
+
+    def _toggle(self, index):
+        if index is not None:
+            self.on_toggle(self.items[index])
+            self.refresh_item(index)
+
+    def on_scrollbar(self, action, value, unit=None):
+        if action == "moveto":
+            self.scroll_to(round(float(value) * len(self.items)))
+        elif action == "scroll":
+            step = self.visible_rows() if unit == "pages" else 1
+            self.scroll_to(self.first + int(value) * step)
+
+    def on_mouse_wheel(self, event):
+        if event.num == 4:
+            delta = -1
+        elif event.num == 5:
+            delta = 1
+        else:
+            delta = -1 if event.delta > 0 else 1
+        self.scroll_to(self.first + delta * 3)
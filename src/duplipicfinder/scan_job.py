@@ -0,0 +1,259 @@
+# scan_job.py
+import logging
+import os
+import sqlite3
+import threading
+import time
+from .scanner import ScanEntry
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds between commits of a scan checkpoint
+DEFAULT_CHECKPOINT_INTERVAL = 30
+_PAGE_SIZE = 4096
+
+
+class ScanCancelled(Exception):
+    """
+    Raised inside a scan by ``ScanJob.check`` once the job has been cancelled.
+    """
+
+
+class ScanJob:
+    """
+    Runs a scan on a background thread and lets the UI pause, resume and cancel it.
+
+    Pausing and cancelling are cooperative: the pipeline calls ``check`` after every image, which blocks
+    while the job is paused and raises ``ScanCancelled`` once it is cancelled. A scan therefore stops
+    within one image, plus the chunks already handed to the hashing processes.
+    """
+
+    def __init__(self):
+        self._running = threading.Event()
+        self._running.set()
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def start(self, target, *args):
+        """
+        Calls ``target(*args)`` on a new daemon thread.
+        """
+        self._thread = threading.Thread(target=target, args=args, daemon=True)
+        self._thread.start()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        # A paused scan has to wake up to notice it was cancelled
+        self._running.set()
+
+    def check(self):
+        """
+        Blocks while the job is paused. Called by the scan thread between images.
+
+        Raises:
+            ScanCancelled: If the job has been cancelled.
+        """
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise ScanCancelled()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class ScanCheckpoint:
+    """
+    Persists the progress of a scan to an SQLite file so an interrupted scan can be resumed.
+
+    The files discovered by the walk are recorded in walk order, and every computed fingerprint is
+    recorded by path, size and modification time like in ``hash_cache.HashCache``. Writes are committed
+    at most every ``interval`` seconds, so a crash loses at most that much work. A scan resumed from
+    the checkpoint skips the walk if it had completed and reuses the fingerprints of unchanged files.
+
+    A checkpoint belongs to one folder and hashing pipeline; opening it for another one starts over.
+    It can be handed from the UI thread to the scan thread, but must only be used by one at a time.
+    """
+
+    def __init__(self, filename, folder_path, algorithm, interval=DEFAULT_CHECKPOINT_INTERVAL):
+        """
+        Args:
+            filename (str): The checkpoint file.
+            folder_path (str): The folder scanned.
+            algorithm (str): The hashing pipeline, see ``ImageUtils.hash_algorithm``.
+            interval (float): Seconds between commits.
+        """
+        self.filename = filename
+        self.folder_path = folder_path
+        self.algorithm = algorithm
+        self.interval = interval
+        self._last_commit = time.monotonic()
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        self._connection.executescript(
+            "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS files ("
+            "position INTEGER PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL);"
+        )
+        if self._meta("folder") != folder_path or self._meta("algorithm") != algorithm:
+            self.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        """
+        Returns the number of files discovered so far.
+        """
+        return self._connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    def _meta(self, key):
+        row = self._connection.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def _set_meta(self, key, value):
+        self._connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def walk_complete(self):
+        return self._meta("walk_complete") == "1"
+
+    @property
+    def hashed(self):
+        """
+        int: The number of fingerprints recorded.
+        """
+        return self._connection.execute("SELECT COUNT(*) FROM hashes").fetchone()[0]
+
+    @property
+    def resumable(self):
+        """
+        bool: Whether the checkpoint holds work of an earlier scan.
+        """
+        return self.hashed > 0 or self.walk_complete
+
+    def clear(self):
+        """
+        Drops the recorded progress, e.g. to scan the folder from scratch.
+        """
+        self._connection.execute("DELETE FROM meta")
+        self._connection.execute("DELETE FROM files")
+        self._connection.execute("DELETE FROM hashes")
+        self._set_meta("folder", self.folder_path)
+        self._set_meta("algorithm", self.algorithm)
+        self.commit()
+
+    def add_entries(self, entries):
+        """
+        Records files discovered by the walk, appended in walk order.
+
+        Args:
+            entries (list): ``scanner.ScanEntry`` tuples.
+        """
+        position = len(self)
+        self._connection.executemany(
+            "INSERT INTO files (position, path, size, mtime_ns) VALUES (?, ?, ?, ?)",
+            ((position + offset, entry.path, entry.size, entry.mtime_ns) for offset, entry in enumerate(entries))
+        )
+        self.commit_if_due()
+
+    def restart_walk(self):
+        """
+        Drops the files recorded by an incomplete walk, before the walk is repeated.
+        """
+        self._connection.execute("DELETE FROM files")
+        self.commit()
+
+    def finish_walk(self):
+        """
+        Marks the walk as complete, so a resumed scan reads the files from the checkpoint instead.
+        """
+        self._set_meta("walk_complete", "1")
+        self.commit()
+
+    def entries(self):
+        """
+        Streams the files recorded, reading them a page at a time.
+
+        Yields:
+            scanner.ScanEntry: Every file, in walk order.
+        """
+        position = 0
+        while True:
+            rows = self._connection.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE position >= ? ORDER BY position LIMIT ?",
+                (position, _PAGE_SIZE)
+            ).fetchall()
+            for row in rows:
+                yield ScanEntry(*row)
+            if len(rows) < _PAGE_SIZE:
+                return
+            position += len(rows)
+
+    def get(self, path, size, mtime_ns):
+        """
+        Looks up the recorded fingerprint of a file.
+
+        Returns:
+            str: The fingerprint as serialized by ``Hasher.to_text``.
+            None: If no fingerprint was recorded or the file has changed since.
+        """
+        row = self._connection.execute(
+            "SELECT hash FROM hashes WHERE path = ? AND size = ? AND mtime_ns = ?", (path, size, mtime_ns)
+        ).fetchone()
+        return row[0] if row is not None else None
+
+    def put(self, path, size, mtime_ns, hash_hex):
+        self._connection.execute(
+            "INSERT OR REPLACE INTO hashes (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+            (path, size, mtime_ns, hash_hex)
+        )
+        self.commit_if_due()
+
+    def commit_if_due(self):
+        """
+        Commits pending writes if ``interval`` seconds have passed since the last commit.
+        """
+        if time.monotonic() - self._last_commit >= self.interval:
+            self.commit()
+
+    def commit(self):
+        self._connection.commit()
+        self._last_commit = time.monotonic()
+
+    def close(self):
+        self.commit()
+        self._connection.close()
+
+    def discard(self):
+        """
+        Closes and deletes the checkpoint once its scan has completed.
+        """
+        self._connection.close()
+        try:
+            os.remove(self.filename)
+        except OSError as e:
+            logger.warning("Failed to remove the scan checkpoint %s: %s", self.filename, e)
@@ -0,0 +1,277 @@
+# scan_session.py
+import os
+from itertools import islice
+from .clustering import group_duplicates
+from .hash_algorithms import Hasher
+from .hash_index import DEFAULT_ENGINE, MatchGraph
+from .hash_store import HashStore
+from .image_utils import DEFAULT_CHUNK_SIZE, HashPipeline, ImageUtils
+from .instrumentation import ProgressReporter, timed
+
+
+# Images taken from the walk at a time during a scan; the walk never runs further ahead of hashing
+WALK_BATCH_SIZE = 2048
+
+
+class ScanSession:
+    """
+    Keeps the hashes and match graph of a scanned folder in memory.
+
+    After the initial ``scan``, deleted, changed and newly added images are applied incrementally:
+    removed images drop out of the graph together with their pairs, and only new images and images
+    whose size or modification time changed are hashed and queried against the index, so nothing
+    is re-walked, re-hashed or re-matched from scratch.
+    Paths and fingerprints live in a ``HashStore``; ids of removed images are not reused.
+    """
+
+    def __init__(self, folder_path, tolerance, engine=DEFAULT_ENGINE, workers=0, chunk_size=DEFAULT_CHUNK_SIZE,
+                 cache_path=None, fast_decode=True, exact_prestage=True, scanner=None, hasher=None):
+        self.folder_path = folder_path
+        self.tolerance = tolerance
+        self.engine = engine
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.cache_path = cache_path
+        self.fast_decode = fast_decode
+        self.exact_prestage = exact_prestage
+        self.scanner = scanner
+        self.hasher = hasher or Hasher()
+        self._reset()
+
+    def _reset(self):
+        self.store = HashStore(self.hasher)
+        self._graph = MatchGraph(self.tolerance, self.engine, self.store)
+        self._ids = {}
+        # (size, mtime_ns) of every image when it was hashed, so ``refresh`` notices images changed in place
+        self._stats = {}
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, path):
+        return path in self._ids
+
+    @property
+    def algorithm(self):
+        """
+        str: Identifies the hashing pipeline of the session, e.g. to open a ``scan_job.ScanCheckpoint``.
+        """
+        return ImageUtils.hash_algorithm(self.fast_decode, self.hasher)
+
+    def _insert(self, images, progress_callback, duplicate_callback, stats=None, report=None, job=None,
+                checkpoint=None, pipeline=None):
+        # Ids follow the order of ``images`` so results do not depend on the order hashes complete in
+        base = len(self.store)
+        stats = list(stats) if stats is not None else [None] * len(images)
+        for i, image in enumerate(images):
+            self.store.add(image)
+            if stats[i] is None:
+                try:
+                    stat = os.stat(image)
+                    stats[i] = (stat.st_size, stat.st_mtime_ns)
+                except OSError:
+                    pass  # Reported by iter_hashes
+        added = 0
+
+        def accept(item_id, other_id):
+            return self._accept(item_id, other_id, report)
+
+        def linked(matched):
+            for item_id, matches in matched:
+                if report is not None:
+                    report.count("pairs_found", len(matches))
+                if duplicate_callback is not None:
+                    for other_id in sorted(matches):
+                        duplicate_callback(self._pair(item_id, other_id))
+
+        try:
+            for i, fingerprint in ImageUtils.iter_hashes(images, progress_callback, self.workers, self.chunk_size,
+                                                         self.cache_path, self.fast_decode, None, self.exact_prestage,
+                                                         stats, self.hasher, report, job, checkpoint, pipeline):
+                item_id = base + i
+                self._ids[images[i]] = item_id
+                self._stats[images[i]] = stats[i]
+                value = self.store.put(item_id, fingerprint)
+                with timed(report, "match"):
+                    matched = self._graph.push(item_id, value, self.hasher.bits, accept)
+                linked(matched)
+                added += 1
+        finally:
+            # Hashes still buffered by the match graph are matched even if hashing was cancelled
+            with timed(report, "match"):
+                matched = self._graph.flush(accept)
+            linked(matched)
+        return added
+
+    def _accept(self, item_id, other_id, report):
+        confirmed = self.store.confirms(item_id, other_id)
+        if report is not None:
+            report.count("pairs_evaluated")
+            if not confirmed:
+                report.count("pairs_rejected")
+        return confirmed
+
+    def _fingerprint(self, path):
+        # Copies found in a later batch of a scan reuse the fingerprint already in the store
+        item_id = self._ids.get(path)
+        return self.store.fingerprint(item_id) if item_id is not None else None
+
+    def _pair(self, id1, id2):
+        if id1 > id2:
+            id1, id2 = id2, id1
+        return self.store.paths[id1], self.store.paths[id2]
+
+    def scan(self, progress_callback, duplicate_callback=None, report=None, job=None, checkpoint=None):
+        """
+        Hashes every image in the folder and matches them from scratch.
+
+        The folder is walked while it is hashed: images are taken from the walk ``WALK_BATCH_SIZE``
+        at a time, so a huge tree is never enumerated into memory ahead of the hashing processes.
+        All batches share one ``HashPipeline``, so the hashing processes and the hash cache are set up
+        once and byte-identical copies are found across batches.
+
+        Args:
+            progress_callback (function): Called with ``(current, total, percent, phase, eta)`` while hashing;
+                ``total`` grows while the walk is still discovering images.
+            duplicate_callback (function): Optionally called with each ``(path1, path2)`` pair as soon as it is found.
+            report (instrumentation.ScanReport): Optionally records timings, counters and errors.
+            job (scan_job.ScanJob): Optionally lets the scan be paused and cancelled.
+            checkpoint (scan_job.ScanCheckpoint): Optionally records the images discovered and hashed. A scan
+                interrupted before is resumed from it: a completed walk is not repeated and recorded
+                fingerprints of unchanged images are reused.
+
+        Returns:
+            list: The duplicate pairs, see ``duplicates``.
+
+        Raises:
+            scan_job.ScanCancelled: If the job was cancelled; the images matched until then stay in the session.
+        """
+        self._reset()
+        resume_walk = checkpoint is not None and checkpoint.walk_complete
+        if resume_walk:
+            entries = checkpoint.entries()
+        else:
+            if checkpoint is not None:
+                checkpoint.restart_walk()
+            entries = ImageUtils.iter_folder(self.folder_path, self.scanner, report)
+        progress = ProgressReporter(progress_callback, "hash", len(checkpoint) if resume_walk else 0)
+        progress.total_known = resume_walk
+
+        def batch_progress(current, total, percent, phase, eta):
+            # Progress of a batch is reported relative to the whole folder
+            progress.phase = phase
+            progress.update(offset + current)
+
+        with HashPipeline(self.workers, self.cache_path, self.fast_decode, self.hasher, self._fingerprint) as pipeline:
+            while True:
+                batch = list(islice(entries, WALK_BATCH_SIZE))
+                walk_complete = len(batch) < WALK_BATCH_SIZE
+                if not resume_walk:
+                    progress.total += len(batch)
+                    progress.total_known = walk_complete
+                    if checkpoint is not None:
+                        checkpoint.add_entries(batch)
+                        if walk_complete:
+                            checkpoint.finish_walk()
+                offset = len(self.store)
+                if batch:
+                    self._insert([entry.path for entry in batch], batch_progress, duplicate_callback,
+                                 [(entry.size, entry.mtime_ns) for entry in batch], report, job, checkpoint, pipeline)
+                if walk_complete:
+                    break
+
+            # Batches only see their own images, so vanished files are pruned from the cache once at the end
+            if pipeline.cache is not None:
+                with timed(report, "cache"):
+                    pruned = pipeline.cache.prune(self.folder_path, set(self.store.paths))
+                if report is not None:
+                    report.count("cache_pruned", pruned)
+        return self.duplicates()
+
+    def add_images(self, images, progress_callback, duplicate_callback=None, stats=None, report=None, job=None):
+        """
+        Hashes new images and matches them against the index and each other.
+
+        Args:
+            images (list): The image file paths to add. Paths already in the session are re-hashed.
+            progress_callback (function): Called with ``(current, total, percent, phase, eta)`` while hashing.
+            duplicate_callback (function): Optionally called with each new ``(path1, path2)`` pair.
+            stats (list): Optional ``(size, mtime_ns)`` per image from a directory scan.
+            report (instrumentation.ScanReport): Optionally records timings, counters and errors.
+            job (scan_job.ScanJob): Optionally lets hashing be paused and cancelled.
+
+        Returns:
+            int: The number of images added.
+        """
+        self.remove_images([image for image in images if image in self._ids])
+        return self._insert(images, progress_callback, duplicate_callback, stats, report, job)
+
+    def remove_images(self, paths):
+        """
+        Drops images from the graph together with every pair they were part of.
+
+        Args:
+            paths (iterable): The image file paths to remove. Unknown paths are ignored.
+
+        Returns:
+            int: The number of images removed.
+        """
+        removed = 0
+        for path in paths:
+            item_id = self._ids.pop(path, None)
+            if item_id is None:
+                continue
+            del self._stats[path]
+            self._graph.remove(item_id)
+            self.store.remove(item_id)
+            removed += 1
+        return removed
+
+    def refresh(self, progress_callback, duplicate_callback=None, report=None, job=None):
+        """
+        Re-walks the folder and applies removed, changed and newly added images incrementally.
+
+        An image is re-hashed when its size or modification time differs from when it was hashed, e.g. after
+        it was edited or replaced in place; its old pairs are dropped and it is matched again.
+
+        Args:
+            progress_callback (function): Called with ``(current, total, percent, phase, eta)`` while hashing
+                new and changed images.
+            duplicate_callback (function): Optionally called with each new ``(path1, path2)`` pair.
+            report (instrumentation.ScanReport): Optionally records timings, counters and errors.
+            job (scan_job.ScanJob): Optionally lets hashing be paused and cancelled.
+
+        Returns:
+            list: The duplicate pairs, see ``duplicates``.
+        """
+        entries = ImageUtils.scan_folder(self.folder_path, self.scanner, report)
+        current = {entry.path for entry in entries}
+        self.remove_images([path for path in self._ids if path not in current])
+        new_entries = [entry for entry in entries
+                       if entry.path not in self._ids or self._stats[entry.path] != (entry.size, entry.mtime_ns)]
+        self.add_images([entry.path for entry in new_entries], progress_callback, duplicate_callback,
+                        [(entry.size, entry.mtime_ns) for entry in new_entries], report, job)
+        return self.duplicates()
+
+    def duplicates(self):
+        """
+        Returns the current duplicate pairs.
+
+        Returns:
+            list: ``(path1, path2)`` tuples ordered by when the images entered the session.
+        """
+        return [self._pair(id1, id2) for id1, id2 in self._graph.pairs()]
+
+    def groups(self, linkage="single", keeper_policy="largest", preferred_folders=None):
+        """
+        Returns the current duplicates clustered into groups with a keeper each.
+
+        Args:
+            linkage (str): One of ``clustering.LINKAGES``.
+            keeper_policy (str): One of ``clustering.KEEPER_POLICIES``.
+            preferred_folders (list): Folders in order of preference, for the ``"folder"`` keeper policy.
+
+        Returns:
+            list: ``clustering.DuplicateGroup`` tuples.
+        """
+        return group_duplicates(self.duplicates(), linkage, keeper_policy, preferred_folders=preferred_folders)
@@ -0,0 +1,142 @@
+# scanner.py
+import logging
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from fnmatch import fnmatch
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SCAN_WORKERS = 8
+# Directories listed ahead of the consumer per worker, see ``DirectoryScanner.iter_scan``
+PREFETCH_PER_WORKER = 4
+
+ScanEntry = namedtuple("ScanEntry", ["path", "size", "mtime_ns"])
+ScanEntry.__doc__ = """
+A file found by ``DirectoryScanner`` together with the size and modification time from its directory listing.
+"""
+
+
+class DirectoryScanner:
+    """
+    Walks a directory tree with ``os.scandir`` on a thread pool, one task per directory.
+
+    Listing is I/O bound, so on network shares and deep trees several directories are read at once.
+    The stat results of the listing are kept so later stages do not need to stat the files again.
+    Directories already visited (by device and inode) are skipped, which breaks symlink and hardlink
+    loops, and additional hardlinks to an already found file are skipped as well.
+    """
+
+    def __init__(self, extensions, include=None, exclude=None, max_depth=None, follow_symlinks=False,
+                 workers=DEFAULT_SCAN_WORKERS):
+        """
+        Args:
+            extensions (iterable): Lower-case file extensions to collect, including the dot.
+            include (list): Glob patterns; if given, a file must match one of them.
+            exclude (list): Glob patterns for files and directories to skip.
+            max_depth (int): Deepest directory level to enter, 0 for the top folder only, None for unlimited.
+            follow_symlinks (bool): Whether to follow symbolic links to files and directories.
+            workers (int): Number of directories listed concurrently.
+        """
+        self.extensions = tuple(extension.lower() for extension in extensions)
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        self.max_depth = max_depth
+        self.follow_symlinks = follow_symlinks
+        self.workers = max(1, workers)
+
+    def _matches(self, patterns, name, relative_path):
+        # Patterns are matched against both the name and the slash-separated path below the scanned folder
+        return any(fnmatch(name, pattern) or fnmatch(relative_path, pattern) for pattern in patterns)
+
+    def _list_directory(self, path, relative_path):
+        files, directories = [], []
+        try:
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    relative_entry = f"{relative_path}/{entry.name}" if relative_path else entry.name
+                    if self._matches(self.exclude, entry.name, relative_entry):
+                        continue
+                    try:
+                        if entry.is_dir(follow_symlinks=self.follow_symlinks):
+                            directories.append((entry.path, relative_entry, entry.stat(follow_symlinks=self.follow_symlinks)))
+                        elif entry.is_file(follow_symlinks=self.follow_symlinks):
+                            if not entry.name.lower().endswith(self.extensions):
+                                continue
+                            if self.include and not self._matches(self.include, entry.name, relative_entry):
+                                continue
+                            files.append((entry.path, entry.stat(follow_symlinks=self.follow_symlinks)))
+                    except OSError as e:
+                        logger.warning("Error reading %s: %s", entry.path, e,
+                                       extra={'path': entry.path, 'phase': "walk"})
+        except OSError as e:
+            logger.warning("Error reading %s: %s", path, e, extra={'path': path, 'phase': "walk"})
+        files.sort()
+        directories.sort()
+        return files, directories
+
+    def scan(self, folder_path):
+        """
+        Collects the matching files below a folder.
+
+        Args:
+            folder_path (str): The folder to scan.
+
+        Returns:
+            list: ``ScanEntry`` tuples, in the order a top-down walk with sorted listings visits them.
+        """
+        return list(self.iter_scan(folder_path))
+
+    def iter_scan(self, folder_path):
+        """
+        Streams the matching files below a folder, in the same order as ``scan``.
+
+        Only the next ``workers * PREFETCH_PER_WORKER`` directories in walk order are listed ahead of
+        the consumer, so a slow consumer such as the hashing stage holds the walk back instead of
+        having millions of paths enumerated into memory ahead of it.
+
+        Args:
+            folder_path (str): The folder to scan.
+
+        Yields:
+            ScanEntry: Every matching file.
+        """
+        try:
+            root_stat = os.stat(folder_path)
+        except OSError as e:
+            logger.warning("Error reading %s: %s", folder_path, e, extra={'path': folder_path, 'phase': "walk"})
+            return
+
+        visited = {(root_stat.st_dev, root_stat.st_ino)}
+        seen_files = set()
+        prefetch = self.workers * PREFETCH_PER_WORKER
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # Directories still to visit as [path, relative path, depth, listing future or None], next one last
+            stack = [[folder_path, "", 0, executor.submit(self._list_directory, folder_path, "")]]
+            while stack:
+                _, _, depth, future = stack.pop()
+                files, directories = future.result()
+                entered = []
+                if self.max_depth is None or depth < self.max_depth:
+                    for directory, relative_directory, stat in directories:
+                        key = (stat.st_dev, stat.st_ino)
+                        # Inodes are not reported on every platform; a zero inode cannot be used to detect loops
+                        if stat.st_ino and key in visited:
+                            continue
+                        visited.add(key)
+                        entered.append([directory, relative_directory, depth + 1, None])
+                stack.extend(reversed(entered))
+
+                # The directories next in line are listed while the files of this one are consumed
+                for pending in stack[-prefetch:]:
+                    if pending[3] is None:
+                        pending[3] = executor.submit(self._list_directory, pending[0], pending[1])
+
+                for path, stat in files:
+                    if stat.st_nlink > 1 and stat.st_ino:
+                        key = (stat.st_dev, stat.st_ino)
+                        if key in seen_files:
+                            continue
+                        seen_files.add(key)
+                    yield ScanEntry(path, stat.st_size, stat.st_mtime_ns)
@@ -0,0 +1,231 @@
+# thumbnails.py
+import hashlib
+import logging
+import os
+import queue
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+# Edge length of the thumbnails shown in the result rows
+THUMBNAIL_SIZE = 56
+DEFAULT_MEMORY_BUDGET = 64 * 1024 * 1024
+DEFAULT_THUMBNAIL_WORKERS = 4
+# Largest size an image is decoded at for the preview window
+PREVIEW_SIZE = (1200, 800)
+
+
+def load_image(path, max_size):
+    """
+    Decodes an image at a reduced size that fits into a box, for display.
+
+    JPEGs are decoded at the smallest DCT scale that still covers the box, so a large photo is never
+    decoded in full just to be shrunk to a thumbnail.
+
+    Args:
+        path (str): The image file path.
+        max_size (tuple): The ``(width, height)`` box the image has to fit into.
+
+    Returns:
+        PIL.Image.Image: The RGB image, at most ``max_size`` and upright according to its EXIF orientation.
+    """
+    with Image.open(path) as img:
+        img.draft("RGB", max_size)
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail(max_size, Image.LANCZOS)
+        return img.convert("RGB")
+
+
+def image_size(image):
+    """
+    Returns the approximate number of bytes an image's pixels take in memory.
+    """
+    return image.width * image.height * len(image.getbands())
+
+
+class ThumbnailCache:
+    """
+    Least recently used cache of images bounded by the bytes of their pixels rather than their count.
+    """
+
+    def __init__(self, budget=DEFAULT_MEMORY_BUDGET):
+        self.budget = budget
+        self.size = 0
+        self._images = OrderedDict()
+
+    def __len__(self):
+        return len(self._images)
+
+    def __contains__(self, key):
+        return key in self._images
+
+    def get(self, key):
+        image = self._images.get(key)
+        if image is not None:
+            self._images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        if key in self._images:
+            self.size -= image_size(self._images.pop(key))
+        self._images[key] = image
+        self.size += image_size(image)
+        # The newest image stays even when it alone exceeds the budget
+        while self.size > self.budget and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.size -= image_size(evicted)
+
+
+class ThumbnailStore:
+    """
+    Keeps generated thumbnails as JPEG files in a folder so they survive restarts.
+
+    Files are named after the image path, size and modification time, so a changed image gets a new
+    thumbnail instead of a stale one.
+    """
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        os.makedirs(folder_path, exist_ok=True)
+
+    def _filename(self, path, stat, size):
+        key = f"{path}\0{stat.st_size}\0{stat.st_mtime_ns}\0{size}".encode("utf-8", "surrogateescape")
+        return os.path.join(self.folder_path, hashlib.blake2b(key, digest_size=16).hexdigest() + ".jpg")
+
+    def load(self, path, stat, size):
+        filename = self._filename(path, stat, size)
+        if not os.path.exists(filename):
+            return None
+        try:
+            with Image.open(filename) as img:
+                return img.convert("RGB")
+        except OSError:
+            return None
+
+    def save(self, path, stat, size, image):
+        try:
+            image.save(self._filename(path, stat, size), "JPEG", quality=90)
+        except OSError as e:
+            logger.warning("Error storing thumbnail of %s: %s", path, e)
+
+
+class ThumbnailLoader:
+    """
+    Generates thumbnails on a thread pool and hands them to the UI thread.
+
+    The UI asks for thumbnails with ``request`` and picks up finished ones with ``process_results``,
+    which must run on the UI thread; only that thread touches the memory cache, so Tk objects can be
+    built from the results safely. Requests not yet started can be dropped with ``cancel_pending``
+    when the user pages away.
+    """
+
+    def __init__(self, size=THUMBNAIL_SIZE, memory_budget=DEFAULT_MEMORY_BUDGET, store_folder=None,
+                 workers=DEFAULT_THUMBNAIL_WORKERS):
+        """
+        Args:
+            size (int): Edge length of the thumbnails.
+            memory_budget (int): Bytes of thumbnail pixels kept in memory.
+            store_folder (str): Optional folder where thumbnails are stored on disk.
+            workers (int): Number of thumbnails generated concurrently.
+        """
+        self.size = size
+        self.cache = ThumbnailCache(memory_budget)
+        self.store = ThumbnailStore(store_folder) if store_folder else None
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._preview_executor = ThreadPoolExecutor(max_workers=1)
+        self._pending = {}
+        self._failed = set()
+        self._results = queue.Queue()
+
+    @property
+    def busy(self):
+        return bool(self._pending)
+
+    def get(self, path):
+        """
+        Returns the thumbnail of an image if it is in memory.
+
+        Args:
+            path (str): The image file path.
+
+        Returns:
+            PIL.Image.Image: The thumbnail, or None if it has not been generated yet.
+        """
+        return self.cache.get(path)
+
+    def request(self, paths):
+        """
+        Queues thumbnails for generation, in the given order, unless they are cached or already queued.
+
+        Args:
+            paths (iterable): The image file paths.
+        """
+        for path in paths:
+            if path in self.cache or path in self._pending or path in self._failed:
+                continue
+            self._pending[path] = self._executor.submit(self._generate, path)
+
+    def cancel_pending(self):
+        """
+        Drops queued requests that have not started yet.
+        """
+        for path, future in list(self._pending.items()):
+            if future.cancel():
+                del self._pending[path]
+
+    def _generate(self, path):
+        # Runs on a worker thread
+        image = None
+        try:
+            stat = os.stat(path)
+            if self.store is not None:
+                image = self.store.load(path, stat, self.size)
+            if image is None:
+                image = load_image(path, (self.size, self.size))
+                if self.store is not None:
+                    self.store.save(path, stat, self.size, image)
+        except Exception as e:
+            logger.warning("Error creating thumbnail of %s: %s", path, e)
+        self._results.put((path, image))
+
+    def process_results(self):
+        """
+        Moves finished thumbnails into the memory cache. Must be called on the UI thread.
+
+        Returns:
+            list: Paths whose thumbnails became available.
+        """
+        loaded = []
+        try:
+            while True:
+                path, image = self._results.get_nowait()
+                self._pending.pop(path, None)
+                if image is None:
+                    self._failed.add(path)
+                else:
+                    self.cache.put(path, image)
+                    loaded.append(path)
+        except queue.Empty:
+            pass
+        return loaded
+
+    def load_preview(self, path, max_size=PREVIEW_SIZE):
+        """
+        Decodes an image for the preview window in the background, ahead of queued thumbnails.
+
+        Args:
+            path (str): The image file path.
+            max_size (tuple): The ``(width, height)`` box the preview has to fit into.
+
+        Returns:
+            concurrent.futures.Future: Resolves to the ``PIL.Image.Image``.
+        """
+        return self._preview_executor.submit(load_image, path, max_size)
+
+    def shutdown(self):
+        self.cancel_pending()
+        self._executor.shutdown(wait=False)
+        self._preview_executor.shutdown(wait=False)
@@ -1,8 +1,12 @@
-from gui import DupliPicFinderApp
+from duplipicfinder.gui import DupliPicFinderApp
 import customtkinter as ctk
+import logging
+import multiprocessing
 
 
 def main():
+    multiprocessing.freeze_support()  # Required for the hashing processes in frozen executables
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
     root = ctk.CTk()  # Initialize the main window using customtkinter
     app = DupliPicFinderApp(root)  # Create an instance of the application
     root.mainloop()  # Start the Tkinter event loop